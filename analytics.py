@@ -0,0 +1,224 @@
+"""Columnar Parquet snapshot of the log tables for history-heavy views.
+
+    python analytics.py                  # export changed years (cron-friendly)
+    python analytics.py --rebuild        # re-export everything
+
+Each table is stored as one Parquet file per year under
+<db name>.analytics/<table>/YYYY.parquet, with log_date as a real date
+column and names as dictionary (categorical) columns. Triggers record which
+years changed (snapshot_dirty in db.py), so refresh() only rewrites those
+files. Reads memory-map just the years in the requested range.
+
+pyarrow is optional: without it load_history() reads the same typed frame
+straight from SQLite.
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import pandas as pd
+
+from db import COLUMN_TYPES, DB_PATH, SNAPSHOT_ALL, get_pool, init_db, mark_snapshot_rebuild, typed_frame
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+# Bump when COLUMN_TYPES change; snapshots written in another format are re-exported
+SNAPSHOT_FORMAT = "3"
+
+def available():
+    return pq is not None
+
+def snapshot_dir(db_path=DB_PATH):
+    return os.path.splitext(db_path)[0] + ".analytics"
+
+def arrow_schema(table):
+    types = {
+        "int64": pa.int64(), "int32": pa.int32(), "int8": pa.int8(), "float64": pa.float64(),
+        "string": pa.string(), "date": pa.date32(), "category": pa.dictionary(pa.int32(), pa.string()),
+    }
+    return pa.schema([(col, types[t]) for col, t in COLUMN_TYPES[table].items()])
+
+def _read_years(conn, table, years):
+    cols = ", ".join(COLUMN_TYPES[table])
+    if SNAPSHOT_ALL in years:
+        q, params = f"SELECT {cols} FROM {table} WHERE log_date IS NOT NULL", []
+    else:
+        # ISO dates compare as text, so a year is one range scan on the log_date index
+        q = f"SELECT {cols} FROM {table} WHERE " + " OR ".join(["log_date BETWEEN ? AND ?"] * len(years))
+        params = [b for y in years for b in (f"{y}-00", f"{y}-99")]
+    return pd.read_sql_query(q, conn, params=params)
+
+def _write_year(table_dir, year, df, schema):
+    path = os.path.join(table_dir, f"{year}.parquet")
+    if df.empty:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    # Unique per writer: another thread or process may be exporting the same year
+    fd, tmp = tempfile.mkstemp(dir=table_dir, prefix=f".{year}.", suffix=".tmp")
+    os.close(fd)
+    try:
+        pq.write_table(pa.Table.from_pandas(df, schema=schema, preserve_index=False), tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+def _swap_dir(link, new_dir):
+    """Point link at new_dir in one rename; returns the directory it pointed at before, if any."""
+    old = None
+    if os.path.islink(link):
+        old = os.path.realpath(link)
+    elif os.path.isdir(link):
+        # Snapshot written before rebuilds were swapped in: move it aside so the link can take its name
+        old = tempfile.mkdtemp(dir=os.path.dirname(link), prefix=f"{os.path.basename(link)}.old.")
+        os.rename(link, os.path.join(old, "data"))
+    tmp = f"{new_dir}.link"
+    os.symlink(os.path.basename(new_dir), tmp)  # relative, so the snapshot can be moved with the database
+    os.replace(tmp, link)
+    return old
+
+_refresh_locks = {}
+_refresh_locks_lock = threading.Lock()
+
+def _refresh_lock(root):
+    # One export per snapshot at a time in this process; other processes are kept apart by unique file names
+    with _refresh_locks_lock:
+        return _refresh_locks.setdefault(os.path.abspath(root), threading.Lock())
+
+def _check_format(pool, root):
+    marker = os.path.join(root, "FORMAT")
+    if os.path.exists(marker):
+        with open(marker) as f:
+            if f.read().strip() == SNAPSHOT_FORMAT:
+                return
+    # Queue the full re-export in the database first, so a crash before it runs still redoes it
+    with pool.writer() as conn:
+        mark_snapshot_rebuild(conn)
+    os.makedirs(root, exist_ok=True)
+    with open(marker, "w") as f:
+        f.write(SNAPSHOT_FORMAT)
+
+def refresh(db_path=DB_PATH, tables=None):
+    """Export every year changed since the last refresh; returns the number of files written or removed."""
+    if not available():
+        return 0
+    root = snapshot_dir(db_path)
+    with _refresh_lock(root):
+        return _refresh(get_pool(db_path), root, tables)
+
+def _refresh(pool, root, tables):
+    _check_format(pool, root)
+    with pool.reader() as conn:
+        # One read transaction: the dirty list and the rows it describes come from the same snapshot
+        conn.execute("BEGIN")
+        try:
+            dirty = [
+                d for d in conn.execute("SELECT table_name, year, gen FROM snapshot_dirty").fetchall()
+                if tables is None or d[0] in tables
+            ]
+            years = {}
+            for table, year, _ in dirty:
+                years.setdefault(table, set()).add(year)
+            frames = {table: _read_years(conn, table, ys) for table, ys in years.items()}
+        finally:
+            conn.execute("COMMIT")
+    if not dirty:
+        return 0
+
+    written = 0
+    for table, df in frames.items():
+        table_dir = os.path.join(root, table)
+        rebuild = SNAPSHOT_ALL in years[table]
+        out_dir = tempfile.mkdtemp(dir=root, prefix=f"{table}.") if rebuild else table_dir
+        os.makedirs(out_dir, exist_ok=True)
+        schema = arrow_schema(table)
+        df = typed_frame(df, table)
+        # A log_date that is not a real date has no year to file it under; it stays in SQLite only
+        df = df[df["log_date"].notna()]
+        by_year = dict(tuple(df.groupby(df["log_date"].dt.year.astype(str), sort=False)))
+        for year in (by_year if rebuild else years[table]):
+            _write_year(out_dir, year, by_year.get(year, df.iloc[:0]), schema)
+            written += 1
+        if rebuild:
+            old = _swap_dir(table_dir, out_dir)
+            if old:
+                # Readers resolve the link once and retry if a file they listed is gone
+                shutil.rmtree(old, ignore_errors=True)
+    with pool.writer() as conn:
+        # A year written again since the read keeps a higher gen and stays dirty
+        conn.executemany("DELETE FROM snapshot_dirty WHERE table_name = ? AND year = ? AND gen = ?", dirty)
+    return written
+
+def read_snapshot(db_path, table, start_date=None, end_date=None, columns=None):
+    """Typed frame for [start_date, end_date] from the Parquet files; call refresh() first."""
+    # Columnar: only the requested columns are decoded (log_date and id are always included)
+    columns = list(dict.fromkeys(["id", "log_date", *columns])) if columns else list(COLUMN_TYPES[table])
+    first, last = (start_date or "0000")[:4], (end_date or "9999")[:4]
+    for attempt in range(3):
+        # Resolved once, so every file comes from the same export even if a rebuild is swapped in meanwhile
+        table_dir = os.path.realpath(os.path.join(snapshot_dir(db_path), table))
+        files = sorted(
+            os.path.join(table_dir, name) for name in (os.listdir(table_dir) if os.path.isdir(table_dir) else [])
+            if name.endswith(".parquet") and first <= name[:4] <= last
+        )
+        if not files:
+            return arrow_schema(table).empty_table().select(columns).to_pandas(date_as_object=False)
+        try:
+            data = pa.concat_tables([pq.read_table(f, columns=columns, memory_map=True) for f in files])
+            break
+        except FileNotFoundError:
+            # The export was replaced and removed between listing and opening; look again
+            if attempt == 2:
+                raise
+    df = data.to_pandas(date_as_object=False)
+    if start_date:
+        df = df[df["log_date"] >= pd.Timestamp(start_date)]
+    if end_date:
+        df = df[df["log_date"] <= pd.Timestamp(end_date)]
+    return df.sort_values(["log_date", "id"], ignore_index=True)
+
+def load_history(db_path, table, start_date=None, end_date=None, columns=None):
+    """Typed rows for a date range: the Parquet snapshot when pyarrow is installed, else SQLite."""
+    if available():
+        refresh(db_path, [table])
+        return read_snapshot(db_path, table, start_date, end_date, columns)
+    columns = list(dict.fromkeys(["id", "log_date", *columns])) if columns else list(COLUMN_TYPES[table])
+    cols = ", ".join(columns)
+    q, params = f"SELECT {cols} FROM {table} WHERE log_date IS NOT NULL", []
+    if start_date:
+        q += " AND log_date >= ?"
+        params.append(start_date)
+    if end_date:
+        q += " AND log_date <= ?"
+        params.append(end_date)
+    with get_pool(db_path).reader() as conn:
+        df = pd.read_sql_query(q + " ORDER BY log_date, id", conn, params=params)
+    return typed_frame(df, table)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the log tables to the Parquet analytics snapshot.")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--rebuild", action="store_true", help="Re-export every table instead of only changed years")
+    args = parser.parse_args()
+
+    if not available():
+        print("pyarrow is not installed; views read from SQLite instead. pip install pyarrow to enable the snapshot.")
+        raise SystemExit(1)
+    if not os.path.exists(args.db):
+        print(f"Database at {args.db} not found.")
+        raise SystemExit(1)
+    init_db(args.db)
+    if args.rebuild:
+        with get_pool(args.db).writer() as conn:
+            mark_snapshot_rebuild(conn)
+    t0 = time.perf_counter()
+    files = refresh(args.db)
+    print(f"✅ Snapshot at {snapshot_dir(args.db)}: {files} file(s) updated in {time.perf_counter() - t0:.2f}s.")
@@ -0,0 +1,391 @@
+"""Small JSON API over the tracker's data, for phones and scripts that only need a quick look.
+
+    python api.py                                  # http://127.0.0.1:8502
+    python api.py --host 0.0.0.0 --port 8502       # reachable from a phone on the same Wi-Fi
+
+Endpoints (each also takes ?athlete=<id>, as the app does):
+    GET  /api/plan[?day=Monday]                    the day's planned exercises (default today)
+    GET  /api/score[?week=2026-01-05]              weekly score of the week containing that date (default this week)
+    GET  /api/last[?day=Monday][&exercise=...]     last session of each exercise in the day's plan, or of those named
+    POST /api/logs                                 {"sessions": [...], "body_metrics": [...]} through the write queue
+    GET  /api/writes/<ticket>                      status of a queued write
+    GET  /api/export                               the backup.py export, streamed in chunks as it is written
+
+No Streamlit session or script run is involved. Every GET response has an
+ETag built from the plan digest and the versions of the tables it reads
+(TableVersions: one PRAGMA while nothing has been written), so an unchanged
+read is answered with 304, or from a cache of encoded responses, without a
+query. Responses are gzipped when the client accepts it.
+"""
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from datetime import date
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from backup import export_ndjson, table_columns, validate_row
+from db import (
+    CUSTOM_COLUMNS, DB_PATH, WORKOUT_COLUMNS, TableVersions, athlete_db_path, fetch_last_logs, fetch_week_score, get_pool, init_db,
+    week_range,
+)
+from plan import DAY_ORDER, WORKOUTS_YAML, PlanError, load_plan
+from write_queue import FAILED, QUEUED, UNKNOWN, WRITTEN, get_queue
+
+DEFAULT_PORT = 8502
+# Encoded responses kept for unchanged reads, across all athletes
+RESPONSE_CACHE_MAX_ENTRIES = 256
+# Smaller bodies are not worth the gzip header and CPU
+GZIP_MIN_BYTES = 512
+MAX_BODY_BYTES = 1 << 20
+MAX_BATCH = 100
+# POST /api/logs waits this long for its writes before answering 202 with tickets to poll
+WRITE_WAIT_S = 0.3
+# Compressed export bytes gathered into each chunk of GET /api/export
+EXPORT_CHUNK_BYTES = 64 * 1024
+ISO_DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        self.status, self.message = status, message
+        super().__init__(message)
+
+_lock = threading.Lock()
+# etag -> (json bytes, gzipped bytes or None)
+_responses = OrderedDict()
+# db path -> TableVersions / table columns; one of each per athlete database
+_versions = {}
+_columns = {}
+
+def _shared(registry, path, factory):
+    with _lock:
+        if path not in registry:
+            registry[path] = factory(path)
+        return registry[path]
+
+def resolve_db(query):
+    athlete = _param(query, "athlete")
+    if not athlete:
+        return DB_PATH
+    try:
+        path = athlete_db_path(athlete)
+    except ValueError as e:
+        raise ApiError(HTTPStatus.BAD_REQUEST, str(e))
+    # The API never creates an athlete; the app offers that
+    if not os.path.exists(path):
+        raise ApiError(HTTPStatus.NOT_FOUND, f"No tracker for athlete {athlete!r}")
+    return path
+
+def _param(query, name, default=None):
+    values = query.get(name)
+    return values[-1] if values else default
+
+def _day(query):
+    day = _param(query, "day", date.today().strftime("%A"))
+    if day not in DAY_ORDER:
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"day must be one of {', '.join(DAY_ORDER)}")
+    return day
+
+def _date(value, field):
+    # Only YYYY-MM-DD: fromisoformat alone also takes "20260105" and "2026-W02-1", which the log tables cannot sort
+    try:
+        if not ISO_DATE_RE.match(value):
+            raise ValueError(value)
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"{field} must be a date like 2026-01-05")
+
+def _plan():
+    try:
+        return load_plan(WORKOUTS_YAML)
+    except PlanError as e:
+        raise ApiError(HTTPStatus.INTERNAL_SERVER_ERROR, str(e))
+
+def _records(df):
+    # Frames from the fetch_* helpers: datetime log_date, categoricals, NaN for NULL
+    out = df.reset_index()
+    if "log_date" in out:
+        out["log_date"] = out["log_date"].dt.strftime("%Y-%m-%d")
+    out = out.astype(object).where(out.notna(), None)
+    return out.to_dict("records")
+
+# -----------------------------
+# Reads
+# -----------------------------
+# Each route returns (key, build): key names everything the response depends
+# on and is cheap to compute; build() does the actual reads.
+def route_plan(path, query):
+    plan, day = _plan(), _day(query)
+
+    def build():
+        p = plan.days[day]
+        return {
+            "day": day, "phase": plan.phase, "focus": p.focus, "intensity": p.intensity, "core": p.core,
+            "exercises": [e._asdict() for e in p.exercises],
+        }
+    return ("plan", plan.digest, day), build
+
+def route_score(path, query):
+    week = _param(query, "week")
+    week_start, week_end = week_range(_date(week, "week") if week else date.today())
+    version = _shared(_versions, path, TableVersions).get("weekly_scores")
+
+    def build():
+        with get_pool(path).reader() as conn:
+            score, sport_points = fetch_week_score(conn, week_start)
+        return {
+            "week_start": week_start.isoformat(), "week_end": week_end.isoformat(),
+            "score": int(score), "sport_points": int(sport_points),
+        }
+    return ("score", path, version, week_start.isoformat()), build
+
+def route_last(path, query):
+    names = query.get("exercise")
+    digest = None
+    if not names:
+        plan, day = _plan(), _day(query)
+        names, digest = list(plan.days[day].exercise_names), plan.digest
+    version = _shared(_versions, path, TableVersions).get("workout_logs")
+
+    def build():
+        with get_pool(path).reader() as conn:
+            last = fetch_last_logs(conn, names)
+        # In the order asked for; exercises never logged are left out
+        return {"sessions": _records(last.loc[[n for n in dict.fromkeys(names) if n in last.index]])}
+    return ("last", path, version, digest, tuple(names)), build
+
+GET_ROUTES = {"/api/plan": route_plan, "/api/score": route_score, "/api/last": route_last}
+
+def etag_for(key):
+    # Weak: the plain and gzipped bodies share it
+    return 'W/"' + hashlib.sha1(repr(key).encode()).hexdigest()[:20] + '"'
+
+def get_response(route, query, if_none_match=None, accept_gzip=False):
+    """Serve a GET route: returns (status, etag, body bytes, gzipped); raises ApiError."""
+    if route not in GET_ROUTES:
+        raise ApiError(HTTPStatus.NOT_FOUND, f"Unknown endpoint {route}")
+    key, build = GET_ROUTES[route](resolve_db(query), query)
+    etag = etag_for(key)
+    if if_none_match and ({etag, "*"} & {t.strip() for t in if_none_match.split(",")}):
+        return HTTPStatus.NOT_MODIFIED, etag, b"", False
+    with _lock:
+        cached = _responses.get(etag)
+        if cached:
+            _responses.move_to_end(etag)
+    if cached is None:
+        body = json.dumps(build(), separators=(",", ":")).encode()
+        cached = (body, gzip.compress(body, compresslevel=6) if len(body) >= GZIP_MIN_BYTES else None)
+        with _lock:
+            _responses[etag] = cached
+            while len(_responses) > RESPONSE_CACHE_MAX_ENTRIES:
+                _responses.popitem(last=False)
+    body, zipped = cached
+    if accept_gzip and zipped is not None:
+        return HTTPStatus.OK, etag, zipped, True
+    return HTTPStatus.OK, etag, body, False
+
+# -----------------------------
+# Writes
+# -----------------------------
+def _read_columns(path):
+    with get_pool(path).reader() as conn:
+        return table_columns(conn)
+
+def _row(table, raw, keep, where, columns):
+    # The same type and range checks as a restore (backup.validate_row), so nothing unreadable is queued
+    if not isinstance(raw, dict):
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"{where}: expected an object")
+    if any(isinstance(raw.get(c), (dict, list)) for c in keep):
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"{where}: values must be numbers or strings")
+    clean, reason = validate_row(table, raw, columns)
+    if reason:
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"{where}: {reason}")
+    return {c: clean[c] for c in keep if c in clean}
+
+def _session_write(raw, i, columns):
+    where = f"sessions[{i}]"
+    if not isinstance(raw, dict):
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"{where}: expected an object")
+    log_date = _date(raw.get("log_date"), f"{where}.log_date").isoformat()
+    if raw.get("day_name") not in DAY_ORDER:
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"{where}.day_name must be one of {', '.join(DAY_ORDER)}")
+    entries = raw.get("entries") or []
+    if not isinstance(entries, list):
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"{where}.entries: expected a list of objects with an exercise_name")
+    base = {"log_date": log_date, "day_name": raw["day_name"]}
+    # Omitted fields are stored as NULL, except skipped: an entry sent without it was done, as in the Workout form
+    entries = [
+        _row("workout_logs", {"skipped": 0, **e, **base} if isinstance(e, dict) else e, WORKOUT_COLUMNS, f"{where}.entries[{j}]", columns)
+        for j, e in enumerate(entries)
+    ]
+    custom = raw.get("custom")
+    if custom is not None:
+        custom = _row("custom_exercises", {**custom, **base} if isinstance(custom, dict) else custom, CUSTOM_COLUMNS, f"{where}.custom", columns)
+    return "workout_session", {**base, "entries": entries, "custom": custom}
+
+def _metrics_write(raw, i, columns):
+    where = f"body_metrics[{i}]"
+    if not isinstance(raw, dict):
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"{where}: expected an object")
+    log_date = _date(raw.get("log_date"), f"{where}.log_date").isoformat()
+    clean = _row("body_metrics", raw, ["weight", "body_fat"], where, columns)
+    # As in the Settings form: a reading with neither value is not a reading
+    if clean.get("weight") is None and clean.get("body_fat") is None:
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"{where}: give a weight, a body_fat or both")
+    return "body_metrics", {"log_date": log_date, "weight": clean.get("weight"), "body_fat": clean.get("body_fat")}
+
+def _status_json(ticket, status):
+    return {"ticket": ticket, "state": status.state, "error": status.error}
+
+def submit_logs(query, payload):
+    """Validate a whole batch, then queue it; returns (status, response dict). Nothing is queued if any item is invalid."""
+    if not isinstance(payload, dict):
+        raise ApiError(HTTPStatus.BAD_REQUEST, 'Expected {"sessions": [...], "body_metrics": [...]}')
+    sessions, metrics = payload.get("sessions") or [], payload.get("body_metrics") or []
+    if not isinstance(sessions, list) or not isinstance(metrics, list):
+        raise ApiError(HTTPStatus.BAD_REQUEST, "sessions and body_metrics must be lists")
+    if len(sessions) + len(metrics) > MAX_BATCH:
+        raise ApiError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"At most {MAX_BATCH} writes per request")
+    path = resolve_db(query)
+    columns = _shared(_columns, path, _read_columns)
+    writes = [_session_write(s, i, columns) for i, s in enumerate(sessions)] + [_metrics_write(m, i, columns) for i, m in enumerate(metrics)]
+    queue = get_queue(path)
+    tickets = [queue.submit(op, **values) for op, values in writes]
+    # The writer commits a batch together, so waiting on the last ticket usually covers all of them
+    if tickets:
+        queue.wait(tickets[-1], WRITE_WAIT_S)
+    statuses = [queue.status(t) for t in tickets]
+    if any(s.state == QUEUED for s in statuses):
+        code = HTTPStatus.ACCEPTED
+    else:
+        code = HTTPStatus.OK if all(s.state == WRITTEN for s in statuses) else HTTPStatus.UNPROCESSABLE_ENTITY
+    return code, {"writes": [_status_json(t, s) for t, s in zip(tickets, statuses)]}
+
+def write_status(query, ticket):
+    queue = get_queue(resolve_db(query))
+    status = queue.status(ticket)
+    if status.state == UNKNOWN:
+        raise ApiError(HTTPStatus.NOT_FOUND, f"No write with ticket {ticket!r}")
+    return (HTTPStatus.UNPROCESSABLE_ENTITY if status.state == FAILED else HTTPStatus.OK), _status_json(ticket, status)
+
+# -----------------------------
+# HTTP
+# -----------------------------
+class ChunkedWriter(io.RawIOBase):
+    """Binary file object that sends each write as one HTTP/1.1 chunk."""
+    def __init__(self, wfile):
+        self.wfile = wfile
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        if data:
+            self.wfile.write(b"%X\r\n" % len(data) + bytes(data) + b"\r\n")
+        return len(data)
+
+class ApiHandler(BaseHTTPRequestHandler):
+    server_version = "FitnessTrackerAPI/1"
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        try:
+            if url.path.startswith("/api/writes/"):
+                code, doc = write_status(query, url.path.removeprefix("/api/writes/"))
+                return self._json(code, doc, cache=False)
+            if url.path == "/api/export":
+                return self._export(resolve_db(query))
+            accept_gzip = "gzip" in self.headers.get("Accept-Encoding", "")
+            code, etag, body, zipped = get_response(url.path, query, self.headers.get("If-None-Match"), accept_gzip)
+        except ApiError as e:
+            return self._json(e.status, {"error": e.message}, cache=False)
+        self._send(code, body, etag=etag, zipped=zipped)
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        try:
+            if url.path != "/api/logs":
+                raise ApiError(HTTPStatus.NOT_FOUND, f"Unknown endpoint {url.path}")
+            length = int(self.headers.get("Content-Length") or 0)
+            if length > MAX_BODY_BYTES:
+                raise ApiError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"Request body over {MAX_BODY_BYTES} bytes")
+            try:
+                payload = json.loads(self.rfile.read(length) or b"null")
+            except ValueError:
+                raise ApiError(HTTPStatus.BAD_REQUEST, "Request body is not valid JSON")
+            code, doc = submit_logs(parse_qs(url.query), payload)
+        except ApiError as e:
+            code, doc = e.status, {"error": e.message}
+        self._json(code, doc, cache=False)
+
+    def _export(self, db_path):
+        # Sent while it is written, so memory stays flat however long the history is
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "application/gzip")
+        self.send_header("Content-Disposition", f'attachment; filename="fitness_backup_{date.today():%Y%m%d}.ndjson.gz"')
+        self.send_header("Cache-Control", "no-store")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        out = io.BufferedWriter(ChunkedWriter(self.wfile), EXPORT_CHUNK_BYTES)
+        try:
+            export_ndjson(out, db_path)
+            out.flush()
+        except Exception:
+            # The status line is already sent: drop the connection without the last chunk, so the client sees it cut off
+            self.close_connection = True
+            self.log_error("export of %s failed", db_path)
+            return
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _json(self, code, doc, cache):
+        self._send(code, json.dumps(doc, separators=(",", ":")).encode(), cache=cache)
+
+    def _send(self, code, body, etag=None, zipped=False, cache=True):
+        self.send_response(code)
+        if code != HTTPStatus.NOT_MODIFIED:
+            self.send_header("Content-Type", "application/json")
+        if etag:
+            self.send_header("ETag", etag)
+            self.send_header("Vary", "Accept-Encoding")
+        # Clients may keep a copy but must revalidate it; a 304 costs one PRAGMA here
+        self.send_header("Cache-Control", "no-cache" if cache else "no-store")
+        if zipped:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+def serve(host, port):
+    server = ThreadingHTTPServer((host, port), ApiHandler)
+    server.daemon_threads = True
+    print(f"✅ Serving the API on http://{host}:{port}/api/ (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        # Queued writes are flushed by each WriteQueue's exit hook
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="JSON API for the fitness tracker.")
+    parser.add_argument("--host", default="127.0.0.1", help="Use 0.0.0.0 to accept connections from other devices.")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+    try:
+        load_plan(WORKOUTS_YAML)
+    except (PlanError, OSError) as e:
+        print(f"❌ {e}")
+        raise SystemExit(1)
+    init_db(DB_PATH)
+    serve(args.host, args.port)
@@ -1,26 +1,39 @@
 import streamlit as st
 import pandas as pd
-import yaml
-import sqlite3
 from datetime import datetime, date, timedelta
-import plotly.express as px
-import json
+import html
 import os
+import threading
+import perf
+from plan import DAY_ORDER, WORKOUTS_YAML, PlanError, load_plan
+from warmup import import_heavy, warm_up
+from backup import export_bytes, import_backup
+from overload import OverloadCache, focus_volume
+from body_trend import OFF_TRACK, ON_TRACK, REACHED, BodyTrendCache, project_goal
+from write_queue import FAILED, QUEUED, UNKNOWN, WRITTEN, get_queue
+from charts import (
+    BUCKET_HOVER, BUCKET_TICKS, LABELED_BARS, MAX_BARS, MAX_LINE_POINTS, activity_buckets, bucket_start, pick_bucket, webgl,
+)
+from db import (
+    MAX_OPEN_POOLS, TableVersions, athlete_db_path, get_pool, fetch_profile, save_profile,
+    fetch_failed_notes, fetch_set_parse_counts, fetch_set_volume, fetch_drop_sets, HIGHLIGHT, search_notes,
+    fetch_logs, fetch_custom, fetch_sports, fetch_last_logs,
+    fetch_week_score, fetch_recent_activity, week_range,
+)
 
 # -----------------------------
 # Config
 # -----------------------------
+perf.begin_rerun()
 st.set_page_config(
-    page_title="Dheeraj's Fitness Tracker",
+    page_title="Fitness Tracker",
     page_icon="icon.png",
     layout="wide",
     initial_sidebar_state="collapsed"
 )
 
-DB_PATH = "fitness_tracker.db"
-WORKOUTS_YAML = "workouts.yaml"
-
-DAY_ORDER = ["Monday","Tuesday","Wednesday","Thursday","Friday","Saturday","Sunday"]
+PROGRESS_DEFAULT_DAYS = 30
+RECENT_ACTIVITY_ROWS = 3
 
 # -----------------------------
 # Styling (Apple Health 2026 - Premium Light)
@@ -206,8 +219,15 @@ def load_workouts():
     if not os.path.exists(WORKOUTS_YAML):
         st.error(f"Missing {WORKOUTS_YAML}. Make sure it's in the repo root.")
         st.stop()
-    with open(WORKOUTS_YAML, "r", encoding="utf-8") as f:
-        return yaml.safe_load(f)
+    try:
+        # Parsed once per file change and shared by all sessions; this is just a stat on reruns
+        with perf.span("load_plan") as info:
+            plan = load_plan(WORKOUTS_YAML)
+            info["rows"] = sum(len(p.exercises) for p in plan.days.values())
+    except PlanError as e:
+        st.error(f"{WORKOUTS_YAML} has errors:\n\n" + "\n".join(f"- {p}" for p in e.problems))
+        st.stop()
+    return plan
 
 def get_today_day_name():
     return datetime.now().strftime("%A")
@@ -215,92 +235,180 @@ def get_today_day_name():
 def normalize_day(day):
     return day if day in DAY_ORDER else "Monday"
 
-def connect_db():
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    return conn
-
-def init_db():
-    conn = connect_db()
-    cur = conn.cursor()
-    # Ensure tables
-    for q in [
-        "CREATE TABLE IF NOT EXISTS workout_logs (id INTEGER PRIMARY KEY AUTOINCREMENT, log_date TEXT, day_name TEXT, exercise_name TEXT, planned_sets TEXT, planned_reps TEXT, actual_sets INTEGER, actual_reps INTEGER, weight REAL, skipped INTEGER, notes TEXT)",
-        "CREATE TABLE IF NOT EXISTS custom_exercises (id INTEGER PRIMARY KEY AUTOINCREMENT, log_date TEXT, day_name TEXT, exercise_name TEXT, actual_sets INTEGER, actual_reps INTEGER, weight REAL, notes TEXT)",
-        "CREATE TABLE IF NOT EXISTS sports_logs (id INTEGER PRIMARY KEY AUTOINCREMENT, log_date TEXT, sport_name TEXT, minutes INTEGER, intensity TEXT, notes TEXT)",
-        "CREATE TABLE IF NOT EXISTS body_metrics (id INTEGER PRIMARY KEY AUTOINCREMENT, log_date TEXT, weight REAL, body_fat REAL, lean_mass REAL, muscle_mass REAL, water_mass REAL, notes TEXT)"
-    ]:
-        cur.execute(q)
-    conn.commit()
-    conn.close()
-
-def fetch_logs(conn, start_date=None, end_date=None):
-    q = "SELECT log_date, day_name, exercise_name, actual_sets, actual_reps, weight, skipped, notes FROM workout_logs"
-    params = []
-    if start_date and end_date:
-        q += " WHERE log_date BETWEEN ? AND ?"
-        params = [start_date, end_date]
-    q += " ORDER BY log_date DESC"
-    return pd.read_sql_query(q, conn, params=params)
-
-def fetch_custom(conn, start_date=None, end_date=None):
-    q = "SELECT log_date, day_name, exercise_name, actual_sets, actual_reps, weight, notes FROM custom_exercises"
-    params = []
-    if start_date and end_date:
-        q += " WHERE log_date BETWEEN ? AND ?"
-        params = [start_date, end_date]
-    q += " ORDER BY log_date DESC"
-    return pd.read_sql_query(q, conn, params=params)
-
-def fetch_sports(conn, start_date=None, end_date=None):
-    q = "SELECT log_date, sport_name, minutes, intensity, notes FROM sports_logs"
-    params = []
-    if start_date and end_date:
-        q += " WHERE log_date BETWEEN ? AND ?"
-        params = [start_date, end_date]
-    q += " ORDER BY log_date DESC"
-    return pd.read_sql_query(q, conn, params=params)
-
-def fetch_metrics(conn):
-    q = "SELECT log_date, weight, body_fat, lean_mass, muscle_mass, water_mass, notes FROM body_metrics ORDER BY log_date DESC"
-    return pd.read_sql_query(q, conn)
-
-def week_range(d: date):
-    start = d - timedelta(days=d.weekday())
-    end = start + timedelta(days=6)
-    return start, end
-
-def calc_week_score(df_logs, df_custom, df_sports, week_start, week_end):
-    score = 0
-    if df_logs is not None and not df_logs.empty:
-        tmp = df_logs.copy()
-        tmp["log_date"] = pd.to_datetime(tmp["log_date"]).dt.date
-        tmp = tmp[(tmp["log_date"] >= week_start) & (tmp["log_date"] <= week_end)]
-        if not tmp.empty:
-            score += len(tmp[tmp["skipped"] == 0]) * 2
-    if df_custom is not None and not df_custom.empty:
-        tmpc = df_custom.copy()
-        tmpc["log_date"] = pd.to_datetime(tmpc["log_date"]).dt.date
-        tmpc = tmpc[(tmpc["log_date"] >= week_start) & (tmpc["log_date"] <= week_end)]
-        score += len(tmpc)
-    sport_points = 0
-    if df_sports is not None and not df_sports.empty:
-        tmps = df_sports.copy()
-        tmps["log_date"] = pd.to_datetime(tmps["log_date"]).dt.date
-        tmps = tmps[(tmps["log_date"] >= week_start) & (tmps["log_date"] <= week_end)]
-        if not tmps.empty:
-            total = tmps["minutes"].fillna(0).sum()
-            sport_points = min(6, int(total // 20))
-            score += sport_points
-    return score, sport_points
+def fmt_day(ts):
+    # log_date columns are datetime64; show them as the ISO date that was logged
+    return ts.strftime("%Y-%m-%d") if pd.notna(ts) else "—"
+
+# -----------------------------
+# Query Cache
+# -----------------------------
+# Shared across all sessions. Each entry is keyed on the version of the table
+# (or tables) it reads, so a write only supersedes the entries for that table;
+# stale entries age out of the bounded cache.
+QUERY_CACHE_MAX_ENTRIES = 64
+
+CACHED_FETCHERS = {
+    "logs": ("workout_logs", fetch_logs),
+    "custom": ("custom_exercises", fetch_custom),
+    "sports": ("sports_logs", fetch_sports),
+    "recent": ("workout_logs", fetch_recent_activity),
+    "last_logs": ("workout_logs", fetch_last_logs),
+    "week_score": ("weekly_scores", fetch_week_score),
+    "profile": ("athlete_profile", fetch_profile),
+    # Parsed sets change with set_parse_status; the dates and names they are shown with come from workout_logs
+    "set_parse_counts": ("set_parse_status", fetch_set_parse_counts),
+    "failed_notes": (("workout_logs", "set_parse_status"), fetch_failed_notes),
+    "set_volume": (("workout_logs", "set_parse_status"), fetch_set_volume),
+    "drop_sets": (("workout_logs", "set_parse_status"), fetch_drop_sets),
+}
+
+@st.cache_resource(max_entries=MAX_OPEN_POOLS, show_spinner=False)
+def prepare_db(path):
+    # Once per database file per server process: schema check and dashboard reads (see warmup.py)
+    for name, ms in warm_up(path, plan_path=None, imports=False).items():
+        perf.record(f"warmup.{name}", ms)
+
+@st.cache_resource(show_spinner=False)
+def start_background_imports():
+    # Plotly is only imported by the Progress tab; load it off the script thread after the first page is sent
+    threading.Thread(target=import_heavy, name="warmup-imports", daemon=True).start()
+
+@st.cache_resource(max_entries=MAX_OPEN_POOLS)
+def get_table_versions(path):
+    return TableVersions(path)
+
+@st.cache_data(max_entries=QUERY_CACHE_MAX_ENTRIES, show_spinner=False)
+def _cached_fetch(path, name, version, *args, **kwargs):
+    with get_pool(path).reader() as conn:
+        return CACHED_FETCHERS[name][1](conn, *args, **kwargs)
+
+def cached_fetch(name, *args, **kwargs):
+    # Reads the current athlete's database (db_path, resolved below)
+    tables = CACHED_FETCHERS[name][0]
+    # Includes cache hits; the SQL itself is timed by the db.fetch_* spans on a miss
+    with perf.span(f"cache.{name}"):
+        versions = get_table_versions(db_path).snapshot()
+        version = tuple(versions.get(t, 0) for t in tables) if isinstance(tables, tuple) else versions.get(tables, 0)
+        return _cached_fetch(db_path, name, version, *args, **kwargs)
+
+@st.cache_resource(max_entries=MAX_OPEN_POOLS, show_spinner=False)
+def get_overload(path):
+    # Shared by all sessions; refresh() re-reads only the weeks written since the last call
+    return OverloadCache(path)
+
+@st.cache_resource(max_entries=MAX_OPEN_POOLS, show_spinner=False)
+def get_body_trend(path):
+    # Shared like get_overload; a new reading is added to the trend without re-reading older weeks
+    return BodyTrendCache(path)
+
+def refreshed_body_trend():
+    trend = get_body_trend(db_path)
+    with perf.span("body_trend.refresh") as info:
+        info["rows"] = trend.refresh()  # weeks re-read
+    return trend
+
+# Form submits wait this long for the commit, then leave it to the background writer
+WRITE_WAIT_S = 0.3
+
+def submit_write(op, label, **payload):
+    """Queue a write and report it; returns its status, with state QUEUED if it is still being written."""
+    # One background writer per database for the process (not a cache entry that could be evicted while running)
+    queue = get_queue(db_path)
+    ticket = queue.submit(op, **payload)
+    status = queue.wait(ticket, WRITE_WAIT_S)
+    if status.state == FAILED:
+        st.error(f"Could not save {label}: {status.error}")
+    elif status.state == QUEUED:
+        # The database is busy; it stays safely queued and render_pending_writes reports when it lands
+        st.session_state.setdefault("pending_writes", {})[ticket] = (db_path, label)
+        st.info(f"Saved {label}; writing it to the database in the background.")
+    return status
+
+@st.fragment(run_every=1)
+def render_pending_writes():
+    pending = st.session_state.get("pending_writes")
+    if not pending:
+        return
+    for ticket, (path, label) in list(pending.items()):
+        status = get_queue(path).status(ticket)
+        if status.state == QUEUED:
+            continue
+        del pending[ticket]
+        notice = {
+            FAILED: (f"Could not save {label}: {status.error}", "❌"),
+            UNKNOWN: (f"Lost track of the save of {label}; check that it is there", "⚠️"),
+        }.get(status.state, (f"Saved {label}", "✅"))
+        st.session_state.setdefault("write_notices", []).append(notice)
+    if pending:
+        st.caption(f"⏳ Writing {len(pending)} pending save{'s' if len(pending) > 1 else ''}...")
+    else:
+        st.rerun(scope="app")  # pick up the new rows and show the notices
+
+@st.cache_data(max_entries=QUERY_CACHE_MAX_ENTRIES, show_spinner=False)
+def _cached_history(path, table, version, start_date, end_date, columns):
+    import analytics  # deferred with pyarrow, like plotly
+    return analytics.load_history(path, table, start_date, end_date, list(columns))
+
+def cached_history(table, start_date, end_date, columns):
+    # Typed rows (datetime log_date, categorical names) from the Parquet snapshot, or SQLite without pyarrow
+    with perf.span(f"history.{table}") as info:
+        df = _cached_history(db_path, table, get_table_versions(db_path).get(table), start_date, end_date, tuple(columns))
+        info["rows"] = len(df)
+    return df
+
+# -----------------------------
+# Athlete Routing
+# -----------------------------
+# ?athlete=<id> selects athletes/<id>.db; without it the app uses the
+# original single-user fitness_tracker.db.
+def resolve_athlete():
+    athlete = st.query_params.get("athlete", "").strip().lower() or None
+    try:
+        path = athlete_db_path(athlete)
+    except ValueError as e:
+        st.error(str(e))
+        st.stop()
+    if athlete and not os.path.exists(path):
+        st.info(f"No tracker for **{athlete}** yet.")
+        if not st.button("Create Tracker"):
+            st.stop()
+    return athlete, path
+
+def body_goal(metric):
+    # Goals are saved from Settings; empty means none
+    value = profile.get(f"goal_{metric}")
+    return float(value) if value else None
+
+def trend_hint(latest, metric, unit):
+    rate = latest[f"rate_{metric}"]
+    parts = [f"{rate:+.2f}{unit}/wk" if pd.notna(rate) else "Trend"]
+    projection = project_goal(latest, metric, body_goal(metric), today)
+    if projection is not None:
+        parts.append({
+            REACHED: "Goal reached",
+            ON_TRACK: f"Goal by {projection.eta:%d %b %Y}",
+            OFF_TRACK: "Off goal pace",
+        }[projection.status])
+    return " • ".join(parts)
+
+def get_app_name(athlete, profile):
+    if profile.get("display_name"):
+        return f"{profile['display_name']}'s Fitness Tracker"
+    if athlete:
+        return f"Fitness Tracker • {athlete}"
+    return plan.app_name or "Fitness Tracker"
 
 # -----------------------------
 # App Init
 # -----------------------------
-init_db()
-data = load_workouts()
-app_name = data.get("app", {}).get("name", "Dheeraj's Fitness Tracker")
-phase = data.get("app", {}).get("phase", "")
-notes = data.get("app", {}).get("notes", [])
+plan = load_workouts()
+athlete, db_path = resolve_athlete()
+prepare_db(db_path)
+profile = cached_fetch("profile")
+app_name = get_app_name(athlete, profile)
+st.set_page_config(page_title=app_name)
+phase = plan.phase
+notes = plan.notes
 
 today = date.today()
 today_day_name = normalize_day(get_today_day_name())
@@ -312,34 +420,47 @@ st.markdown(
     f"""
     <div class="brand">
       <div>
-        <h1>{app_name}</h1>
+        <h1>{html.escape(app_name)}</h1>
         <div class="sub">{phase} • {today_day_name}, {today.strftime("%d %b %Y")}</div>
       </div>
     </div>
     """,
     unsafe_allow_html=True
 )
+for message, icon in st.session_state.pop("write_notices", []):
+    st.toast(message, icon=icon)
 
 # -----------------------------
 # Tabs
 # -----------------------------
-tabs = st.tabs(["Dashboard", "Workout", "Plan", "Progress", "Nutrition", "Recovery", "Settings"])
-(tab_home, tab_workout, tab_plan, tab_progress, tab_nutrition, tab_recovery, tab_settings) = tabs
+# on_change="rerun" tracks the selected tab so only that tab's render function
+# runs below; the others send no content and do no data loading. Streamlit
+# forgets the state of widgets it did not render, so widgets on those tabs
+# take their last value from kept() as their default. Tabs with forms are
+# always rendered: entries not yet submitted live only in the browser.
+TAB_LABELS = ["Dashboard", "Workout", "Plan", "Progress", "Nutrition", "Recovery", "Settings"]
+tabs = st.tabs(TAB_LABELS, key="active_tab", on_change="rerun")
+EAGER_TABS = {"Workout", "Nutrition", "Settings"}
+
+def keep(key):
+    st.session_state[f"kept_{key}"] = st.session_state[key]
+
+def kept(key, default):
+    return st.session_state.get(f"kept_{key}", default)
+
+def kept_index(key, options):
+    value = kept(key, None)
+    return options.index(value) if value in options else 0
 
 # -----------------------------
 # HOME TAB
 # -----------------------------
-with tab_home:
-    conn = connect_db()
-    df_metrics = fetch_metrics(conn)
-    df_logs = fetch_logs(conn)
-    df_custom = fetch_custom(conn)
-    df_sports = fetch_sports(conn)
-    conn.close()
+def render_home():
+    latest = refreshed_body_trend().latest()
+    recent = cached_fetch("recent", RECENT_ACTIVITY_ROWS)
 
     week_start, week_end = week_range(today)
-    score, sport_points = calc_week_score(df_logs, df_custom, df_sports, week_start, week_end)
-    latest = df_metrics.iloc[0] if df_metrics is not None and not df_metrics.empty else None
+    score, sport_points = cached_fetch("week_score", week_start)
 
     ST_Snapshot = st.container()
     
@@ -356,9 +477,10 @@ with tab_home:
         if latest is not None:
              tiles_data = [
                  ("Weekly Score", f"{score}", f"{week_start.strftime('%d %b')} - {week_end.strftime('%d %b')}"),
-                 ("Weight", f"{latest['weight']:.1f} kg" if pd.notna(latest["weight"]) else "—", "Latest reading"),
-                 ("Body Fat", f"{latest['body_fat']:.1f}%" if pd.notna(latest["body_fat"]) else "—", "Target: Lean"),
-                 ("Lean Mass", f"{latest['lean_mass']:.1f} kg" if pd.notna(latest["lean_mass"]) else "—", "Growth"),
+                 # Smoothed trend values, so one heavy morning does not move the tiles
+                 ("Weight", f"{latest['trend_weight']:.1f} kg" if pd.notna(latest["trend_weight"]) else "—", trend_hint(latest, "weight", " kg")),
+                 ("Body Fat", f"{latest['trend_body_fat']:.1f}%" if pd.notna(latest["trend_body_fat"]) else "—", trend_hint(latest, "body_fat", "%")),
+                 ("Lean Mass", f"{latest['trend_lean_mass']:.1f} kg" if pd.notna(latest["trend_lean_mass"]) else "—", trend_hint(latest, "lean_mass", " kg")),
              ]
 
         for label, val, hint in tiles_data:
@@ -381,14 +503,10 @@ with tab_home:
     with c2:
         st.markdown('<div class="section-title">Recent Activity</div>', unsafe_allow_html=True)
         st.markdown('<div class="card">', unsafe_allow_html=True)
-        if df_logs is not None and not df_logs.empty:
-            # Show last 3 valid logs
-            recent = df_logs[df_logs["skipped"]==0].head(3)
-            if recent.empty:
-                 st.write("No logs yet.")
-            else:
-                 for i, row in recent.iterrows():
-                     st.write(f"**{row['log_date']}**: {row['exercise_name']}")
+        # Last 3 valid logs
+        if not recent.empty:
+            for i, row in recent.iterrows():
+                st.write(f"**{fmt_day(row['log_date'])}**: {row['exercise_name']}")
         else:
             st.write("No logs yet. Start today!")
         st.markdown("</div>", unsafe_allow_html=True)
@@ -396,22 +514,7 @@ with tab_home:
 # -----------------------------
 # WORKOUT TAB
 # -----------------------------
-def fetch_last_log(conn, exercise_name):
-    # Fetch the most recent log for this specific exercise
-    q = """
-    SELECT log_date, actual_sets, actual_reps, weight, notes 
-    FROM workout_logs 
-    WHERE exercise_name = ? AND skipped = 0
-    ORDER BY log_date DESC 
-    LIMIT 1
-    """
-    try:
-        df = pd.read_sql_query(q, conn, params=[exercise_name])
-        return df.iloc[0] if not df.empty else None
-    except Exception:
-        return None
-
-with tab_workout:
+def render_workout():
     # 1. Day Selection
     day_options = DAY_ORDER
     try:
@@ -422,34 +525,33 @@ with tab_workout:
     selected_day = st.selectbox("Select Workout For:", day_options, index=default_index)
     
     # Load plan for Selected Day
-    schedule = data.get("schedule", {})
-    day_plan = schedule.get(selected_day, {})
-    exercises = day_plan.get("exercises", [])
+    day_plan = plan.days[selected_day]
+    exercises = day_plan.exercises
     
     st.markdown(f'<div class="section-title">Plan: {selected_day}</div>', unsafe_allow_html=True)
-    st.info(f"**Focus:** {day_plan.get('focus','—')}  |  **Intensity:** {day_plan.get('intensity','—')}  |  **Core:** {day_plan.get('core','—')}")
-
-    conn = connect_db() # Open connection once for history lookups
+    st.info(f"**Focus:** {day_plan.focus or '—'}  |  **Intensity:** {day_plan.intensity or '—'}  |  **Core:** {day_plan.core or '—'}")
 
     if not exercises:
         st.write("No planned exercises for this day.")
     else:
+        # History lookup for every planned exercise in one query
+        last_logs = cached_fetch("last_logs", day_plan.exercise_names)
+
         with st.form("log_form"):
             log_entries = []
             for i, ex in enumerate(exercises):
-                ex_name = ex.get('name')
+                ex_name = ex.name
                 
-                # History Lookup
-                last_log = fetch_last_log(conn, ex_name)
+                last_log = last_logs.loc[ex_name] if ex_name in last_logs.index else None
                 history_str = "No history yet"
                 if last_log is not None:
                     # Format: 2026-02-01: 3x10 @ 50.0kg (Note: ...)
                     w_str = f"{last_log['weight']}kg" if last_log['weight'] > 0 else "BW"
                     note_str = f" | 📝 {last_log['notes']}" if last_log['notes'] else ""
-                    history_str = f"⏮️ **Last ({last_log['log_date']}):** {last_log['actual_sets']} sets x {last_log['actual_reps']} reps @ **{w_str}**{note_str}"
+                    history_str = f"⏮️ **Last ({fmt_day(last_log['log_date'])}):** {last_log['actual_sets']} sets x {last_log['actual_reps']} reps @ **{w_str}**{note_str}"
 
                 st.markdown(f"### {i+1}. {ex_name}")
-                st.caption(f"Target: {ex.get('sets')} x {ex.get('reps')} | {ex.get('notes','')}")
+                st.caption(f"Target: {ex.sets} x {ex.reps} | {ex.notes}")
                 
                 # Display History clearly
                 if last_log is not None:
@@ -471,8 +573,8 @@ with tab_workout:
                 st.markdown("---")
                 
                 log_entries.append({
-                    "name": ex_name, "pset": str(ex.get("sets")), "prep": str(ex.get("reps")),
-                    "aset": s, "arep": r, "awt": w, "skip": sk, "note": n
+                    "exercise_name": ex_name, "planned_sets": str(ex.sets), "planned_reps": str(ex.reps),
+                    "actual_sets": s, "actual_reps": r, "weight": w, "skipped": 1 if sk else 0, "notes": n
                 })
             
             # Additional Workouts (Expander for clean UI)
@@ -488,33 +590,30 @@ with tab_workout:
             sub = st.form_submit_button("Save Workout")
             
             if sub:
-                cur = conn.cursor()
-                # 1. Save Planned
-                for e in log_entries:
-                    cur.execute("INSERT INTO workout_logs (log_date, day_name, exercise_name, planned_sets, planned_reps, actual_sets, actual_reps, weight, skipped, notes) VALUES (?,?,?,?,?,?,?,?,?,?)",
-                               (today.isoformat(), selected_day, e["name"], e["pset"], e["prep"], e["aset"], e["arep"], e["awt"], 1 if e["skip"] else 0, e["note"]))
-                # 2. Save Custom if entered
+                # Planned entries + custom exercise in one transaction; saving again updates today's session
+                custom = None
                 if cx_name:
-                    cur.execute("INSERT INTO custom_exercises (log_date, day_name, exercise_name, actual_sets, actual_reps, weight, notes) VALUES (?,?,?,?,?,?,?)",
-                                (today.isoformat(), selected_day, cx_name, cx_s, cx_r, cx_w, cx_note))
-                conn.commit()
-                st.success(f"Logged workout for {selected_day}!")
-                
-    conn.close()
+                    custom = {"exercise_name": cx_name, "actual_sets": cx_s, "actual_reps": cx_r, "weight": cx_w, "notes": cx_note}
+                status = submit_write("workout_session", f"{selected_day}'s workout", log_date=today.isoformat(),
+                                      day_name=selected_day, entries=log_entries, custom=custom)
+                if status.state == WRITTEN:
+                    result = status.result
+                    st.success(f"Logged workout for {selected_day}!")
+                    # No result when the write had already been committed, e.g. by another process draining the queue
+                    if result is not None:
+                        st.caption(f"{result.inserted} new, {result.updated} updated, {result.custom} custom • saved in {status.latency_ms:.0f} ms")
 
 # -----------------------------
 # PLAN TAB
 # -----------------------------
-with tab_plan:
+def render_plan():
     st.markdown('<div class="section-title">Weekly Schedule</div>', unsafe_allow_html=True)
-    schedule = data.get("schedule", {})
     for d in DAY_ORDER:
-        with st.expander(f"{d}: {schedule.get(d,{}).get('focus','Rest')}", expanded=(d==today_day_name)):
-            p = schedule.get(d,{})
-            st.write(f"Intensity: {p.get('intensity')} | Core: {p.get('core')}")
-            df = pd.DataFrame(p.get("exercises",[]))
-            if not df.empty:
-                st.dataframe(df[["name","sets","reps","tempo"]], hide_index=True, use_container_width=True)
+        p = plan.days[d]
+        with st.expander(f"{d}: {p.focus or 'Rest'}", expanded=(d==today_day_name)):
+            st.write(f"Intensity: {p.intensity} | Core: {p.core}")
+            if not p.frame.empty:
+                st.dataframe(p.frame, hide_index=True, use_container_width=True)
 
 # -----------------------------
 # PROGRESS TAB
@@ -522,86 +621,290 @@ with tab_plan:
 # -----------------------------
 # PROGRESS TAB (Enterprise Analytics)
 # -----------------------------
-with tab_progress:
+def render_progress():
+    import plotly.express as px  # deferred: ~300 ms that only this tab needs
+
     st.markdown('<div class="section-title">Analytics</div>', unsafe_allow_html=True)
-    conn = connect_db()
-    logs = fetch_logs(conn)
-    metrics = fetch_metrics(conn)
-    conn.close()
-    
+    default_range = (today - timedelta(days=PROGRESS_DEFAULT_DAYS - 1), today)
+    picked = st.date_input("Date range", kept("progress_range", default_range), max_value=today, key="progress_range",
+                           on_change=keep, args=("progress_range",))
+    # Mid-selection the widget returns only a start date; keep the default until both are picked
+    range_start, range_end = picked if isinstance(picked, (tuple, list)) and len(picked) == 2 else default_range
+    range_days = (range_end - range_start).days + 1
+    logs = cached_history("workout_logs", range_start.isoformat(), range_end.isoformat(), ["skipped"])
+
     if not logs.empty:
-        # Data Prep
-        logs["log_date"] = pd.to_datetime(logs["log_date"])
-        logs["fmt_date"] = logs["log_date"].dt.strftime("%d-%b") # "04-Feb"
-        
-        # Aggregation
-        daily = logs[logs["skipped"]==0].groupby("fmt_date", sort=False).size().reset_index(name="count")
+        # Aggregation: bucket size follows the range so the chart stays under MAX_BARS bars
+        done = logs.loc[logs["skipped"] == 0, "log_date"]
+        bucket = pick_bucket(range_start, range_end, MAX_BARS)
+        with perf.span("aggregate.consistency") as info:
+            series = activity_buckets(done, bucket)
+            info["rows"] = len(series)
+        labeled = len(series) <= LABELED_BARS
         
         # Enterprise Grade Chart
-        fig = px.bar(daily, x="fmt_date", y="count", 
-                     title="<b>Workout Consistency</b>",
-                     text="count")
+        with perf.span("figure.consistency"):
+            fig = px.bar(series, x="bucket", y="exercises", custom_data=["active_days"],
+                         title="<b>Workout Consistency</b>" + ("" if bucket == "day" else f" <span style='font-size:13px;color:#8E8E93'>per {bucket}</span>"),
+                         text="exercises" if labeled else None)
         
-        fig.update_traces(
-            marker_color="#000000", # Minimalist Black
-            marker_line_width=0,
-            opacity=0.9,
-            textposition='auto',
-            hovertemplate='<b>%{x}</b><br>Workouts: %{y}<extra></extra>'
-        )
+            fig.update_traces(
+                marker_color="#000000", # Minimalist Black
+                marker_line_width=0,
+                opacity=0.9,
+                textposition='auto',
+                hovertemplate=f'<b>%{{x|{BUCKET_HOVER[bucket]}}}</b><br>Exercises: %{{y}}<br>Active days: %{{customdata[0]}}<extra></extra>'
+            )
         
-        fig.update_layout(
-            font_family="Inter",
-            font_color="#000000",
-            title_font_size=18,
-            title_x=0, # Left align title like enterprise dashboards
-            margin=dict(l=0, r=20, t=40, b=10),
-            plot_bgcolor="rgba(0,0,0,0)",
-            paper_bgcolor="rgba(0,0,0,0)",
-            height=250,
-            bargap=0.3,
-            xaxis=dict(
-                title=None,
-                showgrid=False,
-                linecolor="#E5E5EA",
-                tickfont=dict(size=12, color="#8E8E93"),
-                tickangle=0 # Keep labels horizontal if possible
-            ),
-            yaxis=dict(
-                title=None,
-                showgrid=True,
-                gridcolor="#F2F2F7", # Very subtle grid
-                showticklabels=False, # Clean look, since we have value labels on bars
-                zeroline=False
+            fig.update_layout(
+                font_family="Inter",
+                font_color="#000000",
+                title_font_size=18,
+                title_x=0, # Left align title like enterprise dashboards
+                margin=dict(l=0, r=20, t=40, b=10),
+                plot_bgcolor="rgba(0,0,0,0)",
+                paper_bgcolor="rgba(0,0,0,0)",
+                height=250,
+                bargap=0.3,
+                xaxis=dict(
+                    title=None,
+                    showgrid=False,
+                    linecolor="#E5E5EA",
+                    tickfont=dict(size=12, color="#8E8E93"),
+                    tickformat=BUCKET_TICKS[bucket], # Real dates, so buckets from different years never share a label
+                    tickangle=0 # Keep labels horizontal if possible
+                ),
+                yaxis=dict(
+                    title=None,
+                    showgrid=True,
+                    gridcolor="#F2F2F7", # Very subtle grid
+                    showticklabels=not labeled, # Clean look while the bars carry value labels
+                    zeroline=False
+                )
             )
-        )
         st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': False})
         
         # Enterprise Stats Row
         c1, c2, c3 = st.columns(3)
-        total_workouts = len(daily)
-        total_exercises = len(logs[logs["skipped"]==0])
-        consistency = f"{int((len(daily)/30)*100)}%" if len(daily) > 0 else "0%"
+        total_workouts = done.dt.normalize().nunique()
+        total_exercises = len(done)
+        consistency = f"{int((total_workouts/range_days)*100)}%" if total_workouts > 0 else "0%"
         
-        with c1: st.metric("Active Days (30d)", total_workouts)
+        with c1: st.metric(f"Active Days ({range_days}d)", total_workouts)
         with c2: st.metric("Total Exercises", total_exercises)
         with c3: st.metric("Consistency", consistency)
 
     else:
-        st.info("Log some workouts to see analytics.")
+        st.info("No workouts logged in this range.")
+
+    render_overload(px, range_start, range_end)
+    render_set_details(range_start, range_end)
+    render_body_trend(range_start, range_end)
+    render_note_search()
 
     st.markdown("### Export Data")
-    if st.button("Generate Backup JSON"):
-        export = {
-            "logs": logs.to_dict(orient="records"),
-            "metrics": metrics.to_dict(orient="records")
-        }
-        st.download_button("Download JSON", json.dumps(export, default=str), "backup.json")
+    # Generated only when clicked, from one consistent snapshot; Streamlit holds the compressed file in memory
+    st.download_button("Download Backup", data=lambda: export_bytes(db_path),
+                       file_name=f"fitness_backup_{athlete + '_' if athlete else ''}{today:%Y%m%d}.ndjson.gz",
+                       mime="application/gzip")
+    st.caption("All workout, custom exercise, sports and body metric logs and the profile as gzip-compressed NDJSON. "
+               "The file is built in memory; for a long history use `python backup.py export` or `GET /api/export`.")
+
+    st.markdown("### Restore Data")
+    upload = st.file_uploader("Backup file", type=["gz", "ndjson", "json"], key="restore_file")
+    dedupe = st.checkbox("Skip rows that already exist", value=True, key="restore_dedupe")
+    if upload is not None and st.button("Restore Backup"):
+        with st.spinner("Restoring..."):
+            result = import_backup(upload, db_path, dedupe=dedupe)
+        msg = f"Restored {result.written} rows ({result.duplicates} duplicates skipped, {result.invalid} invalid) in {result.seconds:.1f}s"
+        if result.complete and not result.invalid:
+            st.success(msg)
+        elif result.complete:
+            st.warning(msg)
+        else:
+            # Damaged or cut-off file: what was read is kept, the rest is missing
+            st.error(msg)
+            for err in result.errors:
+                st.caption(err)
+
+# Most recent drops listed under Set Details
+DROP_SETS_SHOWN = 50
+
+OVERLOAD_LAYOUT = dict(
+    font_family="Inter", font_color="#000000", title_font_size=18, title_x=0,
+    margin=dict(l=0, r=20, t=40, b=10), plot_bgcolor="rgba(0,0,0,0)", paper_bgcolor="rgba(0,0,0,0)",
+    height=300, legend=dict(orientation="h", title=None, y=-0.2),
+    xaxis=dict(title=None, showgrid=False, linecolor="#E5E5EA", tickfont=dict(size=12, color="#8E8E93")),
+    yaxis=dict(title=None, gridcolor="#F2F2F7", zeroline=False),
+)
+
+def render_overload(px, range_start, range_end):
+    import plotly.graph_objects as go  # deferred with plotly.express
+    st.markdown('<div class="section-title">Progressive Overload</div>', unsafe_allow_html=True)
+    overload = get_overload(db_path)
+    with perf.span("overload.refresh") as info:
+        info["rows"] = overload.refresh()  # weeks recomputed
+    sessions, weekly = overload.sessions, overload.weekly
+    start, end = pd.Timestamp(range_start), pd.Timestamp(range_end)
+    # Whole weeks that overlap the range, so the first and last bars are not partial
+    weekly = weekly[(weekly["week_start"] > start - pd.Timedelta(days=7)) & (weekly["week_start"] <= end)]
+    if weekly.empty:
+        st.info("Log sets, reps and weight to see volume and estimated 1RM trends.")
+        return
+
+    # Weekly bars for up to MAX_BARS weeks; longer ranges are summed per month or year
+    bucket = pick_bucket(range_start, range_end, MAX_BARS, finest="week")
+    with perf.span("figure.focus_volume"):
+        volume = focus_volume(weekly, plan)
+        if bucket != "week":
+            volume["week_start"] = bucket_start(volume["week_start"], bucket)
+            volume = volume.groupby(["week_start", "focus"], as_index=False)[["sets", "tonnage"]].sum()
+        fig = px.bar(volume, x="week_start", y="tonnage", color="focus", title=f"<b>Volume by Focus (kg per {bucket})</b>",
+                     color_discrete_sequence=px.colors.qualitative.Safe)
+        fig.update_traces(hovertemplate=f"%{{x|{BUCKET_HOVER[bucket]}}}<br>%{{y:,.0f}} kg<extra></extra>")
+        fig.update_layout(**OVERLOAD_LAYOUT, bargap=0.3)
+        fig.update_xaxes(tickformat=BUCKET_TICKS[bucket])
+    st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': False})
+
+    rated = sessions[sessions["e1rm"].notna()]
+    # Most recently trained first
+    exercises = rated.groupby("exercise_name", observed=True)["log_date"].max().sort_values(ascending=False).index
+    if exercises.empty:
+        return
+    exercise = st.selectbox("Exercise", list(exercises), kept_index("overload_exercise", list(exercises)), key="overload_exercise",
+                            on_change=keep, args=("overload_exercise",))
+    history = rated[rated["exercise_name"] == exercise]
+    shown = history[(history["log_date"] >= start) & (history["log_date"] <= end)]
+
+    with perf.span("figure.e1rm") as info:
+        points, hover = shown, BUCKET_HOVER["day"]
+        if len(shown) > MAX_LINE_POINTS:
+            # One point per bucket: its best estimate, where the PR line ended, and whether it set a PR
+            bucket = pick_bucket(range_start, range_end, MAX_LINE_POINTS)
+            points = shown.groupby(bucket_start(shown["log_date"], bucket)).agg(
+                e1rm=("e1rm", "max"), best_e1rm=("best_e1rm", "last"), is_pr=("is_pr", "any"),
+            ).rename_axis("log_date").reset_index()
+            hover = BUCKET_HOVER[bucket]
+        info["rows"] = len(points)
+        # Long series render through WebGL; SVG slows down with thousands of markers, especially on phones
+        Scatter = go.Scattergl if webgl(len(points)) else go.Scatter
+        prs = points[points["is_pr"]]
+        fig = go.Figure([
+            Scatter(x=points["log_date"], y=points["e1rm"], mode="markers", marker=dict(color="#8E8E93"), name="Session",
+                    hovertemplate=f"%{{x|{hover}}}<br>%{{y:.1f}} kg<extra></extra>"),
+            Scatter(x=points["log_date"], y=points["best_e1rm"], mode="lines", line=dict(color="#000000", width=2, shape="hv"),
+                    name="Best", hoverinfo="skip"),
+            Scatter(x=prs["log_date"], y=prs["e1rm"], mode="markers", marker=dict(color="#FF2D55", size=10), name="PR",
+                    hovertemplate=f"PR %{{x|{hover}}}<br>%{{y:.1f}} kg<extra></extra>"),
+        ])
+        fig.update_layout(title="<b>Estimated 1RM</b>", **OVERLOAD_LAYOUT)
+    st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': False})
+
+    last = history.iloc[-1]
+    c1, c2, c3 = st.columns(3)
+    with c1: st.metric("Best e1RM", f"{last['best_e1rm']:.1f} kg")
+    with c2: st.metric("Last Session Volume", f"{last['tonnage']:,.0f} kg")
+    with c3: st.metric("PRs in Range", int(sessions.loc[(sessions["log_date"] >= start) & (sessions["log_date"] <= end), "is_pr"].sum()))
+
+def render_set_details(range_start, range_end):
+    # From the sets parsed out of exercise notes (set_notes.py), not the session's sets x reps x weight
+    sets = cached_fetch("set_volume", range_start.isoformat(), range_end.isoformat())
+    if sets.empty:
+        return
+    st.markdown('<div class="section-title">Set Details</div>', unsafe_allow_html=True)
+    c1, c2, c3 = st.columns(3)
+    with c1: st.metric("Sets in Notes", f"{int(sets['sets'].sum()):,}")
+    with c2: st.metric("Set Volume", f"{sets['tonnage'].sum():,.0f} kg")
+    with c3: st.metric("Drop Sets", int(sets["drop_sets"].sum()))
+    drops = cached_fetch("drop_sets")
+    start, end = pd.Timestamp(range_start), pd.Timestamp(range_end)
+    drops = drops[(drops["log_date"] >= start) & (drops["log_date"] <= end)]
+    if not drops.empty:
+        with st.expander(f"Drop sets ({len(drops)})"):
+            shown = drops.iloc[::-1].head(DROP_SETS_SHOWN).assign(drop_pct=lambda d: d["drop_pct"] * 100)
+            st.dataframe(shown[["log_date", "exercise_name", "prev_weight", "weight", "reps", "drop_pct"]], hide_index=True,
+                         use_container_width=True, column_config={
+                             "log_date": st.column_config.DateColumn("Date"), "exercise_name": "Exercise",
+                             "prev_weight": st.column_config.NumberColumn("From (kg)", format="%.1f"),
+                             "weight": st.column_config.NumberColumn("To (kg)", format="%.1f"), "reps": "Reps",
+                             "drop_pct": st.column_config.NumberColumn("Drop", format="%.0f%%"),
+                         })
+
+BODY_METRICS = {"Weight": ("weight", " kg"), "Body Fat": ("body_fat", "%"), "Lean Mass": ("lean_mass", " kg")}
+
+def render_body_trend(range_start, range_end):
+    import plotly.graph_objects as go  # deferred with plotly.express
+    st.markdown('<div class="section-title">Body Composition</div>', unsafe_allow_html=True)
+    trend = refreshed_body_trend().trend
+    if trend.empty:
+        st.info("Log weight and body fat in Settings to see your trend.")
+        return
+    label = st.selectbox("Metric", list(BODY_METRICS), kept_index("body_metric", list(BODY_METRICS)), key="body_metric",
+                         on_change=keep, args=("body_metric",))
+    metric, unit = BODY_METRICS[label]
+    start, end = pd.Timestamp(range_start), pd.Timestamp(range_end)
+    shown = trend.loc[(trend["log_date"] >= start) & (trend["log_date"] <= end), ["log_date", metric, f"trend_{metric}"]]
+
+    with perf.span("figure.body_trend") as info:
+        points, hover = shown, BUCKET_HOVER["day"]
+        if len(shown) > MAX_LINE_POINTS:
+            # One point per bucket: the mean reading and where the trend ended
+            bucket = pick_bucket(range_start, range_end, MAX_LINE_POINTS)
+            points = shown.groupby(bucket_start(shown["log_date"], bucket)).agg(
+                **{metric: (metric, "mean"), f"trend_{metric}": (f"trend_{metric}", "last")}
+            ).rename_axis("log_date").reset_index()
+            hover = BUCKET_HOVER[bucket]
+        info["rows"] = len(points)
+        Scatter = go.Scattergl if webgl(len(points)) else go.Scatter
+        fig = go.Figure([
+            Scatter(x=points["log_date"], y=points[metric], mode="markers", marker=dict(color="#8E8E93"), name="Reading",
+                    hovertemplate=f"%{{x|{hover}}}<br>%{{y:.1f}}{unit}<extra></extra>"),
+            Scatter(x=points["log_date"], y=points[f"trend_{metric}"], mode="lines", line=dict(color="#000000", width=2),
+                    name="Trend", hovertemplate=f"%{{x|{hover}}}<br>Trend %{{y:.1f}}{unit}<extra></extra>"),
+        ])
+        goal = body_goal(metric)
+        if goal is not None:
+            fig.add_hline(y=goal, line=dict(color="#FF2D55", dash="dot"), annotation_text=f"Goal {goal:g}{unit}")
+        fig.update_layout(title=f"<b>{label} Trend</b>", **OVERLOAD_LAYOUT)
+    st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': False})
+
+    latest = trend.iloc[-1]
+    rate = latest[f"rate_{metric}"]
+    projection = project_goal(latest, metric, goal, today)
+    c1, c2, c3 = st.columns(3)
+    with c1: st.metric("Trend", f"{latest[f'trend_{metric}']:.1f}{unit}" if pd.notna(latest[f"trend_{metric}"]) else "—")
+    with c2: st.metric("Per Week", f"{rate:+.2f}{unit}" if pd.notna(rate) else "—")
+    with c3: st.metric("Goal Date", "—" if projection is None else {
+        REACHED: "Reached", OFF_TRACK: "Off pace",
+        ON_TRACK: f"{projection.eta:%d %b %Y}",
+    }[projection.status])
+
+@st.fragment
+def render_note_search():
+    # A fragment, so each search reruns only this section and not the charts above
+    st.markdown('<div class="section-title">Search Notes</div>', unsafe_allow_html=True)
+    text = st.text_input("Search notes", kept("note_search", ""), key="note_search", label_visibility="collapsed",
+                         on_change=keep, args=("note_search",),
+                         placeholder='Search workout, sport and body notes, e.g. shoulder pain or "felt heavy"')
+    if not text.strip():
+        return
+    with get_pool(db_path).reader() as conn:
+        hits = search_notes(conn, text)
+    if hits.empty:
+        st.caption("No notes match.")
+        return
+    start, end = HIGHLIGHT
+    rows = "".join(
+        f'<div style="margin-bottom:12px"><b>{html.escape(str(h.log_date))}</b> • {html.escape(str(h.name))}<br>'
+        + html.escape(h.snippet).replace(start, '<mark>').replace(end, '</mark>') + '</div>'
+        for h in hits.itertuples()
+    )
+    st.markdown(f'<div class="card">{rows}</div>', unsafe_allow_html=True)
 
 # -----------------------------
 # NUTRITION & RECOVERY (Simplified)
 # -----------------------------
-with tab_nutrition:
+def render_nutrition():
     st.markdown('<div class="section-title">Nutrition</div>', unsafe_allow_html=True)
     st.markdown('<div class="card">Daily Targets: Protein 2g/kg | Creatine 5g | Water 3L</div>', unsafe_allow_html=True)
     with st.form("nutri_log"):
@@ -612,7 +915,7 @@ with tab_nutrition:
         with cC: f = st.number_input("Fats (g)", 0, 200)
         st.form_submit_button("Log Macros")
 
-with tab_recovery:
+def render_recovery():
     st.markdown('<div class="section-title">Recovery Checklist</div>', unsafe_allow_html=True)
     st.markdown("""
     <div class="card">
@@ -625,17 +928,73 @@ with tab_recovery:
 # -----------------------------
 # SETTINGS
 # -----------------------------
-with tab_settings:
+def render_settings():
     st.markdown('<div class="section-title">Body Metrics</div>', unsafe_allow_html=True)
     with st.form("body_metrics"):
-        w = st.number_input("Weight (kg)", 0.0, 200.0, step=0.1)
-        bf = st.number_input("Body Fat %", 0.0, 50.0, step=0.1)
+        # Empty by default: a field left blank is stored as NULL, not as a 0 reading
+        w = st.number_input("Weight (kg)", 0.0, 200.0, None, step=0.1)
+        bf = st.number_input("Body Fat %", 0.0, 50.0, None, step=0.1)
         if st.form_submit_button("Update"):
-            conn = connect_db()
-            conn.execute("INSERT INTO body_metrics (log_date, weight, body_fat) VALUES (?,?,?)", 
-                        (date.today().isoformat(), w, bf))
-            conn.commit()
-            conn.close()
-            st.success("Updated")
-
-st.markdown('<div class="footer-hint">Dheeraj\'s Fitness Tracker • Light/Classy Theme</div>', unsafe_allow_html=True)
+            if w is None and bf is None:
+                st.warning("Enter a weight, a body fat %, or both.")
+            else:
+                status = submit_write("body_metrics", "body metrics", log_date=date.today().isoformat(), weight=w, body_fat=bf)
+                if status.state == WRITTEN:
+                    st.success("Updated")
+
+    st.markdown('<div class="section-title">Profile</div>', unsafe_allow_html=True)
+    with st.form("profile"):
+        display_name = st.text_input("Display Name", profile.get("display_name", ""), placeholder="Shown in the header")
+        g1, g2 = st.columns(2)
+        with g1: goal_weight = st.number_input("Goal Weight (kg)", 0.0, 200.0, body_goal("weight") or 0.0, step=0.1, help="0 for no goal")
+        with g2: goal_body_fat = st.number_input("Goal Body Fat %", 0.0, 50.0, body_goal("body_fat") or 0.0, step=0.1, help="0 for no goal")
+        if st.form_submit_button("Save Profile"):
+            save_profile(get_pool(db_path), display_name=display_name.strip(),
+                         goal_weight=f"{goal_weight:g}" if goal_weight else "", goal_body_fat=f"{goal_body_fat:g}" if goal_body_fat else "")
+            st.rerun()
+
+    st.markdown('<div class="section-title">Set Notes</div>', unsafe_allow_html=True)
+    counts = cached_fetch("set_parse_counts")
+    failed = cached_fetch("failed_notes") if counts["failed"] else []
+    st.caption(f"{counts['parsed']} notes parsed into sets • {counts['no_sets']} comments only • "
+               f"{counts['failed']} could not be parsed • {counts['pending']} waiting")
+    if failed:
+        with st.expander(f"Notes that could not be parsed ({counts['failed']})"):
+            st.caption("Write sets as weight x reps: '15kgx10, 12kgx8', '3x10 @ 20kg', or '20kgx10 > 15kgx8' for a drop set.")
+            st.dataframe(pd.DataFrame(failed, columns=["Date", "Exercise", "Notes"]), hide_index=True, use_container_width=True)
+
+    # Hidden unless FITNESS_PERF=1 is set on the server or the page is opened with ?perf=1
+    if perf.enabled() or st.query_params.get("perf") == "1":
+        render_performance()
+
+def render_performance():
+    st.markdown('<div class="section-title">Performance</div>', unsafe_allow_html=True)
+    last = st.session_state.get("perf_last_rerun", [])
+    if last:
+        st.caption(f"Previous rerun: {last[-1]['ms']:.1f} ms total")
+        st.dataframe(pd.DataFrame(last), hide_index=True, use_container_width=True)
+    totals = pd.DataFrame.from_dict(perf.totals(), orient="index")
+    if not totals.empty:
+        totals["avg_ms"] = totals["total_ms"] / totals["calls"]
+        st.caption("Since server start (all sessions)")
+        st.dataframe(totals.sort_values("total_ms", ascending=False).round(3), use_container_width=True)
+    if st.button("Reset Counters"):
+        perf.reset()
+
+# -----------------------------
+# Render
+# -----------------------------
+TAB_RENDERERS = [render_home, render_workout, render_plan, render_progress, render_nutrition, render_recovery, render_settings]
+for tab, label, render in zip(tabs, TAB_LABELS, TAB_RENDERERS):
+    if tab.open or label in EAGER_TABS:
+        with tab, perf.span(f"tab.{render.__name__.removeprefix('render_')}"):
+            render()
+
+# After the tabs, so a save queued during this run is already being polled
+if st.session_state.get("pending_writes"):
+    render_pending_writes()
+
+st.markdown(f'<div class="footer-hint">{html.escape(app_name)} • Light/Classy Theme</div>', unsafe_allow_html=True)
+
+start_background_imports()
+st.session_state["perf_last_rerun"] = perf.end_rerun(tab=st.session_state.get("active_tab"))
@@ -0,0 +1,36 @@
+import argparse
+import os
+import time
+from db import DB_PATH, backfill_sets, fetch_failed_notes, fetch_set_parse_counts, get_pool, init_db, queue_all_notes
+
+def backfill(path, reparse=False):
+    pool = get_pool(path)
+    if reparse:
+        with pool.writer() as conn:
+            queue_all_notes(conn)
+    t0 = time.perf_counter()
+    done = backfill_sets(pool, progress=lambda n: print(f" - {n} notes parsed", flush=True))
+    with pool.reader() as conn:
+        counts = fetch_set_parse_counts(conn)
+        sets = conn.execute("SELECT COUNT(*) FROM workout_sets").fetchone()[0]
+    print(f"✅ Parsed {done} notes in {time.perf_counter() - t0:.1f}s. {counts['parsed']} notes hold {sets} sets; {counts['no_sets']} are comments only.")
+    if counts["failed"]:
+        print(f"❌ {counts['failed']} note(s) look like sets but could not be parsed. Use formats like '15kgx10, 12kgx8'.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parse workout notes into the per-set table.")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--reparse", action="store_true", help="Discard parsed sets and parse every note again.")
+    parser.add_argument("--show-failed", type=int, default=0, metavar="N", help="Also list up to N notes that failed to parse.")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f"Database at {args.db} not found.")
+        raise SystemExit(1)
+    init_db(args.db)
+    backfill(args.db, args.reparse)
+    if args.show_failed:
+        with get_pool(args.db).reader() as conn:
+            rows = fetch_failed_notes(conn, args.show_failed)
+        for log_date, name, notes in rows:
+            print(f" - {log_date} {name}: {notes!r}")
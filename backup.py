@@ -0,0 +1,369 @@
+"""Streaming backups of the tracker database.
+
+    python backup.py export fitness_backup.ndjson.gz
+    python backup.py snapshot fitness_backup.db
+    python backup.py restore fitness_backup.ndjson.gz [--dedupe]
+
+`export` writes gzip-compressed NDJSON: a header line, one line per row of
+every data table and the athlete profile, then a footer with per-table row counts. Rows are read
+inside a single read transaction, so the file is a consistent snapshot,
+and are streamed in batches, so memory use does not grow with history.
+`snapshot` copies the whole database file with SQLite's online backup API.
+`restore` streams an export (or a legacy backup.json) back in, validating
+each row and committing in large batches. Progress is checkpointed in the
+database with every batch, so an interrupted restore resumes where it
+stopped when run again.
+"""
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import time
+import zlib
+from collections import namedtuple
+from datetime import date, datetime
+
+from db import COLUMN_RANGES, DB_PATH, DATA_TABLES, get_pool, init_db, parse_pending, schema_version
+
+EXPORT_FORMAT = "fitness-tracker-ndjson"
+EXPORT_VERSION = 1
+FETCH_BATCH = 1000
+IMPORT_BATCH = 5000
+
+# The log tables plus the profile (display name, goals), which has no log_date
+EXPORT_TABLES = DATA_TABLES + ["athlete_profile"]
+# Tables with a unique natural key; the rest are de-duplicated on every column
+NATURAL_KEYS = {
+    "workout_logs": ["log_date", "day_name", "exercise_name"],
+    "custom_exercises": ["log_date", "day_name", "exercise_name"],
+    "athlete_profile": ["key"],
+}
+REQUIRED_COLUMNS = {
+    "workout_logs": ["exercise_name"],
+    "custom_exercises": ["exercise_name"],
+    "athlete_profile": ["key"],
+}
+# Sections of the pre-NDJSON backup.json written by older versions of the app
+LEGACY_SECTIONS = {"logs": "workout_logs", "metrics": "body_metrics"}
+MAX_REPORTED_ERRORS = 20
+
+ImportResult = namedtuple("ImportResult", ["written", "duplicates", "invalid", "errors", "resumed_from", "complete", "seconds"])
+
+def _open_output(out):
+    if isinstance(out, (str, os.PathLike)):
+        return gzip.open(out, "wt", encoding="utf-8")
+    return io.TextIOWrapper(gzip.GzipFile(fileobj=out, mode="wb"), encoding="utf-8")
+
+def iter_table_rows(conn, table):
+    cur = conn.execute(f"SELECT * FROM {table} ORDER BY rowid")  # id, or insertion order for the profile
+    cols = [c[0] for c in cur.description]
+    for batch in iter(lambda: cur.fetchmany(FETCH_BATCH), []):
+        for row in batch:
+            yield dict(zip(cols, row))
+
+def export_ndjson(out, db_path=DB_PATH, tables=EXPORT_TABLES):
+    """Stream every table to `out` (a path or binary file object). Returns row counts per table."""
+    counts = {}
+    with get_pool(db_path).reader() as conn, _open_output(out) as f:
+        conn.execute("BEGIN")  # one read snapshot across all tables
+        try:
+            header = {
+                "type": "header", "format": EXPORT_FORMAT, "version": EXPORT_VERSION,
+                "schema_version": schema_version(conn), "exported_at": datetime.now().isoformat(timespec="seconds"),
+                "tables": list(tables),
+            }
+            f.write(json.dumps(header) + "\n")
+            for table in tables:
+                counts[table] = 0
+                for row in iter_table_rows(conn, table):
+                    f.write(json.dumps({"table": table, "data": row}, default=str) + "\n")
+                    counts[table] += 1
+            f.write(json.dumps({"type": "footer", "counts": counts}) + "\n")
+        finally:
+            conn.execute("COMMIT")
+    return counts
+
+def export_bytes(db_path=DB_PATH):
+    # For st.download_button, which needs the whole file: the compressed output is held in memory.
+    # The CLI export and GET /api/export stream instead.
+    buf = io.BytesIO()
+    export_ndjson(buf, db_path)
+    return buf.getvalue()
+
+def snapshot_db(dest_path, db_path=DB_PATH, pages=1024):
+    """Consistent copy of the whole database file via the online backup API."""
+    dest = sqlite3.connect(dest_path)
+    try:
+        with get_pool(db_path).reader() as conn:
+            conn.backup(dest, pages=pages)
+    finally:
+        dest.close()
+
+# -----------------------------
+# Restore
+# -----------------------------
+def _open_input(src):
+    f = open(src, "rb") if isinstance(src, (str, os.PathLike)) else src
+    magic = f.read(2)
+    f.seek(0)
+    if magic == b"\x1f\x8b":
+        f = gzip.GzipFile(fileobj=f, mode="rb")
+    return io.TextIOWrapper(f, encoding="utf-8")
+
+def _fingerprint(src):
+    # Identifies a backup file across runs for checkpointing, without reading all of it
+    f = open(src, "rb") if isinstance(src, (str, os.PathLike)) else src
+    try:
+        h = hashlib.sha1(f.read(1 << 16))
+        f.seek(0, os.SEEK_END)
+        h.update(str(f.tell()).encode())
+        f.seek(0)
+    finally:
+        if f is not src:
+            f.close()
+    return h.hexdigest()
+
+# A damaged file: cut off mid-stream, corrupt gzip data, or not text at all
+UNREADABLE_ERRORS = (EOFError, OSError, zlib.error, UnicodeDecodeError)
+
+def iter_backup_records(f):
+    """Yield (line_no, table, row) from an NDJSON export or a legacy backup.json; ("footer", counts) last if present.
+
+    A line that is not a JSON object yields (line_no, "invalid", reason) and
+    reading goes on; a file that cannot be read any further yields
+    (line_no, "unreadable", reason) and ends.
+    """
+    try:
+        first = f.readline()
+    except UNREADABLE_ERRORS as e:
+        yield 1, "unreadable", f"{type(e).__name__}: {e}"
+        return
+    try:
+        header = json.loads(first)
+    except json.JSONDecodeError:
+        header = None
+    if isinstance(header, dict) and header.get("format") == EXPORT_FORMAT:
+        line_no = 1
+        while True:
+            line_no += 1
+            try:
+                line = f.readline()
+            except UNREADABLE_ERRORS as e:
+                yield line_no, "unreadable", f"{type(e).__name__}: {e}"
+                return
+            if not line:
+                return
+            if not line.strip():
+                continue
+            try:
+                rec = json.loads(line)
+            except json.JSONDecodeError:
+                # Also what a line cut off by a truncated file looks like
+                yield line_no, "invalid", "not valid JSON"
+                continue
+            if not isinstance(rec, dict):
+                yield line_no, "invalid", "not a JSON object"
+            elif rec.get("type") == "footer":
+                yield line_no, "footer", rec.get("counts", {})
+            else:
+                yield line_no, rec.get("table"), rec.get("data")
+    # Legacy backup.json is a single JSON document; it was only ever small
+    try:
+        legacy = json.loads(first + f.read())
+    except (json.JSONDecodeError, *UNREADABLE_ERRORS):
+        legacy = None
+    if not isinstance(legacy, dict):
+        yield 1, "unreadable", "neither an NDJSON export nor a backup.json"
+        return
+    line_no, counts = 0, {}
+    for section, table in LEGACY_SECTIONS.items():
+        rows = legacy.get(section, [])
+        counts[table] = len(rows)
+        for row in rows:
+            line_no += 1
+            yield line_no, table, row
+    yield line_no + 1, "footer", counts
+
+def table_columns(conn):
+    return {
+        t: {name: ctype.upper() for _, name, ctype, *_ in conn.execute(f"PRAGMA table_info({t})")}
+        for t in EXPORT_TABLES
+    }
+
+def validate_row(table, row, columns):
+    # Returns (clean_row, None) or (None, reason)
+    if table not in columns:
+        return None, f"unknown table {table!r}"
+    if not isinstance(row, dict):
+        return None, "row is not an object"
+    clean = {}
+    for col, ctype in columns[table].items():
+        if col == "id" or col not in row:
+            continue
+        val = row[col]
+        if val is None or (isinstance(val, float) and val != val):
+            clean[col] = None
+        elif col == "log_date":
+            try:
+                clean[col] = date.fromisoformat(str(val)[:10]).isoformat()
+            except ValueError:
+                return None, f"bad log_date {val!r}"
+        elif ctype in ("INTEGER", "REAL"):
+            try:
+                num = float(val)
+            except (TypeError, ValueError):
+                return None, f"{col} is not a number: {val!r}"
+            if ctype == "INTEGER":
+                if not num.is_integer():
+                    return None, f"{col} is not an integer: {val!r}"
+                num = int(num)
+            low, high = COLUMN_RANGES.get(table, {}).get(col, (-float("inf"), float("inf")))
+            if not low <= num <= high:
+                return None, f"{col} must be between {low} and {high}: {val!r}"
+            clean[col] = num
+        else:
+            clean[col] = str(val)
+    if "log_date" in columns[table] and not clean.get("log_date"):
+        return None, "missing log_date"
+    for col in REQUIRED_COLUMNS.get(table, []):
+        if not clean.get(col):
+            return None, f"missing {col}"
+    return clean, None
+
+def _insert_sql(table, cols, dedupe):
+    # Returns (sql, match_cols); match_cols are bound again after the row values for the dedupe check
+    placeholders = ", ".join("?" * len(cols))
+    insert = f"INSERT INTO {table} ({', '.join(cols)})"
+    key = NATURAL_KEYS.get(table)
+    has_key = bool(key) and all(c in cols for c in key)
+    if dedupe:
+        # Null-safe match on the natural key, or on every column for tables without one
+        match_cols = key if has_key else list(cols)
+        match = " AND ".join(f"{c} IS ?" for c in match_cols)
+        return f"{insert} SELECT {placeholders} WHERE NOT EXISTS (SELECT 1 FROM {table} WHERE {match})", match_cols
+    if has_key:
+        updates = ", ".join(f"{c} = excluded.{c}" for c in cols if c not in key)
+        action = f"DO UPDATE SET {updates}" if updates else "DO NOTHING"
+        return f"{insert} VALUES ({placeholders}) ON CONFLICT({', '.join(key)}) {action}", []
+    return f"{insert} VALUES ({placeholders})", []
+
+def _write_batch(pool, batch, dedupe, source, line_no):
+    written = 0
+    with pool.writer() as conn:
+        for (table, cols), rows in batch.items():
+            sql, match_cols = _insert_sql(table, cols, dedupe)
+            if match_cols:
+                idx = [cols.index(c) for c in match_cols]
+                rows = [r + tuple(r[i] for i in idx) for r in rows]
+            written += conn.executemany(sql, rows).rowcount
+        # Restored notes are parsed into workout_sets batch by batch, like the rows themselves
+        parse_pending(conn, limit=IMPORT_BATCH)
+        conn.execute(
+            "INSERT INTO import_checkpoints (source, line, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(source) DO UPDATE SET line = excluded.line, updated_at = excluded.updated_at",
+            (source, line_no, datetime.now().isoformat(timespec="seconds")),
+        )
+    return written
+
+def import_backup(src, db_path=DB_PATH, dedupe=False, batch_size=IMPORT_BATCH, restart=False, progress=None):
+    """Restore a backup (path or binary file object) into db_path.
+
+    Rows are validated and written batch_size at a time, each batch in one
+    transaction together with its checkpoint. With dedupe, rows already in
+    the database are skipped; otherwise backup rows overwrite matching
+    workout and custom-exercise sessions and are appended elsewhere.
+    """
+    t0 = time.perf_counter()
+    init_db(db_path)
+    pool = get_pool(db_path)
+    source = _fingerprint(src)
+    with pool.reader() as conn:
+        columns = table_columns(conn)
+        row = conn.execute("SELECT line FROM import_checkpoints WHERE source = ?", (source,)).fetchone()
+    resume_after = 0 if restart or row is None else row[0]
+
+    written = duplicates = invalid = pending = 0
+    errors, batch, footer = [], {}, None
+    seen = {t: 0 for t in EXPORT_TABLES}
+    last_line = resume_after
+    with _open_input(src) as f:
+        for line_no, table, data in iter_backup_records(f):
+            if table == "footer":
+                footer = data
+                continue
+            if table == "unreadable":
+                errors.append(f"line {line_no}: unreadable, {data}")
+                continue
+            if table in seen:
+                seen[table] += 1
+            if line_no <= resume_after:
+                continue
+            clean, err = (None, data) if table == "invalid" else validate_row(table, data, columns)
+            if err:
+                invalid += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append(f"line {line_no}: {err}")
+                continue
+            cols = tuple(clean)
+            batch.setdefault((table, cols), []).append(tuple(clean.values()))
+            pending += 1
+            last_line = line_no
+            if pending >= batch_size:
+                n = _write_batch(pool, batch, dedupe, source, last_line)
+                written, duplicates = written + n, duplicates + pending - n
+                batch, pending = {}, 0
+                if progress:
+                    progress(written, duplicates, invalid)
+        if pending:
+            n = _write_batch(pool, batch, dedupe, source, last_line)
+            written, duplicates = written + n, duplicates + pending - n
+
+    # A footer whose counts match what we read means the file was not truncated
+    complete = footer is not None and footer == {t: n for t, n in seen.items() if t in footer}
+    if not complete:
+        errors.append(f"footer counts {footer} do not match rows read {seen}; the file may be truncated")
+    with pool.writer() as conn:
+        conn.execute("DELETE FROM import_checkpoints WHERE source = ?", (source,))
+    return ImportResult(written, duplicates, invalid, errors, resume_after, complete, time.perf_counter() - t0)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Back up the fitness tracker database.")
+    parser.add_argument("--db", default=DB_PATH)
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_export = sub.add_parser("export", help="Stream all tables to gzip-compressed NDJSON.")
+    p_export.add_argument("output", help="Output file, e.g. backup.ndjson.gz")
+    p_snapshot = sub.add_parser("snapshot", help="Copy the database file with SQLite's online backup API.")
+    p_snapshot.add_argument("output", help="Output .db file")
+    p_restore = sub.add_parser("restore", help="Load an export (or legacy backup.json) into the database.")
+    p_restore.add_argument("input", help="Backup file (.ndjson.gz, .ndjson or backup.json)")
+    p_restore.add_argument("--dedupe", action="store_true", help="Skip rows that already exist instead of overwriting sessions.")
+    p_restore.add_argument("--batch-size", type=int, default=IMPORT_BATCH)
+    p_restore.add_argument("--restart", action="store_true", help="Ignore any checkpoint from an interrupted run.")
+    args = parser.parse_args()
+
+    if args.command == "restore":
+        result = import_backup(args.input, args.db, dedupe=args.dedupe, batch_size=args.batch_size, restart=args.restart,
+                               progress=lambda w, d, i: print(f"   ... {w} written, {d} duplicates, {i} invalid"))
+        if result.resumed_from:
+            print(f" - Resumed after line {result.resumed_from}")
+        for err in result.errors:
+            print(f" - {err}")
+        status = "✅" if result.complete and not result.invalid else "⚠️"
+        print(f"{status} Restored {result.written} rows ({result.duplicates} duplicates skipped, {result.invalid} invalid) in {result.seconds:.2f}s")
+        raise SystemExit(0 if result.complete else 1)
+
+    if not os.path.exists(args.db):
+        print(f"Database at {args.db} not found.")
+        raise SystemExit(1)
+    t0 = time.perf_counter()
+    if args.command == "export":
+        counts = export_ndjson(args.output, args.db)
+        for table, n in counts.items():
+            print(f" - {table}: {n} rows")
+    else:
+        snapshot_db(args.output, args.db)
+    size_kb = os.path.getsize(args.output) / 1024
+    print(f"✅ Wrote {args.output} ({size_kb:.0f} KB) in {time.perf_counter() - t0:.2f}s")
@@ -0,0 +1,57 @@
+"""Cold-start latency: module imports and the first render of a tab, each in a fresh interpreter.
+
+    python -m benchmarks.bench_cold_start --repeat 5
+"""
+import argparse
+import glob
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.bench_tabs import APP_FILES, REPO_ROOT
+
+# Runs in the child; prints {"import": ms, "first_render": ms}
+CHILD = """
+import json, sys, time
+t0 = time.perf_counter()
+import streamlit, db, plan, perf, backup, warmup
+imported = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file("app.py", default_timeout=120)
+at.session_state["active_tab"] = sys.argv[1]
+t1 = time.perf_counter()
+at.run()
+if at.exception:
+    raise SystemExit(at.exception[0].message)
+print(json.dumps({"import": (imported - t0) * 1000, "first_render": (time.perf_counter() - t1) * 1000}))
+"""
+
+def cold_run(tmp, tab):
+    env = {**os.environ, "PYTHONPATH": tmp}
+    out = subprocess.run([sys.executable, "-c", CHILD, tab], cwd=tmp, env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--tabs", default="Dashboard,Progress")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # The app and every root-level module it may import, lazily or not
+        for path in {os.path.join(REPO_ROOT, name) for name in APP_FILES} | set(glob.glob(os.path.join(REPO_ROOT, "*.py"))):
+            shutil.copy(path, tmp)
+        cold_run(tmp, "Dashboard")  # creates the database and .pyc files so every measured run starts equal
+        print(f"{'tab':12} {'import ms':>10} {'first render ms':>16} {'total ms':>10}")
+        for tab in args.tabs.split(","):
+            runs = [cold_run(tmp, tab) for _ in range(args.repeat)]
+            imp = statistics.median(r["import"] for r in runs)
+            render = statistics.median(r["first_render"] for r in runs)
+            print(f"{tab:12} {imp:10.0f} {render:16.0f} {imp + render:10.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Query timings on a multi-year database, before and after the index migration.
+
+    python -m benchmarks.bench_indexes --years 10
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import date
+
+from db import (
+    connect_db, migrate, schema_version, week_range,
+    fetch_logs, fetch_custom, fetch_sports, fetch_metrics, fetch_last_logs,
+)
+from generate_dummy_data import load_schedule, populate
+
+INDEX_MIGRATION = 4
+
+def build_dataset(conn, years, seed=7):
+    # Plan-shaped history from the dummy data generator, inserted through the normal triggers
+    counts = populate(conn, load_schedule(), 365 * years, random.Random(seed), end_date=date.today(),
+                      sports_rate=0.3, custom_rate=0.2, metrics_rate=0.5)
+    conn.commit()
+    return sum(counts.values())
+
+def time_query(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples)
+
+def run_queries(conn, repeat):
+    start, end = [d.isoformat() for d in week_range(date.today())]
+    monday = [ex["name"] for ex in load_schedule()["Monday"]["exercises"]]
+    queries = {
+        "fetch_logs (week)": lambda: fetch_logs(conn, start, end),
+        "fetch_custom (week)": lambda: fetch_custom(conn, start, end),
+        "fetch_sports (week)": lambda: fetch_sports(conn, start, end),
+        "fetch_metrics": lambda: fetch_metrics(conn),
+        "fetch_last_logs (Monday plan)": lambda: fetch_last_logs(conn, monday),
+    }
+    return {name: time_query(fn, repeat) for name, fn in queries.items()}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = connect_db(os.path.join(tmp, "bench.db"))
+        migrate(conn, INDEX_MIGRATION - 1)
+        rows = build_dataset(conn, args.years)
+        print(f"{args.years} years, {rows} rows")
+
+        before = run_queries(conn, args.repeat)
+        migrate(conn, INDEX_MIGRATION)
+        after = run_queries(conn, args.repeat)
+        print(f"schema v{INDEX_MIGRATION - 1} -> v{schema_version(conn)}, median of {args.repeat} runs")
+        print(f"{'query':32} {'before ms':>10} {'after ms':>10} {'speedup':>8}")
+        for name in before:
+            print(f"{name:32} {before[name]:10.2f} {after[name]:10.2f} {before[name] / after[name]:7.1f}x")
+        conn.close()
+
+if __name__ == "__main__":
+    main()
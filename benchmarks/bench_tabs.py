@@ -0,0 +1,61 @@
+"""Rerun latency of each app tab on a large database, rendered headless with AppTest.
+
+    python -m benchmarks.bench_tabs --years 10
+"""
+import argparse
+import logging
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+from streamlit.testing.v1 import AppTest
+
+from benchmarks.bench_indexes import build_dataset
+from db import DB_PATH, connect_db, migrate
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_FILES = ["app.py", "workouts.yaml", "icon.png"]
+TAB_LABELS = ["Dashboard", "Workout", "Plan", "Progress", "Nutrition", "Recovery", "Settings"]
+
+def timed_run(at):
+    t0 = time.perf_counter()
+    at.run()
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    return (time.perf_counter() - t0) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+    for name in list(logging.root.manager.loggerDict):
+        if name.startswith("streamlit"):
+            logging.getLogger(name).setLevel(logging.ERROR)
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in APP_FILES:
+            shutil.copy(os.path.join(REPO_ROOT, name), tmp)
+        conn = connect_db(os.path.join(tmp, DB_PATH))
+        migrate(conn)
+        rows = build_dataset(conn, args.years)
+        conn.close()
+        print(f"{args.years} years, {rows} rows")
+
+        os.chdir(tmp)
+        try:
+            at = AppTest.from_file(os.path.join(tmp, "app.py"), default_timeout=120)
+            print(f"{'tab':12} {'first ms':>10} {'rerun p50':>10} {'rerun max':>10}")
+            for label in TAB_LABELS:
+                at.session_state["active_tab"] = label
+                first = timed_run(at)
+                reruns = [timed_run(at) for _ in range(args.repeat)]
+                print(f"{label:12} {first:10.1f} {statistics.median(reruns):10.1f} {max(reruns):10.1f}")
+        finally:
+            os.chdir(cwd)
+
+if __name__ == "__main__":
+    main()
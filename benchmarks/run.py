@@ -0,0 +1,284 @@
+"""Benchmark suite: data layer, scoring, writes and full-page render at several history sizes.
+
+    python -m benchmarks.run                   # compare against benchmarks/baseline.json
+    python -m benchmarks.run --save-baseline   # record a new baseline on this machine (all sizes, one run)
+
+Runs fully offline. Each size gets a fresh database from the dummy data
+generator with a fixed seed and end date, so every run sees identical data.
+Latencies are reported as min/p50/p95/max in milliseconds, and peak Python memory
+is measured in a separate tracemalloc pass so it does not skew the timings.
+Exits non-zero when a case's fastest run (min: other load on the machine
+only ever adds time) regresses past the tolerance. Each size also times a
+fixed SQLite + pandas reference workload, and the baseline is scaled by how
+much faster or slower that ran now, so the gate compares ratios rather than
+absolute times of a machine whose speed drifts. The baseline also records
+the machine and versions it was measured on.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime
+
+import pandas as pd
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+from benchmarks.bench_tabs import APP_FILES, REPO_ROOT, TAB_LABELS, timed_run
+from db import (
+    DB_PATH, calc_week_score, fetch_custom, fetch_last_log, fetch_last_logs, fetch_logs, fetch_metrics,
+    fetch_sports, fetch_week_score, get_pool, init_db, save_workout_session, search_notes, triggers_suspended, week_range,
+    write_body_metrics,
+)
+from generate_dummy_data import load_schedule, populate
+from body_trend import BodyTrendCache
+from overload import OverloadCache
+from write_queue import WriteQueue
+
+SIZES = {"1m": 30, "1y": 365, "10y": 3650}
+SEED = 42
+END_DATE = date(2026, 1, 4)  # a Sunday, so the scored week is full
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+# Ignore differences below this many ms; sub-millisecond timings are mostly noise
+NOISE_FLOOR_MS = 1.0
+REFERENCE_ROWS = 20000
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def measure(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "min": round(min(samples), 3), "p50": round(percentile(samples, 50), 3), "p95": round(percentile(samples, 95), 3),
+        "max": round(max(samples), 3), "peak_kb": round(peak / 1024, 1),
+    }
+
+def reference_workload():
+    """A fixed SQLite + pandas job: its time tracks how fast the machine is running right now."""
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, g TEXT, v REAL)")
+    conn.executemany("INSERT INTO t (g, v) VALUES (?, ?)", ((f"g{i % 50}", i * 0.5) for i in range(REFERENCE_ROWS)))
+    pd.read_sql_query("SELECT g, v FROM t", conn).groupby("g")["v"].sum()
+    conn.close()
+
+def build_db(path, days):
+    init_db(path)
+    pool = get_pool(path)
+    with pool.writer() as conn, triggers_suspended(conn):
+        counts = populate(conn, load_schedule(), days, random.Random(SEED), end_date=END_DATE,
+                          sports_rate=0.2, custom_rate=0.1, metrics_rate=0.3)
+    return sum(counts.values())
+
+def bench_data_layer(path, repeat):
+    pool = get_pool(path)
+    week_start, week_end = week_range(END_DATE)
+    ws, we = week_start.isoformat(), week_end.isoformat()
+    monday = load_schedule()["Monday"]
+    names = [ex["name"] for ex in monday["exercises"]]
+    entries = [
+        {"exercise_name": n, "planned_sets": "3", "planned_reps": "10", "actual_sets": 3, "actual_reps": 10,
+         "weight": 20.0, "skipped": 0, "notes": "15kgx10, 12kgx8"}
+        for n in names
+    ]
+
+    def read(fn, *args, **kwargs):
+        def run():
+            with pool.reader() as conn:
+                return fn(conn, *args, **kwargs)
+        return run
+
+    def full_score():
+        with pool.reader() as conn:
+            calc_week_score(fetch_logs(conn), fetch_custom(conn), fetch_sports(conn), week_start, week_end)
+
+    def overload_full():
+        OverloadCache(path).refresh()
+
+    overload = OverloadCache(path)
+    overload.refresh()
+
+    def overload_one_day():
+        # Re-saving the session bumps its week, as logging a day would
+        save_workout_session(pool, END_DATE, "Monday", entries)
+        overload.refresh()
+
+    def body_trend_full():
+        BodyTrendCache(path).refresh()
+
+    body_trend = BodyTrendCache(path)
+    body_trend.refresh()
+
+    def body_trend_one_reading():
+        # A new weigh-in on the latest day takes the append-only path
+        with pool.writer() as conn:
+            write_body_metrics(conn, END_DATE.isoformat(), 80.0, 20.0)
+        body_trend.refresh()
+
+    queue = WriteQueue(path)
+    payload = {"log_date": END_DATE.isoformat(), "day_name": "Monday", "entries": entries}
+
+    def queued_save():
+        # What a form submit waits for before the page can be sent
+        queue.submit("workout_session", **payload)
+
+    def queued_round_trip():
+        queue.wait(queue.submit("workout_session", **payload), timeout=30)
+
+    cases = {
+        "fetch_logs/all": read(fetch_logs),
+        "fetch_logs/week": read(fetch_logs, ws, we),
+        "fetch_custom/all": read(fetch_custom),
+        "fetch_sports/all": read(fetch_sports),
+        "fetch_metrics/all": read(fetch_metrics),
+        "calc_week_score/full_tables": full_score,
+        "fetch_week_score/rollup": read(fetch_week_score, week_start),
+        "fetch_last_log/single": read(fetch_last_log, names[0]),
+        "fetch_last_logs/day_plan": read(fetch_last_logs, names),
+        "save_workout_session/upsert": lambda: save_workout_session(pool, END_DATE, "Monday", entries),
+        "overload/full": overload_full,
+        "overload/one_day": overload_one_day,
+        "body_trend/full": body_trend_full,
+        "body_trend/one_reading": body_trend_one_reading,
+        "search_notes/ranked": read(search_notes, "shoulder pain"),
+        "write_queue/submit": queued_save,
+        "write_queue/round_trip": queued_round_trip,
+    }
+    results = {name: measure(fn, repeat) for name, fn in cases.items()}
+    queue.close()
+    return results
+
+def bench_render(tmp, repeat):
+    # Fresh Streamlit caches per size so nothing carries over between databases
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    at = AppTest.from_file(os.path.join(tmp, "app.py"), default_timeout=120)
+    results = {}
+    for label in TAB_LABELS:
+        at.session_state["active_tab"] = label
+
+        first = timed_run(at)
+        results[f"render/{label}"] = {**measure(lambda: timed_run(at), repeat), "first": round(first, 1)}
+    return results
+
+def run_size(size, days, repeat, render):
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in APP_FILES:
+            shutil.copy(os.path.join(REPO_ROOT, name), tmp)
+        path = os.path.join(tmp, DB_PATH)
+        rows = build_db(path, days)
+        print(f"[{size}] {rows} rows")
+        # Timed before and after the cases, so a machine that speeds up or slows down midway averages out
+        reference = measure(reference_workload, repeat)["min"]
+        results = bench_data_layer(path, repeat)
+        if render:
+            os.chdir(tmp)
+            try:
+                results.update(bench_render(tmp, max(5, repeat // 2)))
+            finally:
+                os.chdir(cwd)
+        reference = (reference + measure(reference_workload, repeat)["min"]) / 2
+        get_pool(path).close()
+    return {"rows": rows, "reference_ms": round(reference, 3), "results": results}
+
+# Fields that make timings comparable; the rest of machine_info() is for the reader
+MACHINE_KEYS = ["platform", "machine", "cpus", "python"]
+
+def machine_info(repeat):
+    return {
+        "platform": platform.platform(), "machine": platform.machine(), "processor": platform.processor() or None,
+        "cpus": os.cpu_count(), "python": platform.python_version(), "sqlite": sqlite3.sqlite_version,
+        "pandas": pd.__version__, "streamlit": st.__version__, "repeat": repeat,
+        "recorded_at": datetime.now().isoformat(timespec="seconds"),
+    }
+
+def same_machine(current, baseline):
+    recorded = baseline.get("machine")
+    return recorded is not None and all(recorded.get(k) == current[k] for k in MACHINE_KEYS)
+
+def compare(current, baseline, tolerance):
+    regressions = []
+    for size, data in current.items():
+        base = baseline.get(size, {}).get("results", {})
+        # How much slower the machine runs now than when the baseline was recorded
+        speed = data["reference_ms"] / baseline[size]["reference_ms"] if "reference_ms" in baseline.get(size, {}) else 1.0
+        for name, stats in data["results"].items():
+            if name not in base:
+                continue
+            # Baselines recorded before min was kept compare on p50
+            stat = "min" if "min" in base[name] else "p50"
+            before, after = base[name][stat] * speed, stats[stat]
+            if after > before * (1 + tolerance) and after - before > NOISE_FLOOR_MS:
+                regressions.append(f"{size} {name}: {stat} {before:.2f} -> {after:.2f} ms")
+    return regressions
+
+def print_report(current, baseline):
+    for size, data in current.items():
+        print(f"\n== {size} ({data['rows']} rows, reference {data['reference_ms']:.1f} ms) ==")
+        print(f"{'case':34} {'min':>9} {'p50':>9} {'p95':>9} {'max':>9} {'peak KB':>9} {'base min':>9}")
+        base = baseline.get(size, {}).get("results", {})
+        for name, s in data["results"].items():
+            b = base.get(name, {}).get("min")
+            print(f"{name:34} {s['min']:9.2f} {s['p50']:9.2f} {s['p95']:9.2f} {s['max']:9.2f} {s['peak_kb']:9.0f} {b if b is not None else '-':>9}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default=",".join(SIZES), help=f"Comma-separated subset of {', '.join(SIZES)}")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--no-render", action="store_true", help="Skip the AppTest page renders")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Allowed slowdown of the fastest run vs baseline (0.5 = 50%%)")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--output", help="Also write results as JSON to this file")
+    args = parser.parse_args()
+    if args.save_baseline and (args.no_render or set(args.sizes.split(",")) != set(SIZES)):
+        parser.error("--save-baseline records every size with renders, in one run")
+    for name in list(logging.root.manager.loggerDict):
+        if name.startswith("streamlit"):
+            logging.getLogger(name).setLevel(logging.ERROR)
+
+    machine = machine_info(args.repeat)
+    current = {size: run_size(size, SIZES[size], args.repeat, not args.no_render) for size in args.sizes.split(",")}
+    baseline = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as f:
+            baseline = json.load(f)
+    print_report(current, {k: v for k, v in baseline.items() if k != "machine"})
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(current, f, indent=2)
+    if args.save_baseline:
+        with open(BASELINE_PATH, "w") as f:
+            json.dump({"machine": machine, **current}, f, indent=2)
+        print(f"\nSaved baseline to {BASELINE_PATH}")
+        return
+    regressions = compare(current, baseline, args.tolerance)
+    if baseline and not same_machine(machine, baseline):
+        recorded = baseline.get("machine") or {}
+        print(f"\n⚠️ The baseline was recorded on {', '.join(f'{k}={recorded.get(k)}' for k in MACHINE_KEYS)}; "
+              f"times are scaled by the reference workload, but --save-baseline here compares like with like.")
+    if regressions:
+        print("\n❌ Regressions:")
+        for r in regressions:
+            print(f" - {r}")
+        raise SystemExit(1)
+    print("\n✅ No regressions against baseline." if baseline else "\nNo baseline yet; run with --save-baseline.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""Body-composition trends: smoothed weight, body fat and lean mass, weekly rate of change and goal dates.
+
+Weigh-ins swing by a kilo or more with water and food, so the trend is a
+time-weighted exponential moving average: a reading's weight halves every
+TREND_HALFLIFE_DAYS however irregular the weigh-ins are (pandas'
+ewm(halflife=..., times=...)). The average is kept as a decayed sum and
+weight per metric, so BodyTrendCache adds a new reading in O(1). Like
+OverloadCache it uses week_versions (db.py) to re-read only the weeks written
+since its last refresh; an edit to an older week recomputes the whole series
+from memory.
+"""
+import threading
+from collections import namedtuple
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from db import DB_PATH, NOTHING_SEEN, read_changed_weeks, typed_frame
+
+METRICS = ["weight", "body_fat", "lean_mass"]
+TREND_HALFLIFE_DAYS = 7
+# The weekly rate is the trend's change over this window; shorter windows follow the noise
+RATE_WINDOW_DAYS = 28
+# Within this of the goal counts as reached; further than MAX_PROJECTION_DAYS away as no projection
+GOAL_TOLERANCE = {"weight": 0.2, "body_fat": 0.2, "lean_mass": 0.2}
+MAX_PROJECTION_DAYS = 730
+
+READING_COLUMNS = ["id", "log_date", *METRICS]
+REACHED, ON_TRACK, OFF_TRACK = "reached", "on_track", "off_track"
+Projection = namedtuple("Projection", ["status", "eta", "days"])
+
+def readings_frame(rows):
+    """Readings sorted by date from typed body_metrics rows; lean mass is derived from weight and body fat where missing."""
+    rows = rows[rows["log_date"].notna()]
+    # A 0 is a field left empty by older versions of the Settings form, not a reading
+    weight, body_fat, lean_mass = (rows[m].where(rows[m] > 0) for m in METRICS)
+    return pd.DataFrame({
+        "id": rows["id"], "log_date": rows["log_date"], "weight": weight, "body_fat": body_fat,
+        "lean_mass": lean_mass.fillna((weight * (1 - body_fat / 100)).round(1)),
+    }).sort_values(["log_date", "id"], ignore_index=True)
+
+def _days(dates):
+    return (dates - pd.Timestamp(0)).dt.total_seconds().to_numpy() / 86400
+
+def smooth(readings):
+    """Add trend_<metric> columns to all readings; returns (frame, state) for continue_smoothing()."""
+    out = readings.copy()
+    days = _days(out["log_date"])
+    state = {"day": days[-1] if len(days) else None}
+    for m in METRICS:
+        values = out[m].to_numpy(dtype="float64")
+        out[f"trend_{m}"] = out[m].ewm(halflife=pd.Timedelta(days=TREND_HALFLIFE_DAYS), times=out["log_date"]).mean()
+        # The same average as a decayed sum over a decayed weight, as of the last reading
+        valid = ~np.isnan(values)
+        den = float(np.sum(0.5 ** ((state["day"] - days[valid]) / TREND_HALFLIFE_DAYS))) if valid.any() else 0.0
+        last = out[f"trend_{m}"].iloc[-1] if len(out) else np.nan
+        state[m] = (last * den if den else 0.0, den)
+    return out, state
+
+def continue_smoothing(state, new):
+    """Trend columns for readings dated on or after state["day"], one O(1) step per reading."""
+    out = new.copy()
+    state = dict(state)
+    days = _days(out["log_date"])
+    trends = {m: np.empty(len(out)) for m in METRICS}
+    for i, day in enumerate(days):
+        decay = 0.5 ** ((day - state["day"]) / TREND_HALFLIFE_DAYS)
+        for m in METRICS:
+            num, den = state[m]
+            num, den = num * decay, den * decay
+            value = out[m].iat[i]
+            if pd.notna(value):
+                num, den = num + value, den + 1
+            state[m] = (num, den)
+            trends[m][i] = num / den if den else np.nan
+        state["day"] = day
+    for m in METRICS:
+        out[f"trend_{m}"] = trends[m]
+    return out, state
+
+def add_rates(trend, start=0):
+    """Set rate_<metric>, the trend's change per week over RATE_WINDOW_DAYS, for rows from position `start` on.
+
+    Rows with less than half a window of readings before them get no rate.
+    """
+    rows = trend.iloc[start:]
+    cols = [f"trend_{m}" for m in METRICS]
+    # The first reading inside each row's window, so the span is measured to a real reading
+    base = pd.merge_asof(
+        pd.DataFrame({"at": (rows["log_date"] - pd.Timedelta(days=RATE_WINDOW_DAYS)).to_numpy("datetime64[ns]")}),
+        trend[["log_date", *cols]].assign(at=trend["log_date"].to_numpy("datetime64[ns]")),
+        on="at", direction="forward",
+    )
+    span = (rows["log_date"].to_numpy() - base["log_date"].to_numpy()) / np.timedelta64(1, "D")
+    span = np.where(span >= RATE_WINDOW_DAYS / 2, span, np.nan)
+    for m in METRICS:
+        trend.loc[trend.index[start:], f"rate_{m}"] = (rows[f"trend_{m}"].to_numpy() - base[f"trend_{m}"].to_numpy()) / span * 7
+    return trend
+
+def project_goal(latest, metric, goal, today=None):
+    """When the trend reaches `goal` at its current weekly rate, from the latest trend row; None without a trend."""
+    trend, rate = latest.get(f"trend_{metric}"), latest.get(f"rate_{metric}")
+    if goal is None or pd.isna(trend):
+        return None
+    if abs(goal - trend) <= GOAL_TOLERANCE[metric]:
+        return Projection(REACHED, None, 0)
+    if pd.isna(rate) or rate == 0 or (goal - trend) / rate < 0:
+        return Projection(OFF_TRACK, None, None)
+    days = int(np.ceil((goal - trend) / rate * 7))
+    if days > MAX_PROJECTION_DAYS:
+        return Projection(OFF_TRACK, None, days)
+    return Projection(ON_TRACK, (today or date.today()) + timedelta(days=days), days)
+
+class BodyTrendCache:
+    """Smoothed body_metrics readings for one database, kept up to date week by week.
+
+    `trend` has one row per reading with the raw metrics, trend_<metric> and
+    rate_<metric>. It is replaced, never modified, on refresh.
+    """
+
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._seen = NOTHING_SEEN
+        self._state = None
+        self.trend = add_rates(smooth(readings_frame(typed_frame(pd.DataFrame(columns=READING_COLUMNS), "body_metrics")))[0])
+
+    def latest(self):
+        return self.trend.iloc[-1] if len(self.trend) else None
+
+    def refresh(self):
+        """Apply the weeks written since the last refresh; returns how many there were."""
+        with self._lock:
+            changes = read_changed_weeks(self.path, "body_metrics", READING_COLUMNS, readings_frame, self._seen)
+            if changes.weeks:
+                self._apply(changes.frame, None if changes.full else changes.weeks)
+            self._seen = changes.seen
+            return len(changes.weeks)
+
+    def _apply(self, fresh, weeks):
+        old = self.trend
+        if weeks is not None:
+            dates = old["log_date"]
+            stale = (dates - pd.to_timedelta(dates.dt.weekday, unit="D")).dt.normalize().isin(pd.to_datetime(weeks))
+            if self._appended_only(old, stale, fresh):
+                # Every earlier reading is as it was: only the new ones are smoothed
+                tail, self._state = continue_smoothing(self._state, fresh.iloc[int(stale.sum()):])
+                self.trend = add_rates(pd.concat([old, tail], ignore_index=True), len(old))
+                return
+            fresh = pd.concat([old.loc[~stale, READING_COLUMNS], fresh]).sort_values(["log_date", "id"], ignore_index=True)
+        trend, self._state = smooth(fresh)
+        self.trend = add_rates(trend)
+
+    @staticmethod
+    def _appended_only(old, stale, fresh):
+        # The changed weeks' rows are the last ones cached, re-read unchanged, followed by later readings
+        n = int(stale.sum())
+        if old.empty or len(fresh) <= n or not stale.iloc[len(old) - n:].all():
+            return False
+        kept = old.loc[stale, READING_COLUMNS].reset_index(drop=True)
+        return fresh.iloc[:n].reset_index(drop=True).equals(kept) and fresh["log_date"].iloc[n] >= old["log_date"].iloc[-1]
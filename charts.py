@@ -0,0 +1,47 @@
+"""Bucketing and point caps for the Progress charts.
+
+Charts are aggregated on the server before they reach Plotly, so the payload
+and the browser's render time stay bounded however long the history is:
+the bucket (day, week, month or year) is the finest one that keeps a chart
+under its point cap for the selected range. Bars are always SVG, so they get
+the tighter cap; scatter and line series switch to WebGL once they are long.
+"""
+import pandas as pd
+
+BUCKET_DAYS = {"day": 1, "week": 7, "month": 30.44, "year": 365.25}
+# Axis tick and hover formats per bucket; every label carries the year when it matters
+BUCKET_TICKS = {"day": "%d %b", "week": "%d %b", "month": "%b %Y", "year": "%Y"}
+BUCKET_HOVER = {"day": "%a %d %b %Y", "week": "Week of %d %b %Y", "month": "%B %Y", "year": "%Y"}
+
+# ~5 months of days, ~3 years of weeks or ~12 years of months
+MAX_BARS = 150
+MAX_LINE_POINTS = 1500
+WEBGL_MIN_POINTS = 300
+# Value labels on bars only while they stay readable
+LABELED_BARS = 31
+
+def pick_bucket(start, end, max_points, finest="day"):
+    """Finest bucket (no finer than `finest`) that splits [start, end] into at most max_points buckets."""
+    days = (end - start).days + 1
+    names = list(BUCKET_DAYS)
+    for name in names[names.index(finest):]:
+        if days / BUCKET_DAYS[name] <= max_points:
+            return name
+    return names[-1]
+
+def bucket_start(dates, bucket):
+    """Floor datetime64 dates to the start of their day, Monday-based week, month or year."""
+    if bucket == "day":
+        return dates.dt.normalize()
+    if bucket == "week":
+        return (dates - pd.to_timedelta(dates.dt.weekday, unit="D")).dt.normalize()
+    unit = {"month": "M", "year": "Y"}[bucket]
+    return pd.Series(dates.to_numpy().astype(f"datetime64[{unit}]").astype(dates.dtype), index=dates.index)
+
+def activity_buckets(dates, bucket):
+    """Completed exercises and distinct active days per bucket, from one log_date per completed exercise."""
+    df = pd.DataFrame({"bucket": bucket_start(dates, bucket), "day": dates.dt.normalize()})
+    return df.groupby("bucket", sort=True).agg(exercises=("day", "size"), active_days=("day", "nunique")).reset_index()
+
+def webgl(points):
+    return points >= WEBGL_MIN_POINTS
@@ -0,0 +1,1052 @@
+import logging
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+
+import perf
+from set_notes import FAILED, NO_SETS, PARSED, SET_COLUMNS, parse_notes
+
+DB_PATH = "fitness_tracker.db"
+
+logger = logging.getLogger("fitness_tracker.db")
+
+# Multi-athlete deployments keep one database file per athlete, so every
+# query and write only ever touches that athlete's (small) file.
+ATHLETES_DIR = "athletes"
+ATHLETE_ID_RE = re.compile(r"^[a-z0-9][a-z0-9_-]{0,63}$")
+
+# User-entered data; everything else in the file is derived from these
+DATA_TABLES = ["workout_logs", "custom_exercises", "sports_logs", "body_metrics"]
+
+# Tables whose writes are tracked in table_versions (see TableVersions below)
+TRACKED_TABLES = DATA_TABLES + ["weekly_scores"]
+
+# Weekly score rules: completed planned exercise = 2, custom entry = 1,
+# plus 1 point per 20 sport minutes capped at 6
+SPORT_MINUTES_PER_POINT = 20
+SPORT_POINTS_CAP = 6
+
+# Monday of the log_date's week, matching week_range()
+WEEK_START_SQL = "date({col}, 'weekday 0', '-6 days')"
+
+# (table, rollup column, value added per row, row filter)
+ROLLUP_SOURCES = [
+    ("workout_logs", "planned_done", "1", "{row}.skipped = 0"),
+    ("custom_exercises", "custom_count", "1", "1"),
+    ("sports_logs", "sport_minutes", "COALESCE({row}.minutes, 0)", "1"),
+]
+
+# Connection tuning. WAL lets readers keep going while one writer commits,
+# across threads and across Streamlit worker processes.
+BUSY_TIMEOUT_MS = 5000
+CONNECTION_PRAGMAS = [
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",  # durable across app crashes; WAL fsyncs on checkpoint
+    "PRAGMA cache_size = -16000",   # ~16 MB page cache per connection
+    "PRAGMA mmap_size = 134217728", # 128 MB of memory-mapped reads
+    "PRAGMA temp_store = MEMORY",
+    f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}",
+]
+MAX_READERS = 8
+WRITE_RETRIES = 5
+# Pools kept open per process; the least recently used athlete databases are closed beyond this
+MAX_OPEN_POOLS = 64
+
+# -----------------------------
+# Connection & Schema
+# -----------------------------
+def connect_db(path=DB_PATH):
+    conn = sqlite3.connect(path, check_same_thread=False, timeout=BUSY_TIMEOUT_MS / 1000)
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+def is_locked_error(exc):
+    return isinstance(exc, sqlite3.OperationalError) and "locked" in str(exc).lower()
+
+class ConnectionPool:
+    """Process-wide reader pool plus a single serialized writer.
+
+    Readers run in autocommit mode with query_only set, so they never hold
+    a snapshot open between queries or take the write lock. All writes go
+    through writer(), which serializes threads in this process and starts
+    BEGIN IMMEDIATE (retried with backoff) so contention with other
+    processes surfaces at the start of the transaction, not at commit.
+    """
+
+    def __init__(self, path=DB_PATH, max_readers=MAX_READERS):
+        self.path = path
+        self._readers = queue.LifoQueue(maxsize=max_readers)
+        self._writer = None
+        self._write_lock = threading.Lock()
+
+    @contextmanager
+    def reader(self):
+        try:
+            conn = self._readers.get_nowait()
+        except queue.Empty:
+            conn = connect_db(self.path)
+            conn.isolation_level = None
+            conn.execute("PRAGMA query_only = ON")
+        try:
+            yield conn
+        finally:
+            try:
+                self._readers.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    @contextmanager
+    def writer(self):
+        with self._write_lock:
+            if self._writer is None:
+                self._writer = connect_db(self.path)
+            conn = self._writer
+            for attempt in range(WRITE_RETRIES):
+                try:
+                    conn.execute("BEGIN IMMEDIATE")
+                    break
+                except sqlite3.OperationalError as e:
+                    if not is_locked_error(e) or attempt == WRITE_RETRIES - 1:
+                        raise
+                    time.sleep(0.05 * 2 ** attempt)
+            try:
+                yield conn
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+
+    def close(self):
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._write_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+
+_pools = OrderedDict()
+_pools_lock = threading.Lock()
+
+def get_pool(path=DB_PATH):
+    # One pool per database file per process; rebuilt after a fork
+    key = (os.path.abspath(path), os.getpid())
+    evicted = []
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(path)
+            while len(_pools) > MAX_OPEN_POOLS:
+                evicted.append(_pools.popitem(last=False)[1])
+        else:
+            _pools.move_to_end(key)
+    # Closed outside the lock: close() waits for an in-flight write on that file
+    for old in evicted:
+        old.close()
+    return pool
+
+def athlete_db_path(athlete_id=None, root=ATHLETES_DIR):
+    """Database file for one athlete; no athlete means the original single-user DB_PATH."""
+    if not athlete_id:
+        return DB_PATH
+    if not ATHLETE_ID_RE.match(athlete_id):
+        raise ValueError(f"Invalid athlete id {athlete_id!r}: use 1-64 lowercase letters, digits, '-' or '_'")
+    return os.path.join(root, f"{athlete_id}.db")
+
+def list_athletes(root=ATHLETES_DIR):
+    if not os.path.isdir(root):
+        return []
+    return sorted(name[:-3] for name in os.listdir(root) if name.endswith(".db") and ATHLETE_ID_RE.match(name[:-3]))
+
+def init_db(path=DB_PATH):
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = connect_db(path)
+    try:
+        migrate(conn)
+    finally:
+        conn.close()
+
+# -----------------------------
+# Migrations
+# -----------------------------
+# Each step runs once, in order, inside its own transaction. The number of
+# applied steps is stored in PRAGMA user_version. Steps use IF NOT EXISTS so
+# databases created before versioning (user_version 0) upgrade cleanly.
+# Append new steps to MIGRATIONS; never edit or reorder shipped ones.
+def _m001_base_tables(conn):
+    for q in [
+        "CREATE TABLE IF NOT EXISTS workout_logs (id INTEGER PRIMARY KEY AUTOINCREMENT, log_date TEXT, day_name TEXT, exercise_name TEXT, planned_sets TEXT, planned_reps TEXT, actual_sets INTEGER, actual_reps INTEGER, weight REAL, skipped INTEGER, notes TEXT)",
+        "CREATE TABLE IF NOT EXISTS custom_exercises (id INTEGER PRIMARY KEY AUTOINCREMENT, log_date TEXT, day_name TEXT, exercise_name TEXT, actual_sets INTEGER, actual_reps INTEGER, weight REAL, notes TEXT)",
+        "CREATE TABLE IF NOT EXISTS sports_logs (id INTEGER PRIMARY KEY AUTOINCREMENT, log_date TEXT, sport_name TEXT, minutes INTEGER, intensity TEXT, notes TEXT)",
+        "CREATE TABLE IF NOT EXISTS body_metrics (id INTEGER PRIMARY KEY AUTOINCREMENT, log_date TEXT, weight REAL, body_fat REAL, lean_mass REAL, muscle_mass REAL, water_mass REAL, notes TEXT)",
+    ]:
+        conn.execute(q)
+
+def _m002_weekly_scores(conn):
+    conn.execute("CREATE TABLE IF NOT EXISTS weekly_scores (week_start TEXT PRIMARY KEY, planned_done INTEGER NOT NULL DEFAULT 0, custom_count INTEGER NOT NULL DEFAULT 0, sport_minutes REAL NOT NULL DEFAULT 0)")
+    create_rollup_triggers(conn.cursor())
+    rebuild_week_scores(conn)
+
+def _m003_table_versions(conn):
+    # Bump a per-table counter on every write, from this app or any other process
+    conn.execute("CREATE TABLE IF NOT EXISTS table_versions (table_name TEXT PRIMARY KEY, version INTEGER NOT NULL DEFAULT 0)")
+    create_version_triggers(conn, TRACKED_TABLES)
+
+def create_version_triggers(conn, tables):
+    for t in tables:
+        conn.execute("INSERT OR IGNORE INTO table_versions (table_name, version) VALUES (?, 0)", (t,))
+        for event in ["INSERT", "UPDATE", "DELETE"]:
+            conn.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {t}_version_{event.lower()} AFTER {event} ON {t} "
+                f"BEGIN UPDATE table_versions SET version = version + 1 WHERE table_name = '{t}'; END"
+            )
+
+def _m004_hot_path_indexes(conn):
+    for q in [
+        # Last-session lookups on the Workout tab
+        "CREATE INDEX IF NOT EXISTS idx_workout_logs_exercise ON workout_logs (exercise_name, skipped, log_date)",
+        # BETWEEN date windows and ORDER BY log_date DESC in the fetch_* helpers
+        "CREATE INDEX IF NOT EXISTS idx_workout_logs_date ON workout_logs (log_date)",
+        "CREATE INDEX IF NOT EXISTS idx_custom_exercises_date ON custom_exercises (log_date)",
+        "CREATE INDEX IF NOT EXISTS idx_sports_logs_date ON sports_logs (log_date)",
+        "CREATE INDEX IF NOT EXISTS idx_body_metrics_date ON body_metrics (log_date)",
+    ]:
+        conn.execute(q)
+    conn.execute("ANALYZE")
+
+def _m005_session_natural_keys(conn):
+    # One row per (day, exercise) so resubmitting a session updates it. Keep
+    # the latest of any existing duplicates; the delete triggers keep the
+    # weekly rollup in step. The older rows are copied to _m005_removed_<table>
+    # first, so one that was the right entry can still be put back by hand.
+    for table in ["workout_logs", "custom_exercises"]:
+        older = f"id NOT IN (SELECT MAX(id) FROM {table} GROUP BY log_date, day_name, exercise_name)"
+        removed = conn.execute(f"SELECT COUNT(*) FROM {table} WHERE {older}").fetchone()[0]
+        if removed:
+            conn.execute(f"CREATE TABLE IF NOT EXISTS _m005_removed_{table} AS SELECT * FROM {table} WHERE 0")
+            conn.execute(f"INSERT INTO _m005_removed_{table} SELECT * FROM {table} WHERE {older}")
+            conn.execute(f"DELETE FROM {table} WHERE {older}")
+            logger.warning("Removed %d duplicate %s row(s), keeping the newest per day and exercise; "
+                           "the removed rows are in _m005_removed_%s", removed, table, table)
+        conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS uq_{table}_session ON {table} (log_date, day_name, exercise_name)")
+
+def _m006_import_checkpoints(conn):
+    # Last committed line per backup file, written in the same transaction as each import batch
+    conn.execute("CREATE TABLE IF NOT EXISTS import_checkpoints (source TEXT PRIMARY KEY, line INTEGER NOT NULL, updated_at TEXT)")
+
+def _m007_athlete_profile(conn):
+    # Per-database settings such as the athlete's display name
+    conn.execute("CREATE TABLE IF NOT EXISTS athlete_profile (key TEXT PRIMARY KEY, value TEXT)")
+
+def _m008_snapshot_dirty(conn):
+    conn.execute("CREATE TABLE IF NOT EXISTS snapshot_dirty (table_name TEXT NOT NULL, year TEXT NOT NULL, gen INTEGER NOT NULL DEFAULT 1, PRIMARY KEY (table_name, year))")
+    create_snapshot_triggers(conn.cursor())
+    mark_snapshot_rebuild(conn)
+
+def _m009_week_versions(conn):
+    conn.execute("CREATE TABLE IF NOT EXISTS week_versions (table_name TEXT NOT NULL, week_start TEXT NOT NULL, version INTEGER NOT NULL DEFAULT 1, PRIMARY KEY (table_name, week_start))")
+    create_week_version_triggers(conn.cursor())
+    bump_week_versions(conn)
+
+def _m010_workout_sets(conn):
+    conn.execute("CREATE TABLE IF NOT EXISTS workout_sets (log_id INTEGER NOT NULL, set_no INTEGER NOT NULL, weight REAL, reps INTEGER NOT NULL, drop_set INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (log_id, set_no)) WITHOUT ROWID")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_workout_sets_drop ON workout_sets (log_id) WHERE drop_set = 1")
+    conn.execute("CREATE TABLE IF NOT EXISTS set_parse_status (log_id INTEGER PRIMARY KEY, status INTEGER NOT NULL)")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_set_parse_pending ON set_parse_status (log_id) WHERE status = {PENDING}")
+    create_set_triggers(conn.cursor())
+    # Queued only; warm-up or backfill_sets.py parses the history in chunks
+    queue_all_notes(conn)
+
+def _m011_applied_writes(conn):
+    # Write-queue tickets committed here, in the same transaction as their rows (see write_queue.py)
+    conn.execute("CREATE TABLE IF NOT EXISTS applied_writes (ticket TEXT PRIMARY KEY, applied_at TEXT NOT NULL)")
+
+def _m012_notes_search(conn):
+    # Skipped where SQLite lacks FTS5; search then falls back to LIKE (see search_notes)
+    create_notes_index(conn)
+
+def _m013_body_metric_weeks(conn):
+    create_week_version_triggers(conn.cursor())
+    bump_week_versions(conn, ["body_metrics"])
+
+def _m014_reparse_unitless_sets(conn):
+    # "3x10" without a unit is now sets x reps rather than 3 kg x 10; parse the history again
+    queue_all_notes(conn)
+
+def _m015_set_parse_versions(conn):
+    # Settings and the set details in Progress are cached on this version
+    create_version_triggers(conn, ["set_parse_status"])
+
+def _m016_profile_version(conn):
+    # The profile is read on every rerun for the header; cached on this version
+    create_version_triggers(conn, ["athlete_profile"])
+
+MIGRATIONS = [
+    _m001_base_tables,
+    _m002_weekly_scores,
+    _m003_table_versions,
+    _m004_hot_path_indexes,
+    _m005_session_natural_keys,
+    _m006_import_checkpoints,
+    _m007_athlete_profile,
+    _m008_snapshot_dirty,
+    _m009_week_versions,
+    _m010_workout_sets,
+    _m011_applied_writes,
+    _m012_notes_search,
+    _m013_body_metric_weeks,
+    _m014_reparse_unitless_sets,
+    _m015_set_parse_versions,
+    _m016_profile_version,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate(conn, target=SCHEMA_VERSION):
+    while True:
+        current = schema_version(conn)
+        if current > SCHEMA_VERSION:
+            raise RuntimeError(f"Database schema v{current} is newer than this app (v{SCHEMA_VERSION}). Update the app.")
+        if current >= target:
+            return current
+        try:
+            # Take the write lock first, then read the version again: another process starting at the same
+            # time may have applied this step while we waited, and must not have it applied twice
+            conn.execute("BEGIN IMMEDIATE")
+            version = schema_version(conn) + 1
+            if version <= target:
+                MIGRATIONS[version - 1](conn)
+                conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+# -----------------------------
+# Bulk Loading
+# -----------------------------
+@contextmanager
+def triggers_suspended(conn):
+    """Drop every trigger for a bulk load inside the caller's transaction.
+
+    On exit the triggers are recreated, derived tables are rebuilt and all
+    table versions are bumped. DDL is transactional in SQLite, so other
+    connections never see the database without its triggers.
+    """
+    if not conn.in_transaction:
+        raise RuntimeError("triggers_suspended() must run inside a write transaction")
+    saved = conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger'").fetchall()
+    for name, _ in saved:
+        conn.execute(f"DROP TRIGGER {name}")
+    yield conn
+    for _, sql in saved:
+        conn.execute(sql)
+    for rebuild in DERIVED_REBUILDS:
+        rebuild(conn)
+    conn.execute("UPDATE table_versions SET version = version + 1")
+
+# -----------------------------
+# Weekly Score Rollup
+# -----------------------------
+def create_rollup_triggers(cur):
+    # Keep weekly_scores in step with every insert/update/delete on the log tables
+    for table, col, value, where in ROLLUP_SOURCES:
+        for row, sign in [("NEW", "+"), ("OLD", "-")]:
+            week = WEEK_START_SQL.format(col=f"{row}.log_date")
+            val = value.format(row=row)
+            cond = f"{where.format(row=row)} AND {row}.log_date IS NOT NULL"
+            upsert = (
+                f"INSERT INTO weekly_scores (week_start, {col}) VALUES ({week}, {sign}{val}) "
+                f"ON CONFLICT(week_start) DO UPDATE SET {col} = {col} {sign} {val};"
+            )
+            events = ["INSERT", "UPDATE"] if row == "NEW" else ["DELETE", "UPDATE"]
+            for event in events:
+                name = f"{table}_rollup_{event.lower()}_{row.lower()}"
+                # UPDATE removes the old row's contribution before adding the new one
+                timing = "BEFORE" if event == "UPDATE" and row == "OLD" else "AFTER"
+                cur.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {timing} {event} ON {table} WHEN {cond} BEGIN {upsert} END")
+
+def rebuild_week_scores(conn):
+    cur = conn.cursor()
+    cur.execute("DELETE FROM weekly_scores")
+    for table, col, value, where in ROLLUP_SOURCES:
+        week = WEEK_START_SQL.format(col="t.log_date")
+        cur.execute(
+            f"INSERT INTO weekly_scores (week_start, {col}) "
+            f"SELECT {week} AS wk, SUM({value.format(row='t')}) FROM {table} t "
+            f"WHERE {where.format(row='t')} AND t.log_date IS NOT NULL GROUP BY wk "
+            f"ON CONFLICT(week_start) DO UPDATE SET {col} = excluded.{col}"
+        )
+    return cur.execute("SELECT COUNT(*) FROM weekly_scores").fetchone()[0]
+
+# -----------------------------
+# Analytics Snapshot Tracking
+# -----------------------------
+# snapshot_dirty lists the (table, YYYY) partitions written since
+# analytics.py last exported them; year '*' asks for a full re-export.
+# gen increases on every change so an export only clears what it saw.
+SNAPSHOT_ALL = "*"
+
+def create_snapshot_triggers(cur):
+    for table in DATA_TABLES:
+        for row, events in [("NEW", ["INSERT", "UPDATE"]), ("OLD", ["DELETE", "UPDATE"])]:
+            for event in events:
+                cur.execute(
+                    f"CREATE TRIGGER IF NOT EXISTS {table}_snapshot_{event.lower()}_{row.lower()} AFTER {event} ON {table} "
+                    f"WHEN {row}.log_date IS NOT NULL BEGIN "
+                    f"INSERT INTO snapshot_dirty (table_name, year) VALUES ('{table}', substr({row}.log_date, 1, 4)) "
+                    f"ON CONFLICT(table_name, year) DO UPDATE SET gen = gen + 1; END"
+                )
+
+def mark_snapshot_rebuild(conn):
+    conn.executemany(
+        "INSERT INTO snapshot_dirty (table_name, year) VALUES (?, ?) ON CONFLICT(table_name, year) DO UPDATE SET gen = gen + 1",
+        [(t, SNAPSHOT_ALL) for t in DATA_TABLES],
+    )
+
+# -----------------------------
+# Week Versions
+# -----------------------------
+# Per-week write counters for the tables whose derived results are cached
+# week by week (see overload.py, body_trend.py). Like table_versions they only
+# ever go up, so any number of processes can compare against what they last saw.
+WEEK_TRACKED_TABLES = ["workout_logs", "body_metrics"]
+
+def create_week_version_triggers(cur):
+    for table in WEEK_TRACKED_TABLES:
+        for row, events in [("NEW", ["INSERT", "UPDATE"]), ("OLD", ["DELETE", "UPDATE"])]:
+            week = WEEK_START_SQL.format(col=f"{row}.log_date")
+            for event in events:
+                cur.execute(
+                    f"CREATE TRIGGER IF NOT EXISTS {table}_weekver_{event.lower()}_{row.lower()} AFTER {event} ON {table} "
+                    f"WHEN {row}.log_date IS NOT NULL BEGIN "
+                    f"INSERT INTO week_versions (table_name, week_start) VALUES ('{table}', {week}) "
+                    f"ON CONFLICT(table_name, week_start) DO UPDATE SET version = version + 1; END"
+                )
+
+def bump_week_versions(conn, tables=WEEK_TRACKED_TABLES):
+    for table in tables:
+        week = WEEK_START_SQL.format(col="log_date")
+        conn.execute(
+            f"INSERT INTO week_versions (table_name, week_start) "
+            f"SELECT DISTINCT '{table}', {week} FROM {table} WHERE log_date IS NOT NULL "
+            f"ON CONFLICT(table_name, week_start) DO UPDATE SET version = version + 1"
+        )
+
+def fetch_week_versions(conn, table):
+    return dict(conn.execute("SELECT week_start, version FROM week_versions WHERE table_name = ?", (table,)).fetchall())
+
+# Beyond this many changed weeks one full read is cheaper than a range per week
+FULL_READ_WEEKS = 100
+# What a cache has seen of a table: (table_versions version, week_versions counters)
+NOTHING_SEEN = (None, {})
+# weeks: sorted week_start strings written since `seen`; frame: build() of their rows, or of every row when full
+WeekChanges = namedtuple("WeekChanges", ["seen", "weeks", "frame", "full"])
+
+def read_changed_weeks(path, table, columns, build, seen=NOTHING_SEEN):
+    """Rows of the weeks of a WEEK_TRACKED_TABLES table written since `seen`, for caches refreshed week by week.
+
+    Pass the returned `seen` to the next call. Every row is read the first
+    time, or when more than FULL_READ_WEEKS weeks changed.
+    """
+    with get_pool(path).reader() as conn:
+        # One read transaction: the counters and the rows they describe come from the same snapshot
+        conn.execute("BEGIN")
+        try:
+            version = conn.execute("SELECT version FROM table_versions WHERE table_name = ?", (table,)).fetchone()[0]
+            if version == seen[0]:
+                return WeekChanges(seen, [], None, False)
+            versions = fetch_week_versions(conn, table)
+            weeks = sorted(w for w in versions.keys() | seen[1].keys() if versions.get(w) != seen[1].get(w))
+            full = not seen[1] or len(weeks) > FULL_READ_WEEKS
+            rows = None
+            if weeks:
+                q, params = f"SELECT {', '.join(columns)} FROM {table} WHERE log_date IS NOT NULL", []
+                if not full:
+                    q += " AND (" + " OR ".join(["log_date BETWEEN ? AND ?"] * len(weeks)) + ")"
+                    params = [b for w in weeks for b in (w, (date.fromisoformat(w) + timedelta(days=6)).isoformat())]
+                rows = pd.read_sql_query(q, conn, params=params)
+        finally:
+            conn.execute("COMMIT")
+    frame = build(typed_frame(rows, table)) if weeks else None
+    return WeekChanges((version, versions), weeks, frame, full)
+
+# -----------------------------
+# Set-Level Notes
+# -----------------------------
+# workout_sets holds the individual sets parsed out of workout_logs.notes
+# (see set_notes.py). Triggers queue every new or changed note in
+# set_parse_status with status PENDING and drop its old sets; parse_pending()
+# parses queued notes in batches. Writes from this app parse their own rows
+# in the same transaction, and warm-up / backfill_sets.py drain the rest.
+PENDING = 0
+SET_PARSE_CHUNK = 5000
+
+def create_set_triggers(cur):
+    queue = (
+        f"INSERT INTO set_parse_status (log_id, status) SELECT NEW.id, {PENDING} WHERE COALESCE(NEW.notes, '') != '' "
+        f"ON CONFLICT(log_id) DO UPDATE SET status = {PENDING};"
+    )
+    clear = "DELETE FROM workout_sets WHERE log_id = OLD.id; DELETE FROM set_parse_status WHERE log_id = OLD.id;"
+    for name, event, body in [
+        ("insert", "AFTER INSERT ON workout_logs", queue),
+        ("update", "AFTER UPDATE OF notes ON workout_logs WHEN OLD.notes IS NOT NEW.notes", clear + " " + queue),
+        ("delete", "AFTER DELETE ON workout_logs", clear),
+    ]:
+        cur.execute(f"CREATE TRIGGER IF NOT EXISTS workout_logs_sets_{name} {event} BEGIN {body} END")
+
+def queue_all_notes(conn):
+    conn.execute("DELETE FROM workout_sets")
+    conn.execute("DELETE FROM set_parse_status")
+    conn.execute(
+        f"INSERT INTO set_parse_status (log_id, status) SELECT id, {PENDING} FROM workout_logs WHERE COALESCE(notes, '') != ''"
+    )
+
+def parse_pending(conn, log_ids=None, limit=SET_PARSE_CHUNK):
+    """Parse up to `limit` queued notes (only those in log_ids, if given) inside the caller's transaction.
+
+    Returns the number of notes parsed; 0 means nothing was queued.
+    """
+    q = f"SELECT w.id, w.notes FROM set_parse_status p JOIN workout_logs w ON w.id = p.log_id WHERE p.status = {PENDING}"
+    params = []
+    if log_ids is not None:
+        q += f" AND p.log_id IN ({','.join('?' * len(log_ids))})"
+        params = list(log_ids)
+    rows = conn.execute(q + " ORDER BY p.log_id LIMIT ?", [*params, limit]).fetchall()
+    if not rows:
+        return 0
+    ids, notes = zip(*rows)
+    sets, status = parse_notes(ids, notes)
+    conn.executemany(
+        f"INSERT OR REPLACE INTO workout_sets ({', '.join(SET_COLUMNS)}) VALUES ({', '.join('?' * len(SET_COLUMNS))})",
+        sets.astype(object).where(sets.notna(), None).itertuples(index=False, name=None),
+    )
+    conn.executemany("UPDATE set_parse_status SET status = ? WHERE log_id = ?", [(int(v), int(k)) for k, v in status.items()])
+    return len(rows)
+
+def backfill_sets(pool, chunk=SET_PARSE_CHUNK, progress=None):
+    """Parse every queued note, one transaction per chunk so writers are never blocked for long."""
+    total = 0
+    while True:
+        with pool.writer() as conn:
+            n = parse_pending(conn, limit=chunk)
+        if not n:
+            return total
+        total += n
+        if progress:
+            progress(total)
+
+def fetch_set_parse_counts(conn):
+    counts = dict(conn.execute("SELECT status, COUNT(*) FROM set_parse_status GROUP BY status").fetchall())
+    return {name: counts.get(status, 0) for name, status in
+            [("pending", PENDING), ("parsed", PARSED), ("no_sets", NO_SETS), ("failed", FAILED)]}
+
+def fetch_failed_notes(conn, limit=20):
+    return conn.execute(
+        "SELECT w.log_date, w.exercise_name, w.notes FROM set_parse_status p JOIN workout_logs w ON w.id = p.log_id "
+        "WHERE p.status = ? ORDER BY w.log_date DESC LIMIT ?", (FAILED, limit),
+    ).fetchall()
+
+# -----------------------------
+# Notes Search
+# -----------------------------
+# notes_fts is an FTS5 index over the notes of every data table, kept in step
+# by triggers. An entry's rowid is its row's id * len(SEARCH_SOURCES) + the
+# table's position, so triggers replace or delete it without a lookup and a
+# match joins back to its row on the primary key. The index is derived data:
+# exports only read the data tables, and rebuild_notes_index() recreates it.
+SEARCH_SOURCES = [
+    ("workout_logs", "exercise_name"),
+    ("custom_exercises", "exercise_name"),
+    ("sports_logs", "sport_name"),
+    ("body_metrics", "'Body metrics'"),
+]
+# "shoulders" finds "shoulder", "Café" finds "cafe"
+SEARCH_TOKENIZER = "porter unicode61 remove_diacritics 2"
+# Around matched terms in search_notes() snippets; control characters, so they never clash with note text
+HIGHLIGHT = ("\x02", "\x03")
+SEARCH_LIMIT = 20
+
+def fts5_available(conn):
+    return bool(conn.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')").fetchone()[0])
+
+def notes_index_exists(conn):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'notes_fts'").fetchone() is not None
+
+def create_notes_index(conn):
+    """Create notes_fts, its triggers and its contents; returns False if this SQLite lacks FTS5."""
+    if not fts5_available(conn):
+        return False
+    conn.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(notes, tokenize='{SEARCH_TOKENIZER}')")
+    create_search_triggers(conn.cursor())
+    rebuild_notes_index(conn)
+    return True
+
+def create_search_triggers(cur):
+    n = len(SEARCH_SOURCES)
+    for i, (table, _) in enumerate(SEARCH_SOURCES):
+        add = f"INSERT INTO notes_fts (rowid, notes) SELECT NEW.id * {n} + {i}, NEW.notes WHERE COALESCE(NEW.notes, '') != '';"
+        drop = f"DELETE FROM notes_fts WHERE rowid = OLD.id * {n} + {i};"
+        for name, event, body in [
+            ("insert", f"AFTER INSERT ON {table}", add),
+            ("update", f"AFTER UPDATE OF notes ON {table} WHEN OLD.notes IS NOT NEW.notes", drop + " " + add),
+            ("delete", f"AFTER DELETE ON {table}", drop),
+        ]:
+            cur.execute(f"CREATE TRIGGER IF NOT EXISTS {table}_search_{name} {event} BEGIN {body} END")
+
+def rebuild_notes_index(conn):
+    if not notes_index_exists(conn):
+        return  # no FTS5 when the schema was created; search_notes.py --rebuild adds it later
+    n = len(SEARCH_SOURCES)
+    conn.execute("DELETE FROM notes_fts")
+    for i, (table, _) in enumerate(SEARCH_SOURCES):
+        conn.execute(f"INSERT INTO notes_fts (rowid, notes) SELECT id * {n} + {i}, notes FROM {table} WHERE COALESCE(notes, '') != ''")
+    # Merge the b-trees left by the bulk insert so the first searches are as fast as later ones
+    conn.execute("INSERT INTO notes_fts (notes_fts) VALUES ('optimize')")
+
+def fts_query(text):
+    """FTS5 query for typed text: every word must match, "quoted words" as a phrase, word* as a prefix.
+
+    Everything is quoted, so punctuation and FTS5 keywords (AND, NEAR, -) are
+    plain text and never a syntax error. Returns None when there are no words.
+    """
+    terms = []
+    for phrase, word, star in re.findall(r'"([^"]*)"|(\w+)(\*?)', text):
+        if phrase.strip():
+            terms.append('"' + phrase.strip() + '"')
+        elif word:
+            terms.append(f'"{word}"{star}')
+    return " ".join(terms) or None
+
+@perf.timed("search_notes")
+def search_notes(conn, text, limit=SEARCH_LIMIT):
+    """Best matches for text across all notes, as a frame of source, log_date, name and a snippet with HIGHLIGHT marks.
+
+    Ranked by BM25; equally good matches newest first. Without the FTS5 index (SQLite built
+    without it) falls back to an unranked LIKE scan over every table.
+    """
+    columns = ["source", "log_date", "name", "snippet"]
+    query = fts_query(text)
+    if query is None:
+        return pd.DataFrame(columns=columns)
+    if not notes_index_exists(conn):
+        return _search_notes_like(conn, text, limit, columns)
+    n = len(SEARCH_SOURCES)
+
+    def per_source(expr):
+        return f"CASE h.rowid % {n} " + " ".join(f"WHEN {i} THEN {expr(i, t, label)}" for i, (t, label) in enumerate(SEARCH_SOURCES)) + " END"
+
+    joins = " ".join(f"LEFT JOIN {t} t{i} ON h.rowid % {n} = {i} AND t{i}.id = h.rowid / {n}" for i, (t, _) in enumerate(SEARCH_SOURCES))
+    name = per_source(lambda i, t, label: label if label.startswith("'") else f"t{i}.{label}")
+    q = f"""
+    WITH h AS (
+        SELECT rowid, snippet(notes_fts, 0, ?, ?, '…', 12) AS snippet, rank
+        FROM notes_fts WHERE notes_fts MATCH ? ORDER BY rank, rowid DESC LIMIT ?
+    )
+    SELECT {per_source(lambda i, t, label: f"'{t}'")} AS source, {per_source(lambda i, t, label: f"t{i}.log_date")} AS log_date,
+           {name} AS name, h.snippet
+    FROM h {joins}
+    ORDER BY h.rank, log_date DESC
+    """
+    return pd.read_sql_query(q, conn, params=[*HIGHLIGHT, query, limit])
+
+def _search_notes_like(conn, text, limit, columns):
+    words = [w for phrase, word, _ in re.findall(r'"([^"]*)"|(\w+)(\*?)', text) for w in [phrase.strip() or word] if w]
+    selects = []
+    for table, label in SEARCH_SOURCES:
+        where = " AND ".join(["notes LIKE ?"] * len(words))
+        selects.append(f"SELECT '{table}' AS source, log_date, {label} AS name, notes AS snippet FROM {table} WHERE {where}")
+    params = [f"%{w}%" for _ in SEARCH_SOURCES for w in words]
+    q = " UNION ALL ".join(selects) + " ORDER BY log_date DESC LIMIT ?"
+    return pd.read_sql_query(q, conn, params=[*params, limit])[columns]
+
+# Rebuilds run after a bulk load that bypassed the triggers
+DERIVED_REBUILDS = [rebuild_week_scores, mark_snapshot_rebuild, bump_week_versions, queue_all_notes, rebuild_notes_index]
+
+@perf.timed("fetch_week_score")
+def fetch_week_score(conn, week_start):
+    row = conn.execute(
+        "SELECT planned_done, custom_count, sport_minutes FROM weekly_scores WHERE week_start = ?",
+        (week_start.isoformat(),),
+    ).fetchone()
+    if row is None:
+        return 0, 0
+    planned_done, custom_count, sport_minutes = row
+    sport_points = min(SPORT_POINTS_CAP, int(sport_minutes // SPORT_MINUTES_PER_POINT))
+    return planned_done * 2 + custom_count + sport_points, sport_points
+
+def check_week_scores(conn):
+    # Compare every rollup row against the full-table calculation
+    df_logs, df_custom, df_sports = fetch_logs(conn), fetch_custom(conn), fetch_sports(conn)
+    weeks = set()
+    for df in [df_logs, df_custom, df_sports]:
+        if not df.empty:
+            weeks.update(week_range(d)[0] for d in pd.to_datetime(df["log_date"]).dt.date.dropna())
+    weeks.update(date.fromisoformat(r[0]) for r in conn.execute("SELECT week_start FROM weekly_scores"))
+    mismatches = []
+    for week_start in sorted(weeks):
+        expected = calc_week_score(df_logs, df_custom, df_sports, *week_range(week_start))
+        actual = fetch_week_score(conn, week_start)
+        if tuple(expected) != tuple(actual):
+            mismatches.append((week_start, expected, actual))
+    return mismatches
+
+def week_range(d: date):
+    start = d - timedelta(days=d.weekday())
+    end = start + timedelta(days=6)
+    return start, end
+
+def _in_week(df, week_start, week_end):
+    dates = df["log_date"]
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates)  # untyped frames with text dates
+    return df[(dates >= pd.Timestamp(week_start)) & (dates < pd.Timestamp(week_end) + pd.Timedelta(days=1))]
+
+@perf.timed("calc_week_score")
+def calc_week_score(df_logs, df_custom, df_sports, week_start, week_end):
+    score = 0
+    if df_logs is not None and not df_logs.empty:
+        tmp = _in_week(df_logs, week_start, week_end)
+        if not tmp.empty:
+            score += len(tmp[tmp["skipped"] == 0]) * 2
+    if df_custom is not None and not df_custom.empty:
+        tmpc = _in_week(df_custom, week_start, week_end)
+        score += len(tmpc)
+    sport_points = 0
+    if df_sports is not None and not df_sports.empty:
+        tmps = _in_week(df_sports, week_start, week_end)
+        if not tmps.empty:
+            total = tmps["minutes"].fillna(0).sum()
+            sport_points = min(SPORT_POINTS_CAP, int(total // SPORT_MINUTES_PER_POINT))
+            score += sport_points
+    return score, sport_points
+
+# -----------------------------
+# Change Tracking
+# -----------------------------
+class TableVersions:
+    """Per-table write counters, used as cache keys for the fetch_* helpers.
+
+    `PRAGMA data_version` on a long-lived connection only changes when some
+    other connection commits, so an unchanged value means no table can have
+    changed and the stored counters are returned without reading anything.
+    """
+
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        self._conn = None
+        self._data_version = None
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def snapshot(self):
+        with self._lock:
+            if self._conn is None:
+                self._conn = connect_db(self.path)
+            data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if data_version != self._data_version:
+                rows = self._conn.execute("SELECT table_name, version FROM table_versions").fetchall()
+                self._versions = dict(rows)
+                self._data_version = data_version
+            return dict(self._versions)
+
+    def get(self, table):
+        return self.snapshot().get(table, 0)
+
+# -----------------------------
+# Typed Frames
+# -----------------------------
+# Column -> dtype for frames returned by the fetch_* helpers (and the Parquet
+# snapshot in analytics.py). Dates become datetime64, repeated names become
+# categoricals and counts are downcast. Integer columns holding NULLs, text
+# or values the dtype cannot hold fall back to float64 (text becomes NaN)
+# instead of failing or wrapping around. Weights stay float64 so displayed
+# values keep the exact number that was entered.
+COLUMN_TYPES = {
+    "workout_logs": {
+        "id": "int64", "log_date": "date", "day_name": "category", "exercise_name": "category",
+        "planned_sets": "category", "planned_reps": "category", "actual_sets": "int32", "actual_reps": "int32",
+        "weight": "float64", "skipped": "int8", "notes": "string",
+    },
+    "custom_exercises": {
+        "id": "int64", "log_date": "date", "day_name": "category", "exercise_name": "category",
+        "actual_sets": "int32", "actual_reps": "int32", "weight": "float64", "notes": "string",
+    },
+    "sports_logs": {
+        "id": "int64", "log_date": "date", "sport_name": "category", "minutes": "int32",
+        "intensity": "category", "notes": "string",
+    },
+    "body_metrics": {
+        "id": "int64", "log_date": "date", "weight": "float64", "body_fat": "float64", "lean_mass": "float64",
+        "muscle_mass": "float64", "water_mass": "float64", "notes": "string",
+    },
+}
+
+def typed_frame(df, table):
+    for col, t in COLUMN_TYPES[table].items():
+        if col not in df:
+            continue
+        if t == "date":
+            df[col] = pd.to_datetime(df[col], format="ISO8601", errors="coerce")
+        elif t == "category":
+            df[col] = df[col].astype("category")
+        elif t.startswith("int"):
+            limits = np.iinfo(t)
+            if pd.api.types.is_integer_dtype(df[col]):
+                # SQLite returned whole numbers without NULLs: only the range needs checking
+                values = df[col]
+                fits = values.empty or limits.min <= values.min() and values.max() <= limits.max
+            else:
+                values = pd.to_numeric(df[col], errors="coerce")
+                fits = values.notna().all() and (values % 1 == 0).all() and values.between(limits.min, limits.max).all()
+            df[col] = values.astype(t if fits else "float64")
+        elif t != "string":
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype(t)
+    return df
+
+def _select(columns, notes):
+    # Notes are free text and the largest column; only views that show them ask for them
+    return ", ".join(columns + (["notes"] if notes else []))
+
+# -----------------------------
+# Queries
+# -----------------------------
+@perf.timed("fetch_logs")
+def fetch_logs(conn, start_date=None, end_date=None, notes=False):
+    cols = _select(["log_date", "day_name", "exercise_name", "actual_sets", "actual_reps", "weight", "skipped"], notes)
+    q = f"SELECT {cols} FROM workout_logs"
+    params = []
+    if start_date and end_date:
+        q += " WHERE log_date BETWEEN ? AND ?"
+        params = [start_date, end_date]
+    q += " ORDER BY log_date DESC"
+    return typed_frame(pd.read_sql_query(q, conn, params=params), "workout_logs")
+
+@perf.timed("fetch_custom")
+def fetch_custom(conn, start_date=None, end_date=None, notes=False):
+    cols = _select(["log_date", "day_name", "exercise_name", "actual_sets", "actual_reps", "weight"], notes)
+    q = f"SELECT {cols} FROM custom_exercises"
+    params = []
+    if start_date and end_date:
+        q += " WHERE log_date BETWEEN ? AND ?"
+        params = [start_date, end_date]
+    q += " ORDER BY log_date DESC"
+    return typed_frame(pd.read_sql_query(q, conn, params=params), "custom_exercises")
+
+@perf.timed("fetch_sports")
+def fetch_sports(conn, start_date=None, end_date=None, notes=False):
+    cols = _select(["log_date", "sport_name", "minutes", "intensity"], notes)
+    q = f"SELECT {cols} FROM sports_logs"
+    params = []
+    if start_date and end_date:
+        q += " WHERE log_date BETWEEN ? AND ?"
+        params = [start_date, end_date]
+    q += " ORDER BY log_date DESC"
+    return typed_frame(pd.read_sql_query(q, conn, params=params), "sports_logs")
+
+@perf.timed("fetch_metrics")
+def fetch_metrics(conn, start_date=None, end_date=None, limit=None, notes=False):
+    cols = _select(["log_date", "weight", "body_fat", "lean_mass", "muscle_mass", "water_mass"], notes)
+    q = f"SELECT {cols} FROM body_metrics"
+    params = []
+    if start_date and end_date:
+        q += " WHERE log_date BETWEEN ? AND ?"
+        params = [start_date, end_date]
+    q += " ORDER BY log_date DESC, id DESC"
+    if limit:
+        q += " LIMIT ?"
+        params.append(limit)
+    return typed_frame(pd.read_sql_query(q, conn, params=params), "body_metrics")
+
+@perf.timed("fetch_recent_activity")
+def fetch_recent_activity(conn, limit=3):
+    q = """
+    SELECT log_date, exercise_name
+    FROM workout_logs
+    WHERE skipped = 0
+    ORDER BY log_date DESC, id DESC
+    LIMIT ?
+    """
+    return typed_frame(pd.read_sql_query(q, conn, params=[limit]), "workout_logs")
+
+@perf.timed("fetch_last_log")
+def fetch_last_log(conn, exercise_name):
+    # Fetch the most recent log for this specific exercise
+    q = """
+    SELECT log_date, actual_sets, actual_reps, weight, notes
+    FROM workout_logs
+    WHERE exercise_name = ? AND skipped = 0
+    ORDER BY log_date DESC
+    LIMIT 1
+    """
+    try:
+        df = typed_frame(pd.read_sql_query(q, conn, params=[exercise_name]), "workout_logs")
+        return df.iloc[0] if not df.empty else None
+    except Exception:
+        return None
+
+@perf.timed("fetch_last_logs")
+def fetch_last_logs(conn, exercise_names):
+    # Most recent non-skipped session for each exercise, in one round trip
+    cols = ["exercise_name", "log_date", "actual_sets", "actual_reps", "weight", "notes"]
+    names = list(dict.fromkeys(exercise_names))
+    if not names:
+        return typed_frame(pd.DataFrame(columns=cols), "workout_logs").set_index("exercise_name")
+    # One index seek per name on (exercise_name, skipped, log_date) rather
+    # than ranking every past session of each exercise
+    q = f"""
+    WITH names(name) AS (VALUES {",".join(["(?)"] * len(names))})
+    SELECT {", ".join("w." + c for c in cols)}
+    FROM names
+    JOIN workout_logs w ON w.id = (
+        SELECT x.id FROM workout_logs x
+        WHERE x.exercise_name = names.name AND x.skipped = 0
+        ORDER BY x.log_date DESC, x.id DESC
+        LIMIT 1
+    )
+    """
+    return typed_frame(pd.read_sql_query(q, conn, params=names), "workout_logs").set_index("exercise_name")
+
+@perf.timed("fetch_set_volume")
+def fetch_set_volume(conn, start_date=None, end_date=None):
+    # Per session and exercise, from the parsed sets; the date range uses idx_workout_logs_date
+    q = """
+    SELECT w.log_date, w.exercise_name, COUNT(*) AS sets, SUM(s.reps) AS reps,
+           SUM(COALESCE(s.weight, 0) * s.reps) AS tonnage, MAX(s.weight) AS top_weight, SUM(s.drop_set) AS drop_sets
+    FROM workout_logs w JOIN workout_sets s ON s.log_id = w.id
+    """
+    params = []
+    if start_date and end_date:
+        q += " WHERE w.log_date BETWEEN ? AND ?"
+        params = [start_date, end_date]
+    q += " GROUP BY w.id ORDER BY w.log_date, w.exercise_name"
+    return typed_frame(pd.read_sql_query(q, conn, params=params), "workout_logs")
+
+@perf.timed("fetch_drop_sets")
+def fetch_drop_sets(conn, exercise_name=None):
+    # Every drop with the weight it dropped from; only sessions found via the partial drop_set index are read
+    q = """
+    SELECT w.log_date, w.exercise_name, d.set_no, d.prev_weight, d.weight, d.reps,
+           1 - d.weight / NULLIF(d.prev_weight, 0) AS drop_pct
+    FROM (
+        SELECT log_id, set_no, weight, reps, drop_set, LAG(weight) OVER (PARTITION BY log_id ORDER BY set_no) AS prev_weight
+        FROM workout_sets WHERE log_id IN (SELECT log_id FROM workout_sets WHERE drop_set = 1)
+    ) d JOIN workout_logs w ON w.id = d.log_id
+    WHERE d.drop_set = 1
+    """
+    params = []
+    if exercise_name:
+        q += " AND w.exercise_name = ?"
+        params = [exercise_name]
+    q += " ORDER BY w.log_date, w.exercise_name, d.set_no"
+    return typed_frame(pd.read_sql_query(q, conn, params=params), "workout_logs")
+
+def fetch_profile(conn):
+    return dict(conn.execute("SELECT key, value FROM athlete_profile").fetchall())
+
+# -----------------------------
+# Writes
+# -----------------------------
+WORKOUT_COLUMNS = ["exercise_name", "planned_sets", "planned_reps", "actual_sets", "actual_reps", "weight", "skipped", "notes"]
+CUSTOM_COLUMNS = ["exercise_name", "actual_sets", "actual_reps", "weight", "notes"]
+# Accepted (min, max) of numeric columns; writes outside them are rejected
+COLUMN_RANGES = {
+    "workout_logs": {"actual_sets": (0, 100), "actual_reps": (0, 1000), "weight": (0, 1000), "skipped": (0, 1)},
+    "custom_exercises": {"actual_sets": (0, 100), "actual_reps": (0, 1000), "weight": (0, 1000)},
+    "sports_logs": {"minutes": (0, 1440)},
+    "body_metrics": {
+        "weight": (0, 500), "body_fat": (0, 100), "lean_mass": (0, 500), "muscle_mass": (0, 500), "water_mass": (0, 500),
+    },
+}
+
+def check_ranges(table, row):
+    """Raise ValueError for a value in row outside COLUMN_RANGES, or not a whole number in an integer column."""
+    for col, (low, high) in COLUMN_RANGES[table].items():
+        value = row.get(col)
+        if value is None:
+            continue
+        if not isinstance(value, (int, float)) or not low <= value <= high:
+            raise ValueError(f"{table}.{col} must be a number between {low} and {high}, not {value!r}")
+        if COLUMN_TYPES[table][col].startswith("int") and value != int(value):
+            raise ValueError(f"{table}.{col} must be a whole number, not {value!r}")
+
+SessionWriteResult = namedtuple("SessionWriteResult", ["inserted", "updated", "custom", "latency_ms"])
+
+def _upsert_sql(table, columns):
+    key = ["log_date", "day_name", "exercise_name"]
+    cols = key + [c for c in columns if c not in key]
+    updates = ", ".join(f"{c} = excluded.{c}" for c in cols if c not in key)
+    return (
+        f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))}) "
+        f"ON CONFLICT(log_date, day_name, exercise_name) DO UPDATE SET {updates}"
+    ), cols
+
+@perf.timed("save_workout_session")
+def save_workout_session(pool, log_date, day_name, entries, custom=None):
+    """Write one session (planned entries plus an optional custom exercise) in a single transaction.
+
+    entries and custom are dicts keyed by WORKOUT_COLUMNS / CUSTOM_COLUMNS.
+    Rows are upserted on (log_date, day_name, exercise_name), so saving the
+    same day again updates it instead of adding duplicates.
+    """
+    t0 = time.perf_counter()
+    with pool.writer() as conn:
+        result = write_workout_session(conn, log_date, day_name, entries, custom)
+    return result._replace(latency_ms=(time.perf_counter() - t0) * 1000)
+
+def write_workout_session(conn, log_date, day_name, entries, custom=None):
+    # save_workout_session inside the caller's transaction, e.g. a write-queue group commit
+    t0 = time.perf_counter()
+    log_date = log_date.isoformat() if isinstance(log_date, date) else log_date
+    base = {"log_date": log_date, "day_name": day_name}
+    for row in entries:
+        check_ranges("workout_logs", row)
+    if custom:
+        check_ranges("custom_exercises", custom)
+    names = [e["exercise_name"] for e in entries]
+    existing = 0
+    if names:
+        existing = conn.execute(
+            f"SELECT COUNT(*) FROM workout_logs WHERE log_date = ? AND day_name = ? AND exercise_name IN ({','.join('?' * len(names))})",
+            [log_date, day_name, *names],
+        ).fetchone()[0]
+    sql, cols = _upsert_sql("workout_logs", WORKOUT_COLUMNS)
+    conn.executemany(sql, [[{**base, **e}.get(c) for c in cols] for e in entries])
+    if names:
+        # Parse this session's notes into workout_sets in the same transaction
+        ids = [r[0] for r in conn.execute(
+            f"SELECT id FROM workout_logs WHERE log_date = ? AND day_name = ? AND exercise_name IN ({','.join('?' * len(names))})",
+            [log_date, day_name, *names],
+        )]
+        parse_pending(conn, ids)
+    custom_rows = 0
+    if custom:
+        sql, cols = _upsert_sql("custom_exercises", CUSTOM_COLUMNS)
+        custom_rows = conn.execute(sql, [{**base, **custom}.get(c) for c in cols]).rowcount
+    written = len(set(names))
+    return SessionWriteResult(written - existing, existing, custom_rows, (time.perf_counter() - t0) * 1000)
+
+def write_body_metrics(conn, log_date, weight, body_fat):
+    check_ranges("body_metrics", {"weight": weight, "body_fat": body_fat})
+    conn.execute("INSERT INTO body_metrics (log_date, weight, body_fat) VALUES (?,?,?)", (log_date, weight, body_fat))
+
+def save_profile(pool, **values):
+    with pool.writer() as conn:
+        conn.executemany(
+            "INSERT INTO athlete_profile (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            list(values.items()),
+        )
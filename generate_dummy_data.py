@@ -1,112 +1,182 @@
-import sqlite3
-import yaml
-import random
-from datetime import datetime, timedelta
+import argparse
 import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from datetime import date, datetime, timedelta
+
+import yaml
+
+from db import ATHLETES_DIR, DB_PATH, DATA_TABLES, athlete_db_path, backfill_sets, get_pool, init_db, triggers_suspended
 
-DB_PATH = "fitness_tracker.db"
 WORKOUTS_YAML = "workouts.yaml"
 
-def generate_data():
-    if not os.path.exists(WORKOUTS_YAML):
-        print(f"Error: {WORKOUTS_YAML} not found.")
-        return
+SPORTS = [("Padel", "High"), ("Running", "Moderate"), ("Swimming", "Moderate"), ("Cycling", "Low")]
+# Templates filled with the logged weight/reps; the set-style ones end up in workout_sets
+WORKOUT_NOTES = [
+    "Felt good", "Hard, shoulder pain on the last set", "Okay", "", "Great pump", "Felt heavy today",
+    "{weight}kgx{reps}, {weight}kgx{reps}, {back}kgx{reps}", "{weight}kgx{reps} > {drop}kgx{reps}",
+]
+CUSTOM_EXERCISES = ["Burpees", "Farmer Carries", "Kettlebell Swings", "Plank", "Jump Rope"]
 
-    with open(WORKOUTS_YAML, "r") as f:
+# Days generated per executemany round; keeps memory flat for long histories
+CHUNK_DAYS = 366
+
+def load_schedule(path=WORKOUTS_YAML):
+    with open(path, "r") as f:
         data = yaml.safe_load(f)
+    return data.get("schedule", {})
+
+def base_weight(name, progress_factor):
+    # Weights vary by exercise type, with slight progress over time
+    if "Press" in name: return 20 + (10 * progress_factor)
+    if "Raise" in name: return 8 + (2 * progress_factor)
+    if "Squat" in name or "Leg" in name: return 40 + (20 * progress_factor)
+    if "Curl" in name: return 10 + (4 * progress_factor)
+    return 0
 
-    schedule = data.get("schedule", {})
-    
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-
-    # Clear existing data for a clean slate
-    print("Clearing old data...")
-    cur.execute("DELETE FROM workout_logs")
-    cur.execute("DELETE FROM custom_exercises")
-    cur.execute("DELETE FROM sports_logs")
-    cur.execute("DELETE FROM body_metrics")
-
-    # Generate 30 days of data
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=30)
-    
-    print(f"Generating data from {start_date.date()} to {end_date.date()}...")
-
-    current_date = start_date
-    while current_date <= end_date:
+def generate_rows(schedule, start_date, days, rng, skip_rate=0.1, sports_rate=0.2, custom_rate=0.1, metrics_rate=0.3, start_weight=85.0):
+    """Yield {table: [rows]} chunks covering `days` days from start_date."""
+    total = max(days, 1)
+    chunk = {t: [] for t in DATA_TABLES}
+    for offset in range(days + 1):
+        current_date = start_date + timedelta(days=offset)
+        log_date = current_date.strftime("%Y-%m-%d")
         day_name = current_date.strftime("%A")
-        
+        progress_factor = offset / total
+
         # 1. Workout Logs
-        if day_name in schedule:
-            day_plan = schedule[day_name]
-            exercises = day_plan.get("exercises", [])
-            
-            for ex in exercises:
-                # 90% chance to do the workout
-                if random.random() > 0.1:
-                    name = ex["name"]
-                    
-                    # Parse target sets/reps
-                    target_sets = ex.get("sets", 3)
-                    if isinstance(target_sets, str): target_sets = 3
-                    
-                    # Simulate slight progress over time
-                    # Progress factor: 0.0 to 1.0 over the 30 days
-                    progress_factor = (current_date - start_date).days / 30
-                    
-                    # Weights vary by exercise type
-                    base_weight = 0
-                    if "Press" in name: base_weight = 20 + (10 * progress_factor)
-                    elif "Raise" in name: base_weight = 8 + (2 * progress_factor)
-                    elif "Squat" in name or "Leg" in name: base_weight = 40 + (20 * progress_factor)
-                    elif "Curl" in name: base_weight = 10 + (4 * progress_factor)
-                    
-                    actual_weight = round(base_weight + random.uniform(-2, 2), 1)
-                    if actual_weight < 0: actual_weight = 0
-
-                    cur.execute("""
-                        INSERT INTO workout_logs 
-                        (log_date, day_name, exercise_name, planned_sets, planned_reps, actual_sets, actual_reps, weight, skipped, notes)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        current_date.strftime("%Y-%m-%d"),
-                        day_name,
-                        name,
-                        str(target_sets),
-                        str(ex.get("reps", "10")),
-                        target_sets, # Mostly hit target sets
-                        random.randint(8, 12), # Variable reps
-                        actual_weight,
-                        0, # Not skipped
-                        random.choice(["Felt good", "Hard", "Okay", "", "Great pump", "Heavy"])
-                    ))
-
-        # 2. Body Metrics (Logged every ~3 days)
-        if random.random() < 0.3:
-            # Simulate weight loss: 85kg -> 83kg
-            progress_factor = (current_date - start_date).days / 30
-            weight = 85.0 - (2.0 * progress_factor) + random.uniform(-0.3, 0.3)
+        for ex in schedule.get(day_name, {}).get("exercises", []):
+            name = ex["name"]
+            target_sets = ex.get("sets", 3)
+            if isinstance(target_sets, str): target_sets = 3
+            skipped = rng.random() < skip_rate
+            actual_weight = max(0, round(base_weight(name, progress_factor) + rng.uniform(-2, 2), 1))
+            reps = 0 if skipped else rng.randint(8, 12)
+            note = "" if skipped else rng.choice(WORKOUT_NOTES).format(
+                weight=actual_weight, reps=reps, back=round(actual_weight * 0.9, 1), drop=round(actual_weight * 0.7, 1),
+            )
+            chunk["workout_logs"].append((
+                log_date, day_name, name, str(target_sets), str(ex.get("reps", "10")),
+                0 if skipped else target_sets,
+                reps,
+                0 if skipped else actual_weight,
+                1 if skipped else 0,
+                note,
+            ))
+
+        # 2. Custom Exercises
+        if rng.random() < custom_rate:
+            chunk["custom_exercises"].append((log_date, day_name, rng.choice(CUSTOM_EXERCISES), 3, rng.randint(10, 20), 0, ""))
+
+        # 3. Sports
+        if rng.random() < sports_rate:
+            sport, intensity = rng.choice(SPORTS)
+            chunk["sports_logs"].append((log_date, sport, rng.choice([20, 30, 45, 60, 90]), intensity, ""))
+
+        # 4. Body Metrics (weight loss trend over the whole range)
+        if rng.random() < metrics_rate:
+            weight = start_weight - (2.0 * progress_factor) + rng.uniform(-0.3, 0.3)
             bf = 22.0 - (1.0 * progress_factor)
-            
-            cur.execute("""
-                INSERT INTO body_metrics (log_date, weight, body_fat, lean_mass, muscle_mass, water_mass, notes)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (
-                current_date.strftime("%Y-%m-%d"),
-                round(weight, 1),
-                round(bf, 1),
+            chunk["body_metrics"].append((
+                log_date, round(weight, 1), round(bf, 1),
                 round(weight * (1 - bf/100), 1),
                 round(weight * (1 - bf/100) * 0.95, 1), # Simplified muscle mass
-                0,
-                "Morning weigh-in"
+                0, "Morning weigh-in",
             ))
 
-        current_date += timedelta(days=1)
+        if (offset + 1) % CHUNK_DAYS == 0:
+            yield chunk
+            chunk = {t: [] for t in DATA_TABLES}
+    yield chunk
+
+INSERTS = {
+    "workout_logs": "INSERT INTO workout_logs (log_date, day_name, exercise_name, planned_sets, planned_reps, actual_sets, actual_reps, weight, skipped, notes) VALUES (?,?,?,?,?,?,?,?,?,?)",
+    "custom_exercises": "INSERT INTO custom_exercises (log_date, day_name, exercise_name, actual_sets, actual_reps, weight, notes) VALUES (?,?,?,?,?,?,?)",
+    "sports_logs": "INSERT INTO sports_logs (log_date, sport_name, minutes, intensity, notes) VALUES (?,?,?,?,?)",
+    "body_metrics": "INSERT INTO body_metrics (log_date, weight, body_fat, lean_mass, muscle_mass, water_mass, notes) VALUES (?,?,?,?,?,?,?)",
+}
+
+def populate(conn, schedule, days, rng, end_date=None, **rates):
+    # Bulk insert into an open transaction; triggers should already be suspended
+    counts = {t: 0 for t in DATA_TABLES}
+    end_date = end_date or date.today()
+    start_date = datetime(end_date.year, end_date.month, end_date.day) - timedelta(days=days)
+    for chunk in generate_rows(schedule, start_date, days, rng, **rates):
+        for table, rows in chunk.items():
+            if rows:
+                conn.executemany(INSERTS[table], rows)
+                counts[table] += len(rows)
+    return counts
 
-    conn.commit()
-    conn.close()
-    print("Dummy data generation complete!")
+def athlete_db_paths(db_path, athletes):
+    if athletes == 1:
+        return [db_path]
+    # Same layout the app routes ?athlete=athleteN to
+    root = os.path.join(os.path.dirname(db_path), ATHLETES_DIR)
+    return [athlete_db_path(f"athlete{i + 1}", root) for i in range(athletes)]
+
+def generate_athlete(path, schedule, days, seed, fresh=False, end_date=None, **rates):
+    t0 = time.perf_counter()
+    if fresh:
+        for f in [path, path + "-wal", path + "-shm"]:
+            if os.path.exists(f):
+                os.remove(f)
+    init_db(path)
+    pool = get_pool(path)
+    with pool.writer() as conn, triggers_suspended(conn):
+        if not fresh:
+            # Clear existing data for a clean slate
+            for table in DATA_TABLES:
+                conn.execute(f"DELETE FROM {table}")
+        counts = populate(conn, schedule, days, random.Random(seed), end_date=end_date, **rates)
+    backfill_sets(pool)
+    pool.close()
+    return path, counts, time.perf_counter() - t0
+
+def generate_data(db_path=DB_PATH, days=30, athletes=1, seed=None, fresh=False, jobs=1, end_date=None, **rates):
+    if not os.path.exists(WORKOUTS_YAML):
+        print(f"Error: {WORKOUTS_YAML} not found.")
+        return
+
+    schedule = load_schedule()
+    seed = seed if seed is not None else random.randrange(1 << 30)
+    print(f"Generating {days} days for {athletes} athlete(s), seed {seed}...")
+
+    t0 = time.perf_counter()
+    args = [(path, schedule, days, seed + i, fresh, end_date) for i, path in enumerate(athlete_db_paths(db_path, athletes))]
+    total = 0
+    # Each athlete is its own database file, so athletes can generate in parallel
+    with ProcessPoolExecutor(max_workers=jobs) if jobs > 1 else nullcontext() as ex:
+        if ex:
+            results = (f.result() for f in [ex.submit(generate_athlete, *a, **rates) for a in args])
+        else:
+            results = (generate_athlete(*a, **rates) for a in args)
+        for path, counts, seconds in results:
+            total += sum(counts.values())
+            print(f" - {path}: {sum(counts.values())} rows ({', '.join(f'{t}={n}' for t, n in counts.items())}) in {seconds:.2f}s")
+
+    print(f"Dummy data generation complete! {total} rows in {time.perf_counter() - t0:.2f}s")
 
 if __name__ == "__main__":
-    generate_data()
+    parser = argparse.ArgumentParser(description="Generate deterministic dummy data for demos, load and regression testing.")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--years", type=float, help="Overrides --days")
+    parser.add_argument("--athletes", type=int, default=1, help="When more than 1, writes athletes/athlete<N>.db next to --db (open with ?athlete=athlete<N>)")
+    parser.add_argument("--seed", type=int, help="Same seed and end date, same data")
+    parser.add_argument("--end-date", type=date.fromisoformat, help="Last generated day (YYYY-MM-DD), default today")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Parallel workers when generating several athletes")
+    parser.add_argument("--fresh", action="store_true", help="Build new database files instead of clearing the existing ones")
+    parser.add_argument("--skip-rate", type=float, default=0.1)
+    parser.add_argument("--sports-rate", type=float, default=0.2, help="Chance of a sports session per day")
+    parser.add_argument("--custom-rate", type=float, default=0.1, help="Chance of a custom exercise per day")
+    parser.add_argument("--metrics-rate", type=float, default=0.3, help="Chance of a weigh-in per day")
+    args = parser.parse_args()
+
+    generate_data(
+        args.db, days=int(args.years * 365) if args.years else args.days, athletes=args.athletes,
+        seed=args.seed, fresh=args.fresh, jobs=min(args.jobs, args.athletes), end_date=args.end_date, skip_rate=args.skip_rate, sports_rate=args.sports_rate,
+        custom_rate=args.custom_rate, metrics_rate=args.metrics_rate,
+    )
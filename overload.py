@@ -0,0 +1,115 @@
+"""Progressive-overload analytics: tonnage, estimated 1RM, weekly volume per focus and PR lines.
+
+Every exercise is computed at once with vectorized pandas. OverloadCache keeps
+the results in memory and uses the per-week counters in week_versions (db.py)
+to re-read only the weeks written since its last refresh. Logging a day
+recomputes that week's rows, and only the exercises in it get new PR lines.
+"""
+import threading
+
+import pandas as pd
+
+from db import DB_PATH, NOTHING_SEEN, read_changed_weeks, typed_frame
+
+# Epley: weight x (1 + reps / 30). It overestimates badly past ~12 reps, so
+# longer sets count towards volume but not towards e1RM or PRs.
+E1RM_MAX_REPS = 12
+
+LOG_COLUMNS = ["log_date", "day_name", "exercise_name", "actual_sets", "actual_reps", "weight", "skipped"]
+CATEGORY_COLUMNS = ["day_name", "exercise_name"]
+
+def estimate_1rm(weight, reps):
+    weight, reps = weight.astype("float64"), reps.astype("float64")
+    e1rm = (weight * (1 + reps / 30)).where(reps != 1, weight)
+    return e1rm.where((reps >= 1) & (reps <= E1RM_MAX_REPS) & (weight > 0))
+
+def session_frame(logs):
+    """One row per logged exercise with tonnage and e1RM, from typed workout_logs rows; skipped entries are dropped."""
+    done = logs[logs["skipped"] == 0]
+    dates = done["log_date"]
+    sets, reps = done["actual_sets"].astype("float64"), done["actual_reps"].astype("float64")
+    weight = done["weight"].astype("float64")
+    return pd.DataFrame({
+        "log_date": dates,
+        "week_start": dates - pd.to_timedelta(dates.dt.weekday, unit="D"),
+        "day_name": done["day_name"],
+        "exercise_name": done["exercise_name"],
+        "sets": sets.fillna(0),
+        "reps": reps,
+        "weight": weight,
+        "tonnage": (weight * sets * reps).fillna(0),
+        "e1rm": estimate_1rm(weight, reps),
+    }).sort_values(["log_date", "exercise_name"], ignore_index=True)
+
+def weekly_volume(sessions):
+    return sessions.groupby(["week_start", "day_name"], observed=True, as_index=False)[["sets", "tonnage"]].sum()
+
+def add_pr_lines(sessions, exercises=None):
+    """Set best_e1rm (running best per exercise) and is_pr, for all exercises or only those listed.
+
+    sessions must be sorted by log_date; it is updated in place.
+    """
+    rows = sessions.index if exercises is None else sessions.index[sessions["exercise_name"].isin(exercises)]
+    e1rm, names = sessions.loc[rows, "e1rm"], sessions.loc[rows, "exercise_name"]
+    # cummax leaves gaps where a session has no estimate; carry the best so far across them
+    best = e1rm.groupby(names, observed=True).cummax().groupby(names, observed=True).ffill()
+    previous = best.groupby(names, observed=True).shift()
+    if "best_e1rm" not in sessions:
+        sessions["best_e1rm"], sessions["is_pr"] = float("nan"), False
+    sessions.loc[rows, "best_e1rm"] = best
+    sessions.loc[rows, "is_pr"] = e1rm.notna() & (previous.isna() | (e1rm > previous))
+    sessions["is_pr"] = sessions["is_pr"].astype(bool)
+    return sessions
+
+def focus_volume(weekly, plan):
+    """Weekly sets and tonnage per muscle-group focus, using each logged day's focus in the plan."""
+    focus = {day: p.focus or day for day, p in plan.days.items()}
+    df = weekly.assign(focus=weekly["day_name"].astype(str).map(focus).fillna("Other"))
+    return df.groupby(["week_start", "focus"], as_index=False)[["sets", "tonnage"]].sum()
+
+def _concat_categorical(old, new):
+    # Concatenating categoricals with different categories falls back to object; align them first
+    new = new.copy()
+    for col in CATEGORY_COLUMNS:
+        if col in new:
+            categories = old[col].cat.categories.union(new[col].cat.categories)
+            old = old.assign(**{col: old[col].cat.set_categories(categories)})
+            new[col] = new[col].cat.set_categories(categories)
+    return pd.concat([old, new], ignore_index=True)
+
+class OverloadCache:
+    """Session, weekly-volume and PR results for one database, refreshed week by week.
+
+    `sessions` and `weekly` are replaced, never modified, on refresh, so a
+    frame read from them stays consistent while another thread refreshes.
+    """
+
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._seen = NOTHING_SEEN
+        self.sessions = add_pr_lines(session_frame(typed_frame(pd.DataFrame(columns=LOG_COLUMNS), "workout_logs")))
+        self.weekly = weekly_volume(self.sessions)
+
+    def refresh(self):
+        """Recompute the weeks written since the last refresh; returns how many there were."""
+        with self._lock:
+            changes = read_changed_weeks(self.path, "workout_logs", LOG_COLUMNS, session_frame, self._seen)
+            if changes.weeks:
+                self._apply(changes.frame, None if changes.full else changes.weeks)
+            self._seen = changes.seen
+            return len(changes.weeks)
+
+    def _apply(self, fresh, weeks):
+        if weeks is None:
+            self.sessions, self.weekly = add_pr_lines(fresh), weekly_volume(fresh)
+            return
+        stamps = pd.to_datetime(weeks)
+        old, weekly = self.sessions, self.weekly
+        stale = old["week_start"].isin(stamps)
+        # Untouched exercises keep their PR lines; only the ones logged in the changed weeks are recomputed
+        exercises = set(old.loc[stale, "exercise_name"]) | set(fresh["exercise_name"])
+        sessions = _concat_categorical(old[~stale], fresh)
+        weekly = _concat_categorical(weekly[~weekly["week_start"].isin(stamps)], weekly_volume(fresh))
+        self.sessions = add_pr_lines(sessions.sort_values(["log_date", "exercise_name"], ignore_index=True), exercises)
+        self.weekly = weekly.sort_values(["week_start", "day_name"], ignore_index=True)
@@ -0,0 +1,138 @@
+"""Hot-path timing: per-rerun spans, process-wide totals, JSON log lines and a Prometheus textfile.
+
+Recording is always on and costs one perf_counter pair per span. Output is opt-in:
+
+    FITNESS_PERF=1                    log one JSON line per rerun and show Settings > Performance
+    FITNESS_PERF_PROM=/path/perf.prom rewrite a Prometheus textfile after each rerun
+"""
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+PERF_ENV = "FITNESS_PERF"
+PROM_ENV = "FITNESS_PERF_PROM"
+METRIC_PREFIX = "fitness_tracker"
+# Threads that never call begin_rerun (CLIs, benchmarks) keep only the latest spans
+MAX_RERUN_SPANS = 500
+
+logger = logging.getLogger("fitness_tracker.perf")
+
+_local = threading.local()
+_lock = threading.Lock()
+# name -> {"calls", "total_ms", "max_ms", "rows", "bytes"}; rows/bytes are from the latest call
+_totals = {}
+
+def enabled():
+    return os.environ.get(PERF_ENV, "") not in ("", "0")
+
+def _spans():
+    if not hasattr(_local, "spans"):
+        _local.spans = deque(maxlen=MAX_RERUN_SPANS)
+    return _local.spans
+
+def frame_size(result):
+    # Row count and shallow size of a DataFrame/Series result; None for anything else.
+    # Summing column nbytes is ~10x cheaper than DataFrame.memory_usage().
+    if hasattr(result, "columns"):
+        return len(result), sum(col.nbytes for _, col in result.items())
+    if hasattr(result, "nbytes"):
+        return len(result), int(result.nbytes)
+    return None, None
+
+def record(name, ms, rows=None, nbytes=None):
+    _spans().append({"span": name, "ms": round(ms, 3), "rows": rows, "bytes": nbytes})
+    with _lock:
+        t = _totals.setdefault(name, {"calls": 0, "total_ms": 0.0, "max_ms": 0.0, "rows": None, "bytes": None})
+        t["calls"] += 1
+        t["total_ms"] += ms
+        t["max_ms"] = max(t["max_ms"], ms)
+        if rows is not None:
+            t["rows"], t["bytes"] = rows, nbytes
+
+@contextmanager
+def span(name):
+    """Time a block; set `info["rows"]`/`info["bytes"]` inside it to record result size."""
+    info = {}
+    t0 = time.perf_counter()
+    try:
+        yield info
+    finally:
+        record(name, (time.perf_counter() - t0) * 1000, info.get("rows"), info.get("bytes"))
+
+def timed(name):
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            result = fn(*args, **kwargs)
+            record(name, (time.perf_counter() - t0) * 1000, *frame_size(result))
+            return result
+        return wrapper
+    return decorator
+
+def _log_handler():
+    # Nothing else configures logging, so without a handler of its own INFO lines would be dropped
+    with _lock:
+        if not logger.handlers:
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+            logger.setLevel(logging.INFO)
+            logger.propagate = False  # or a root handler added later would print each line twice
+
+def begin_rerun():
+    _local.spans = deque(maxlen=MAX_RERUN_SPANS)
+    _local.started = time.perf_counter()
+
+def end_rerun(**context):
+    """Close the current rerun and return its spans; emits the configured outputs."""
+    total_ms = (time.perf_counter() - getattr(_local, "started", time.perf_counter())) * 1000
+    record("rerun", total_ms)
+    spans = list(_spans())
+    _local.spans = deque(maxlen=MAX_RERUN_SPANS)
+    if enabled():
+        _log_handler()
+        logger.info(json.dumps({"event": "rerun", "ms": round(total_ms, 3), **context, "spans": spans}))
+    prom_path = os.environ.get(PROM_ENV)
+    if prom_path:
+        write_prometheus(prom_path)
+    return spans
+
+def totals():
+    with _lock:
+        return {name: dict(t) for name, t in _totals.items()}
+
+def reset():
+    with _lock:
+        _totals.clear()
+
+def prometheus_text():
+    lines = []
+    metrics = [
+        ("span_calls_total", "counter", "Calls per instrumented span", lambda t: t["calls"]),
+        ("span_seconds_total", "counter", "Total time spent per span", lambda t: t["total_ms"] / 1000),
+        ("span_max_seconds", "gauge", "Slowest single call per span", lambda t: t["max_ms"] / 1000),
+        ("span_rows", "gauge", "Rows returned by the latest call", lambda t: t["rows"]),
+        ("span_bytes", "gauge", "In-memory bytes returned by the latest call", lambda t: t["bytes"]),
+    ]
+    snapshot = totals()
+    for suffix, kind, help_text, value in metrics:
+        metric = f"{METRIC_PREFIX}_{suffix}"
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} {kind}"]
+        for name, t in sorted(snapshot.items()):
+            v = value(t)
+            if v is not None:
+                lines.append(f'{metric}{{span="{name}"}} {v:g}')
+    return "\n".join(lines) + "\n"
+
+def write_prometheus(path):
+    # Atomic replace so a scraping node_exporter never reads a half-written file
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        f.write(prometheus_text())
+    os.replace(tmp, path)
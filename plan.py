@@ -0,0 +1,124 @@
+"""Workout plan (workouts.yaml) parsed once into an immutable, validated model.
+
+load_plan() stats the file on every call and only re-reads it when the
+mtime or size changes; a changed mtime with identical content (a touch, a
+git checkout) keeps the existing model. The parsed plan is shared by all
+sessions, so treat it and its display frames as read-only.
+"""
+import hashlib
+import os
+import threading
+from collections import namedtuple
+
+import pandas as pd
+import yaml
+
+WORKOUTS_YAML = "workouts.yaml"
+DAY_ORDER = ["Monday","Tuesday","Wednesday","Thursday","Friday","Saturday","Sunday"]
+DISPLAY_COLUMNS = ["name", "sets", "reps", "tempo"]
+
+# libyaml's loader is several times faster; fall back to pure Python when PyYAML was built without it
+YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+Exercise = namedtuple("Exercise", ["name", "sets", "reps", "tempo", "notes"])
+DayPlan = namedtuple("DayPlan", ["day", "focus", "intensity", "core", "exercises", "exercise_names", "frame"])
+Plan = namedtuple("Plan", ["app_name", "phase", "notes", "days", "digest"])
+
+class PlanError(ValueError):
+    """workouts.yaml is unreadable or does not match the expected schema; `problems` lists each issue."""
+    def __init__(self, path, problems):
+        self.path, self.problems = path, problems
+        super().__init__(f"{path}: " + "; ".join(problems))
+
+_lock = threading.Lock()
+# abspath -> (mtime_ns, size), sha256 digest, Plan
+_cache = {}
+
+def _optional_text(value, where, problems):
+    if value is not None and not isinstance(value, (str, int, float)):
+        problems.append(f"{where}: expected text, got {type(value).__name__}")
+        return None
+    return value
+
+def _parse_exercise(raw, where, problems):
+    if not isinstance(raw, dict):
+        problems.append(f"{where}: expected a mapping with at least a name")
+        return None
+    name = raw.get("name")
+    if not isinstance(name, str) or not name.strip():
+        problems.append(f"{where}: missing exercise name")
+        return None
+    sets = raw.get("sets")
+    if isinstance(sets, bool) or (sets is not None and not isinstance(sets, (int, str))):
+        problems.append(f"{where} ({name}): sets must be a number or text like '3-4'")
+    return Exercise(
+        name, sets, _optional_text(raw.get("reps"), f"{where}.reps", problems),
+        _optional_text(raw.get("tempo"), f"{where}.tempo", problems),
+        _optional_text(raw.get("notes"), f"{where}.notes", problems) or "",
+    )
+
+def _parse_day(day, raw, problems):
+    raw = raw or {}
+    where = f"schedule.{day}"
+    if not isinstance(raw, dict):
+        problems.append(f"{where}: expected a mapping")
+        raw = {}
+    items = raw.get("exercises") or []
+    if not isinstance(items, list):
+        problems.append(f"{where}.exercises: expected a list")
+        items = []
+    exercises = tuple(e for i, item in enumerate(items) if (e := _parse_exercise(item, f"{where}.exercises[{i}]", problems)))
+    frame = pd.DataFrame([e._asdict() for e in exercises], columns=list(Exercise._fields))[DISPLAY_COLUMNS]
+    return DayPlan(
+        day, _optional_text(raw.get("focus"), f"{where}.focus", problems),
+        _optional_text(raw.get("intensity"), f"{where}.intensity", problems),
+        _optional_text(raw.get("core"), f"{where}.core", problems),
+        exercises, tuple(e.name for e in exercises), frame,
+    )
+
+def parse_plan(text, path=WORKOUTS_YAML, digest=None):
+    try:
+        data = yaml.load(text, Loader=YamlLoader)
+    except yaml.YAMLError as e:
+        raise PlanError(path, [f"invalid YAML: {e}"]) from e
+    if not isinstance(data, dict):
+        raise PlanError(path, ["top level must be a mapping with 'app' and 'schedule'"])
+    problems = []
+    app = data.get("app") or {}
+    if not isinstance(app, dict):
+        problems.append("app: expected a mapping")
+        app = {}
+    schedule = data.get("schedule") or {}
+    if not isinstance(schedule, dict):
+        problems.append("schedule: expected a mapping of weekday to plan")
+        schedule = {}
+    unknown = [d for d in schedule if d not in DAY_ORDER]
+    if unknown:
+        problems.append(f"schedule: unknown day(s) {', '.join(map(str, unknown))}; use {', '.join(DAY_ORDER)}")
+    notes = app.get("notes") or []
+    if not isinstance(notes, list):
+        problems.append("app.notes: expected a list")
+        notes = []
+    days = {d: _parse_day(d, schedule.get(d), problems) for d in DAY_ORDER}
+    if problems:
+        raise PlanError(path, problems)
+    return Plan(app.get("name"), app.get("phase", ""), tuple(notes), days, digest)
+
+def load_plan(path=WORKOUTS_YAML):
+    """Return the parsed plan, re-reading the file only when it changed. Raises PlanError or OSError."""
+    key = os.path.abspath(path)
+    stat = os.stat(path)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    cached = _cache.get(key)
+    if cached and cached[0] == stamp:
+        return cached[2]
+    with _lock:
+        with open(path, "rb") as f:
+            raw = f.read()
+        digest = hashlib.sha256(raw).hexdigest()
+        if cached and cached[1] == digest:
+            plan = cached[2]
+        else:
+            plan = parse_plan(raw, path, digest)
+        _cache[key] = (stamp, digest, plan)
+        return plan
@@ -0,0 +1,36 @@
+import argparse
+import os
+from db import DB_PATH, connect_db, init_db, rebuild_week_scores, check_week_scores
+
+def rebuild(path):
+    conn = connect_db(path)
+    weeks = rebuild_week_scores(conn)
+    conn.commit()
+    conn.close()
+    print(f"✅ Rebuilt weekly_scores: {weeks} weeks.")
+
+def check(path):
+    conn = connect_db(path)
+    mismatches = check_week_scores(conn)
+    conn.close()
+    if not mismatches:
+        print("✅ weekly_scores matches calc_week_score for every week.")
+        return True
+    for week_start, expected, actual in mismatches:
+        print(f" - {week_start}: expected {expected}, rollup has {actual}")
+    print(f"❌ {len(mismatches)} week(s) out of sync. Run without --check to rebuild.")
+    return False
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild or verify the weekly score rollup.")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--check", action="store_true", help="Compare the rollup against the full calculation instead of rebuilding.")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f"Database at {args.db} not found.")
+        raise SystemExit(1)
+    init_db(args.db)
+    if args.check:
+        raise SystemExit(0 if check(args.db) else 1)
+    rebuild(args.db)
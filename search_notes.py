@@ -0,0 +1,52 @@
+import argparse
+import os
+import time
+from db import (
+    DB_PATH, HIGHLIGHT, SEARCH_LIMIT, create_notes_index, get_pool, init_db, notes_index_exists,
+    rebuild_notes_index, search_notes,
+)
+
+def rebuild(path):
+    pool = get_pool(path)
+    t0 = time.perf_counter()
+    with pool.writer() as conn:
+        if notes_index_exists(conn):
+            rebuild_notes_index(conn)
+        elif not create_notes_index(conn):
+            print("❌ This SQLite build has no FTS5; search keeps using a slower LIKE scan.")
+            return False
+        count = conn.execute("SELECT COUNT(*) FROM notes_fts").fetchone()[0]
+    print(f"✅ Indexed {count} notes in {(time.perf_counter() - t0) * 1000:.0f} ms.")
+    return True
+
+def show(path, text, limit):
+    with get_pool(path).reader() as conn:
+        t0 = time.perf_counter()
+        hits = search_notes(conn, text, limit)
+        ms = (time.perf_counter() - t0) * 1000
+    start, end = HIGHLIGHT
+    for hit in hits.itertuples():
+        print(f" - {hit.log_date} {hit.name}: {hit.snippet.replace(start, '[').replace(end, ']')}")
+    print(f"{len(hits)} match(es) in {ms:.1f} ms.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search workout, custom-exercise, sport and body-metric notes.")
+    parser.add_argument("query", nargs="?", help='Words to find, e.g. shoulder pain or "felt heavy"')
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--limit", type=int, default=SEARCH_LIMIT)
+    parser.add_argument("--rebuild", action="store_true", help="Build the search index from every note (for existing databases).")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f"Database at {args.db} not found.")
+        raise SystemExit(1)
+    if not args.query and not args.rebuild:
+        parser.error("give a query, --rebuild, or both")
+    init_db(args.db)
+    if args.rebuild and not rebuild(args.db):
+        raise SystemExit(1)
+    if args.query:
+        with get_pool(args.db).reader() as conn:
+            if not notes_index_exists(conn):
+                print("Note: no search index, so results are unranked. Run with --rebuild to add it.")
+        show(args.db, args.query, args.limit)
@@ -0,0 +1,84 @@
+"""Parse per-set details out of workout notes, a whole batch at a time.
+
+Notes are free text; the Workout tab asks for sets like "15kgx10, 12kgx8".
+Understood, per comma- or semicolon-separated part:
+    15kgx10    12.5kg x 8    bw x 12    20lb x 10               weight x reps
+    20kgx10x3    20x10x3                                        ... x sets
+    3x10 @ 20kg    3x10 @ 20                                    sets x reps @ weight
+    3x10                                                        sets x reps, no weight
+    20kgx10 > 15kgx8 > 10kgx8                                   drop set
+Two numbers without a unit ("3x10") are read as sets x reps: a weight needs
+a unit, "bw" or an "@". A decimal there ("12.5x8") can only be a weight
+without its unit, so it is a failure rather than a guess.
+Parts without a weight/reps pattern ("Great pump", "RPE 8") are comments. A
+note with a part that looks like a set but does not parse ("15kg 10") is a
+failure and contributes no sets, so the set table only holds notes that were
+read in full.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+LB_TO_KG = 0.45359237
+SET_COLUMNS = ["log_id", "set_no", "weight", "reps", "drop_set"]
+
+# Anything past these is a typo rather than a set
+MAX_REPS = 200
+MAX_SETS_PER_PART = 20
+
+# parse_notes() status per note
+PARSED, NO_SETS, FAILED = 1, 2, 3
+
+_PART_SPLIT = r"[,;\n]"
+_DROP_SPLIT = r"\s*(?:>|→)\s*"
+_WEIGHT = r"(?:\d+(?:\.\d+)?|bw)"
+_UNIT = r"(?:kgs?|lbs?)"
+_TIMES = r"\s*[x×*]\s*"
+SET_RE = re.compile(
+    rf"^\s*(?:(?P<weight>{_WEIGHT})\s*(?P<unit>{_UNIT})?{_TIMES}(?P<reps>\d+)(?:{_TIMES}(?P<sets>\d+))?"
+    rf"|(?P<sets_at>\d+){_TIMES}(?P<reps_at>\d+)\s*@\s*(?P<weight_at>{_WEIGHT})\s*(?P<unit_at>{_UNIT})?)\s*$",
+    re.IGNORECASE,
+)
+# A digit next to a unit or a times sign: meant as a set, so it counts as a failure if SET_RE misses it
+SET_LIKE_RE = re.compile(rf"\d\s*(?:{_UNIT}|[x×*@])|[x×*@]\s*\d", re.IGNORECASE)
+
+def parse_notes(log_ids, notes):
+    """Parse a batch of notes; returns (sets frame with SET_COLUMNS, status Series indexed by log_id)."""
+    notes = pd.DataFrame({"log_id": list(log_ids), "text": pd.array(list(notes), dtype="string")})
+    status = pd.Series(NO_SETS, index=pd.Index(notes["log_id"], name="log_id"), dtype="int8")
+
+    parts = notes.assign(part=notes["text"].str.split(_PART_SPLIT, regex=True)).explode("part", ignore_index=True)
+    parts["part"] = parts["part"].str.strip()
+    parts = parts[parts["part"].fillna("") != ""]
+    # Each link of a drop chain is its own set; every link after the first is a drop
+    parts["chain"] = np.arange(len(parts))
+    links = parts.assign(link=parts["part"].str.split(_DROP_SPLIT, regex=True)).explode("link", ignore_index=True)
+    links["drop_set"] = links.groupby("chain").cumcount().gt(0).astype("int64")
+
+    m = links["link"].str.extract(SET_RE)
+    # "3x10": no unit, no "bw" and no third number, so the first number is the set count
+    sets_reps = (m["weight"].notna() & m["unit"].isna() & m["sets"].isna() & (m["weight"].str.lower() != "bw")).fillna(False).astype(bool)
+    reps = pd.to_numeric(m["reps"].fillna(m["reps_at"]), errors="coerce")
+    count = pd.to_numeric(m["sets"].fillna(m["sets_at"]).fillna(m["weight"].where(sets_reps)), errors="coerce").fillna(1)
+    parsed = reps.between(1, MAX_REPS) & count.between(1, MAX_SETS_PER_PART) & (count % 1 == 0)
+    set_like = links["link"].str.contains(SET_LIKE_RE).fillna(False).astype(bool)
+    failed = links.loc[set_like & ~parsed, "log_id"].unique()
+
+    weight_text = m["weight"].where(~sets_reps).fillna(m["weight_at"]).str.lower()
+    weight = pd.to_numeric(weight_text.where(weight_text != "bw"), errors="coerce").astype("float64")
+    pounds = m["unit"].fillna(m["unit_at"]).str.lower().str.startswith("lb").fillna(False).astype(bool)
+    weight = weight.where(~pounds, (weight * LB_TO_KG).round(2))
+
+    keep = (parsed & ~links["log_id"].isin(failed)).to_numpy()
+    rows = pd.DataFrame({
+        "log_id": links["log_id"].to_numpy()[keep], "weight": weight.to_numpy()[keep],
+        "reps": reps.to_numpy()[keep].astype("int64"), "drop_set": links["drop_set"].to_numpy()[keep],
+    })
+    # "20kgx10x3" is three identical sets
+    rows = rows.loc[rows.index.repeat(count.to_numpy()[keep].astype("int64"))].reset_index(drop=True)
+    rows["set_no"] = rows.groupby("log_id").cumcount() + 1
+
+    status[status.index.isin(rows["log_id"])] = PARSED
+    status[status.index.isin(failed)] = FAILED
+    return rows[SET_COLUMNS], status
@@ -0,0 +1,71 @@
+"""Restoring damaged backup files: what was readable is restored and the damage is reported, never raised.
+
+    python -m pytest tests
+"""
+import gzip
+import json
+from datetime import date, timedelta
+
+import pytest
+
+from backup import export_ndjson, import_backup
+from db import get_pool, init_db
+
+ROWS = 300
+
+@pytest.fixture
+def export_lines(tmp_path):
+    """The decompressed lines of an export holding ROWS workout rows."""
+    src = str(tmp_path / "src.db")
+    init_db(src)
+    start = date(2025, 1, 6)
+    with get_pool(src).writer() as conn:
+        conn.executemany(
+            "INSERT INTO workout_logs (log_date, day_name, exercise_name, actual_sets, actual_reps, weight, skipped) "
+            "VALUES (?, 'Mon', 'Squat', 3, 5, 100, 0)",
+            [((start + timedelta(days=i)).isoformat(),) for i in range(ROWS)],
+        )
+    export_ndjson(str(tmp_path / "full.ndjson.gz"), src)
+    with gzip.open(tmp_path / "full.ndjson.gz", "rt", encoding="utf-8") as f:
+        return f.read().splitlines(keepends=True)
+
+def restore(tmp_path, data):
+    path = tmp_path / "backup.ndjson"
+    path.write_bytes(data)
+    return import_backup(str(path), str(tmp_path / "dst.db"))
+
+def test_intact_export_restores_completely(tmp_path, export_lines):
+    result = restore(tmp_path, "".join(export_lines).encode())
+    assert (result.written, result.invalid, result.complete, result.errors) == (ROWS, 0, True, [])
+
+def test_file_cut_off_mid_line(tmp_path, export_lines):
+    # Header plus 100 whole rows, then half of the next one; no footer
+    text = "".join(export_lines[:101]) + export_lines[101][:20]
+    result = restore(tmp_path, text.encode())
+    assert (result.written, result.invalid, result.complete) == (100, 1, False)
+    assert result.errors[0] == "line 102: not valid JSON"
+    assert "truncated" in result.errors[-1]
+
+def test_garbage_lines_are_skipped(tmp_path, export_lines):
+    lines = list(export_lines)
+    lines[50:50] = ["this is not json\n", "[1, 2, 3]\n"]
+    result = restore(tmp_path, "".join(lines).encode())
+    assert (result.written, result.invalid, result.complete) == (ROWS, 2, True)
+    assert result.errors == ["line 51: not valid JSON", "line 52: not a JSON object"]
+
+def test_truncated_gzip(tmp_path, export_lines):
+    data = gzip.compress("".join(export_lines).encode())
+    result = restore(tmp_path, data[: len(data) // 2])
+    assert not result.complete
+    assert result.written < ROWS
+    assert any("unreadable" in e and "EOFError" in e for e in result.errors)
+
+def test_not_a_backup(tmp_path):
+    result = restore(tmp_path, b"\x00\x01 definitely not a backup")
+    assert (result.written, result.complete) == (0, False)
+    assert result.errors[0] == "line 1: unreadable, neither an NDJSON export nor a backup.json"
+
+def test_legacy_backup_json(tmp_path):
+    legacy = {"logs": [{"log_date": "2025-01-06", "day_name": "Mon", "exercise_name": "Squat", "skipped": 0}], "metrics": []}
+    result = restore(tmp_path, json.dumps(legacy).encode())
+    assert (result.written, result.invalid, result.complete) == (1, 0, True)
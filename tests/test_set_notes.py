@@ -0,0 +1,56 @@
+"""Set-note formats from the README, and notes that must not be guessed at.
+
+    python -m pytest tests
+"""
+import math
+
+import pytest
+
+from set_notes import FAILED, LB_TO_KG, NO_SETS, PARSED, parse_notes
+
+def parse(note):
+    """(status, [(weight, reps, drop_set), ...]) for one note; a weight of None means none was given."""
+    sets, status = parse_notes([1], [note])
+    rows = [
+        (None if math.isnan(w) else w, int(r), int(d))
+        for w, r, d in sets.sort_values("set_no")[["weight", "reps", "drop_set"]].itertuples(index=False)
+    ]
+    return int(status[1]), rows
+
+@pytest.mark.parametrize("note, expected", [
+    ("15kgx10, 12kgx8", [(15.0, 10, 0), (12.0, 8, 0)]),
+    ("12.5kg x 8", [(12.5, 8, 0)]),
+    ("20kgx10x3", [(20.0, 10, 0)] * 3),
+    ("20x10x3", [(20.0, 10, 0)] * 3),
+    ("3x10 @ 20kg", [(20.0, 10, 0)] * 3),
+    ("3x10 @ 20", [(20.0, 10, 0)] * 3),
+    ("bw x 12", [(None, 12, 0)]),
+    ("45lbx10", [(round(45 * LB_TO_KG, 2), 10, 0)]),
+    ("20kgx10 > 15kgx8", [(20.0, 10, 0), (15.0, 8, 1)]),
+    ("20kgx10 → 15kgx8 > 10kgx8", [(20.0, 10, 0), (15.0, 8, 1), (10.0, 8, 1)]),
+    ("15kgx10; Great pump", [(15.0, 10, 0)]),
+])
+def test_readme_formats(note, expected):
+    assert parse(note) == (PARSED, expected)
+
+@pytest.mark.parametrize("note, expected", [
+    # No unit: sets x reps, not 3 kg x 10
+    ("3x10", [(None, 10, 0)] * 3),
+    ("4 × 8", [(None, 8, 0)] * 4),
+    ("2x12, 20kgx8", [(None, 12, 0), (None, 12, 0), (20.0, 8, 0)]),
+])
+def test_unitless_pair_is_sets_by_reps(note, expected):
+    assert parse(note) == (PARSED, expected)
+
+@pytest.mark.parametrize("note", [
+    "60x8",     # 60 sets: a weight without its unit
+    "12.5x8",   # a fractional set count
+    "15kg 10",  # no times sign
+    "3x10, 15kg 10",  # one bad part fails the whole note
+])
+def test_ambiguous_or_malformed_notes_fail(note):
+    assert parse(note) == (FAILED, [])
+
+@pytest.mark.parametrize("note", ["Great pump", "RPE 8", ""])
+def test_comments_have_no_sets(note):
+    assert parse(note) == (NO_SETS, [])
@@ -0,0 +1,96 @@
+"""Pre-build what the first request would otherwise pay for, and time it.
+
+    python warmup.py && streamlit run app.py
+
+Run before starting the server (e.g. in the deploy start command): migrations
+are applied, workouts.yaml is validated so a broken plan fails the deploy
+instead of the first page view, the weekly rollup is rebuilt if it is missing,
+queued workout notes are parsed into sets, and the dashboard's pages are read
+into the OS file cache. The app calls
+warm_up() itself once per server process for the parts that live in memory.
+"""
+import argparse
+import importlib
+import os
+import time
+from contextlib import contextmanager
+from datetime import date
+
+from db import (
+    DB_PATH, DERIVED_REBUILDS, backfill_sets, fetch_metrics, fetch_recent_activity, fetch_week_score, get_pool, init_db,
+    week_range,
+)
+from plan import WORKOUTS_YAML, PlanError, load_plan
+
+# Imported lazily by the features that use them; warm-up pays for them up front
+HEAVY_IMPORTS = ["plotly.express", "analytics"]
+
+def rollups_missing(conn):
+    has_data = conn.execute(
+        "SELECT EXISTS(SELECT 1 FROM workout_logs) OR EXISTS(SELECT 1 FROM custom_exercises) OR EXISTS(SELECT 1 FROM sports_logs)"
+    ).fetchone()[0]
+    return bool(has_data) and not conn.execute("SELECT EXISTS(SELECT 1 FROM weekly_scores)").fetchone()[0]
+
+def import_heavy():
+    for name in HEAVY_IMPORTS:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass  # optional dependency; the feature falls back without it
+
+def warm_up(db_path=DB_PATH, plan_path=WORKOUTS_YAML, imports=True):
+    """Run each warm-up step and return {step: ms}. Pass plan_path=None to skip the plan."""
+    timings = {}
+
+    @contextmanager
+    def step(name):
+        t0 = time.perf_counter()
+        yield
+        timings[name] = (time.perf_counter() - t0) * 1000
+
+    with step("schema"):
+        init_db(db_path)
+    if plan_path:
+        with step("plan"):
+            load_plan(plan_path)
+    pool = get_pool(db_path)
+    with step("rollups"):
+        with pool.reader() as conn:
+            missing = rollups_missing(conn)
+        if missing:
+            with pool.writer() as conn:
+                for rebuild in DERIVED_REBUILDS:
+                    rebuild(conn)
+        with pool.reader() as conn:
+            fetch_week_score(conn, week_range(date.today())[0])
+            fetch_metrics(conn, limit=1)
+            fetch_recent_activity(conn)
+    with step("set_notes"):
+        # Notes queued by a migration or bulk load; a no-op query otherwise
+        backfill_sets(pool)
+    if imports:
+        with step("imports"):
+            import_heavy()
+    return timings
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Warm the database, plan and imports before the first request.")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--plan", default=WORKOUTS_YAML)
+    parser.add_argument("--no-imports", action="store_true", help="Skip pre-importing heavy libraries")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.plan):
+        print(f"Plan at {args.plan} not found.")
+        raise SystemExit(1)
+    t0 = time.perf_counter()
+    try:
+        timings = warm_up(args.db, args.plan, imports=not args.no_imports)
+    except PlanError as e:
+        print(f"❌ {e.path} has errors:")
+        for problem in e.problems:
+            print(f" - {problem}")
+        raise SystemExit(1)
+    for name, ms in timings.items():
+        print(f" - {name}: {ms:.0f} ms")
+    print(f"✅ Warm-up complete in {(time.perf_counter() - t0) * 1000:.0f} ms.")
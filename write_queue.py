@@ -0,0 +1,316 @@
+"""Write-behind queue: form submissions return once queued, a background thread commits them.
+
+submit() appends the write to a small local SQLite journal next to the
+database (<db>-queue, synchronous=FULL) and returns a ticket, so the script
+run never waits on the database's write lock. One thread per database drains
+the journal in order and commits up to WRITE_BATCH queued writes in a single
+transaction. Each ticket is recorded in applied_writes inside that same
+transaction, so a write replayed after a crash is never applied twice.
+Writes still queued at shutdown are committed on exit if the database allows
+within FLUSH_TIMEOUT_S, and otherwise on the next start. The app and api.py
+may drain the same journal: a drainer claims the rows it commits, so two never
+take the same batch, and status() reads the journal and applied_writes for
+writes another drainer committed.
+"""
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from db import DB_PATH, get_pool, init_db, is_locked_error, write_body_metrics, write_workout_session
+
+# op name -> fn(conn, **payload) run inside the group-commit transaction; payloads must be JSON
+WRITE_OPS = {
+    "workout_session": write_workout_session,
+    "body_metrics": write_body_metrics,
+}
+
+QUEUED, WRITTEN, FAILED, UNKNOWN = "queued", "written", "failed", "unknown"
+# Journal-only state of a claimed row; reported as QUEUED
+RUNNING = "running"
+# result and latency_ms are only known to the queue that committed the write, and only while it keeps the status
+WriteStatus = namedtuple("WriteStatus", ["state", "result", "error", "latency_ms"])
+
+WRITE_BATCH = 100
+FLUSH_TIMEOUT_S = 10
+# Backoff while another connection holds the database's write lock
+LOCKED_RETRY_S = (0.05, 2.0)
+# Statuses kept in memory for the UI; older tickets report from the journal
+MAX_RESULTS = 1000
+APPLIED_RETENTION_DAYS = 30
+# A claim older than this belongs to a drainer that died mid-commit and may be taken over
+CLAIM_TIMEOUT_S = 60
+# How often wait() looks for a commit made by another drainer
+WAIT_POLL_S = 0.1
+# Queues (one thread and two connections each) kept per process; the least recently used are closed beyond this
+MAX_OPEN_QUEUES = 16
+
+logger = logging.getLogger("fitness_tracker.write_queue")
+
+def queue_path(db_path=DB_PATH):
+    return db_path + "-queue"
+
+_queues = OrderedDict()
+_queues_lock = threading.Lock()
+
+def get_queue(db_path=DB_PATH):
+    """The process's one WriteQueue for a database, started on first use.
+
+    Beyond MAX_OPEN_QUEUES databases the least recently used queue is closed;
+    what it still holds stays in its journal for the next queue on that file.
+    """
+    # Keyed like get_pool: a forked child starts its own writer thread
+    key = (os.path.abspath(db_path), os.getpid())
+    evicted = []
+    with _queues_lock:
+        queue = _queues.get(key)
+        if queue is None:
+            queue = _queues[key] = WriteQueue(db_path)
+            while len(_queues) > MAX_OPEN_QUEUES:
+                evicted.append(_queues.popitem(last=False)[1])
+        else:
+            _queues.move_to_end(key)
+    # Closed in the background: close() waits up to FLUSH_TIMEOUT_S for the database's write lock
+    for old in evicted:
+        threading.Thread(target=old.close, name="write-queue-close", daemon=True).start()
+    return queue
+
+def _connect(path, synchronous="FULL"):
+    conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute(f"PRAGMA synchronous = {synchronous}")  # FULL: a queued write survives power loss, not just a crash
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS queue (seq INTEGER PRIMARY KEY AUTOINCREMENT, ticket TEXT UNIQUE NOT NULL, "
+        "op TEXT NOT NULL, payload TEXT NOT NULL, created_at REAL NOT NULL, status TEXT NOT NULL DEFAULT 'queued', error TEXT, "
+        "claimant TEXT, claimed_at REAL)"
+    )
+    # Journals written before drainers claimed rows
+    for col, ctype in [("claimant", "TEXT"), ("claimed_at", "REAL")]:
+        try:
+            conn.execute(f"ALTER TABLE queue ADD COLUMN {col} {ctype}")
+        except sqlite3.OperationalError as e:
+            if "duplicate column" not in str(e):
+                raise
+    return conn
+
+class WriteQueue:
+    """Durable write-behind queue for one database, drained by a background thread in group commits."""
+
+    def __init__(self, db_path=DB_PATH, batch=WRITE_BATCH):
+        self.db_path = db_path
+        self.batch = batch
+        self._id = uuid.uuid4().hex  # claimant name in the journal
+        self._conn = _connect(queue_path(db_path))
+        self._lock = threading.Lock()
+        self._changed = threading.Condition()
+        self._wake = threading.Event()
+        self._results = OrderedDict()
+        self._stopping = False
+        self._error = None  # last unexpected drainer error, for logs and submit()
+        self._thread = threading.Thread(target=self._run, name="write-queue", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, op, **payload):
+        """Queue a write and return its ticket; raises ValueError for an unknown op."""
+        if op not in WRITE_OPS:
+            raise ValueError(f"Unknown write op {op!r}; expected one of {', '.join(WRITE_OPS)}")
+        if self._stopping:
+            raise RuntimeError("Write queue is shutting down")
+        if not self._thread.is_alive():
+            raise RuntimeError(f"Write queue for {self.db_path} has stopped: {self._error}")
+        ticket = uuid.uuid4().hex
+        with self._journal() as conn:
+            conn.execute(
+                "INSERT INTO queue (ticket, op, payload, created_at) VALUES (?, ?, ?, ?)",
+                (ticket, op, json.dumps(payload), time.time()),
+            )
+        self._publish({ticket: WriteStatus(QUEUED, None, None, None)})
+        self._wake.set()
+        return ticket
+
+    def status(self, ticket):
+        with self._changed:
+            status = self._results.get(ticket)
+        # Still queued here may mean another drainer has committed it since
+        if status and status.state != QUEUED:
+            return status
+        with self._journal() as conn:
+            row = conn.execute("SELECT status, error FROM queue WHERE ticket = ?", (ticket,)).fetchone()
+        if row:
+            return WriteStatus(QUEUED if row[0] == RUNNING else row[0], None, row[1], None)
+        # This queue may have committed it since the first look: it publishes before deleting the row
+        with self._changed:
+            status = self._results.get(ticket)
+        if status and status.state != QUEUED:
+            return status
+        # Committed writes leave the journal; applied_writes remembers them for APPLIED_RETENTION_DAYS
+        with get_pool(self.db_path).reader() as conn:
+            applied = conn.execute("SELECT 1 FROM applied_writes WHERE ticket = ?", (ticket,)).fetchone()
+        return WriteStatus(WRITTEN if applied else UNKNOWN, None, None, None)
+
+    def wait(self, ticket, timeout):
+        """Block up to timeout seconds for the ticket to be written or fail; returns its status either way."""
+        deadline = time.monotonic() + timeout
+        while True:
+            status = self.status(ticket)
+            remaining = deadline - time.monotonic()
+            if status.state != QUEUED or remaining <= 0:
+                return status
+            # Woken at once by this queue's own commits; another drainer's only show up in the journal
+            with self._changed:
+                self._changed.wait_for(lambda: self._results.get(ticket, status).state != QUEUED, min(remaining, WAIT_POLL_S))
+
+    def pending(self):
+        with self._journal() as conn:
+            return conn.execute("SELECT COUNT(*) FROM queue WHERE status IN (?, ?)", (QUEUED, RUNNING)).fetchone()[0]
+
+    def close(self, timeout=FLUSH_TIMEOUT_S):
+        """Stop taking writes and commit what is queued; returns how many are left for the next start."""
+        self._stopping = True
+        self._wake.set()
+        self._thread.join(timeout)
+        left = self.pending()
+        if not self._thread.is_alive():
+            # Still answers status() afterwards, from short-lived connections
+            atexit.unregister(self.close)
+            with self._lock:
+                if self._conn is not None:
+                    self._conn.close()
+                    self._conn = None
+        return left
+
+    @contextmanager
+    def _journal(self):
+        with self._lock:
+            if self._conn is not None:
+                yield self._conn
+                return
+        conn = _connect(queue_path(self.db_path))
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _publish(self, statuses):
+        with self._changed:
+            self._results.update(statuses)
+            while len(self._results) > MAX_RESULTS:
+                self._results.popitem(last=False)
+            self._changed.notify_all()
+
+    def _run(self):
+        # The drainer's own updates may be lost on power loss: claims expire and applied_writes skips replays
+        conn = _connect(queue_path(self.db_path), synchronous="NORMAL")
+        started = False
+        delay = LOCKED_RETRY_S[0]
+        while True:
+            try:
+                if not started:
+                    init_db(self.db_path)  # replayed writes may be older than the app's own schema check
+                    self._prune_applied()
+                    started = True
+                rows = self._claim(conn)
+                if not rows:
+                    if self._stopping:
+                        break
+                    self._wake.wait()
+                    self._wake.clear()
+                    continue
+                statuses = self._commit_batch(rows)
+                written = [(t,) for t, s in statuses.items() if s.state == WRITTEN]
+                failed = [(s.error, t) for t, s in statuses.items() if s.state == FAILED]
+                # Published first: status() would otherwise find it committed but without its result
+                self._publish(statuses)
+                conn.executemany("DELETE FROM queue WHERE ticket = ?", written)
+                # Failed writes stay in the journal for inspection instead of being retried forever
+                conn.executemany("UPDATE queue SET status = 'failed', error = ? WHERE ticket = ?", failed)
+            except Exception as e:
+                # Locked: another writer is busy. Anything else (a full disk, a newer schema) is logged once and
+                # retried the same way, so queued writes are never stranded behind a dead thread.
+                if not is_locked_error(e):
+                    error = f"{type(e).__name__}: {e}"
+                    if error != self._error:
+                        logger.exception("Write queue for %s failed; retrying", self.db_path)
+                    self._error = error
+                self._release(conn)
+                if self._stopping and delay >= LOCKED_RETRY_S[1]:
+                    break
+                time.sleep(delay)
+                delay = min(delay * 2, LOCKED_RETRY_S[1])
+                continue
+            delay, self._error = LOCKED_RETRY_S[0], None
+        conn.close()
+
+    def _release(self, conn):
+        # Still queued and durable; try again once the other writer is done, or let another drainer.
+        # Rows already committed are skipped on replay by applied_writes.
+        try:
+            conn.execute("UPDATE queue SET status = ?, claimant = NULL, claimed_at = NULL WHERE claimant = ? AND status = ?",
+                         (QUEUED, self._id, RUNNING))
+        except sqlite3.Error:
+            pass  # the claims expire after CLAIM_TIMEOUT_S instead
+
+    def _claim(self, conn):
+        # Queued rows, and rows claimed by a drainer that died, marked as this queue's in one journal transaction
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                "SELECT seq, ticket, op, payload, created_at FROM queue "
+                "WHERE status = ? OR (status = ? AND claimed_at < ?) ORDER BY seq LIMIT ?",
+                (QUEUED, RUNNING, now - CLAIM_TIMEOUT_S, self.batch),
+            ).fetchall()
+            conn.executemany("UPDATE queue SET status = ?, claimant = ?, claimed_at = ? WHERE seq = ?",
+                             [(RUNNING, self._id, now, r[0]) for r in rows])
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return rows
+
+    def _commit_batch(self, rows):
+        try:
+            return self._commit(rows)
+        except Exception as e:
+            if is_locked_error(e):
+                raise
+            if len(rows) == 1:
+                return {rows[0][1]: WriteStatus(FAILED, None, f"{type(e).__name__}: {e}", None)}
+        # One bad write must not hold back the rest of the batch: commit them one by one
+        statuses = {}
+        for row in rows:
+            statuses.update(self._commit_batch([row]))
+        return statuses
+
+    def _commit(self, rows):
+        results = {}
+        with get_pool(self.db_path).writer() as conn:
+            for _, ticket, op, payload, _ in rows:
+                if conn.execute("SELECT 1 FROM applied_writes WHERE ticket = ?", (ticket,)).fetchone():
+                    results[ticket] = None  # committed before a restart; only the journal delete was lost
+                    continue
+                results[ticket] = WRITE_OPS[op](conn, **json.loads(payload))
+                conn.execute("INSERT INTO applied_writes (ticket, applied_at) VALUES (?, ?)",
+                             (ticket, datetime.now().isoformat(timespec="seconds")))
+        now = time.time()
+        return {
+            ticket: WriteStatus(WRITTEN, results[ticket], None, (now - created_at) * 1000)
+            for _, ticket, _, _, created_at in rows
+        }
+
+    def _prune_applied(self):
+        cutoff = (datetime.now() - timedelta(days=APPLIED_RETENTION_DAYS)).isoformat(timespec="seconds")
+        try:
+            with get_pool(self.db_path).writer() as conn:
+                conn.execute("DELETE FROM applied_writes WHERE applied_at < ?", (cutoff,))
+        except sqlite3.OperationalError as e:
+            if not is_locked_error(e):
+                raise